@@ -0,0 +1,352 @@
+"""
+Client HTTP partagé pour l'API Let-me-count
+
+Un seul httpx.AsyncClient par processus, ouvert et fermé avec le cycle de vie
+du serveur MCP, afin de réutiliser les connexions keep-alive entre les appels
+d'outils.
+
+Les GET identiques lancés simultanément (même identité, même URL, mêmes
+paramètres) partagent une seule requête vers l'API et son résultat décodé.
+
+Chaque requête passe par un limiteur de concurrence global, un disjoncteur par
+endpoint et, en cas d'échec transitoire, de nouvelles tentatives (resilience.py).
+
+Avec un stockage partagé (plusieurs workers HTTP), les écritures incrémentent
+une génération par ressource que les autres workers consultent avant de servir
+leur cache, et la limite de débit vers l'API est comptée pour tous les workers.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+import httpx
+
+from auth import identity_from_headers
+from cache import CacheKey, ResponseCache
+from resilience import (
+    BREAKER_STATUSES,
+    IDEMPOTENT_METHODS,
+    RETRY_STATUSES,
+    CircuitBreakers,
+    RetryPolicy,
+    connection_not_sent,
+    parse_retry_after,
+)
+from shared_store import MemoryStore, SharedStore
+from telemetry import (
+    COALESCED_REQUESTS,
+    UPSTREAM_QUEUED,
+    UPSTREAM_RETRIES,
+    endpoint_template,
+    observe_pool,
+    upstream_request,
+)
+
+MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class ApiClient:
+    """Client HTTP long-vivant avec pool de connexions configurable"""
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        cache: Optional[ResponseCache] = None,
+        coalesce: bool = True,
+        retry: Optional[RetryPolicy] = None,
+        breakers: Optional[CircuitBreakers] = None,
+        max_concurrency: int = 16,
+        store: Optional[SharedStore] = None,
+        rate_limit: float = 0.0,
+    ):
+        self.base_url = base_url
+        self.cache = cache
+        self.coalesce = coalesce
+        # GET en cours, partagés entre appelants identiques
+        self._inflight: Dict[CacheKey, "asyncio.Task[Any]"] = {}
+        self.coalesced = 0
+        self.retry = retry or RetryPolicy()
+        self.breakers = breakers or CircuitBreakers()
+        self.retries = 0
+        # Plafond de requêtes simultanées vers l'API, tous outils confondus (0 : illimité)
+        self.max_concurrency = max_concurrency
+        self._limiter = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self._queued = 0
+        self._active = 0
+        self.store = store if store is not None else MemoryStore()
+        # Requêtes par seconde vers l'API, tous workers confondus (0 : illimité)
+        self.rate_limit = rate_limit
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2 and _h2_available()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_env(cls, base_url: str, store: Optional[SharedStore] = None) -> "ApiClient":
+        """Construit le client à partir des variables d'environnement LETMECOUNT_HTTP_*"""
+        return cls(
+            base_url,
+            max_connections=_env_int("LETMECOUNT_HTTP_MAX_CONNECTIONS", 20),
+            max_keepalive_connections=_env_int("LETMECOUNT_HTTP_MAX_KEEPALIVE", 10),
+            keepalive_expiry=_env_float("LETMECOUNT_HTTP_KEEPALIVE_EXPIRY", 30.0),
+            http2=_env_bool("LETMECOUNT_HTTP2"),
+            timeout=_env_float("LETMECOUNT_HTTP_TIMEOUT", 30.0),
+            connect_timeout=_env_float("LETMECOUNT_HTTP_CONNECT_TIMEOUT", 5.0),
+            cache=ResponseCache.from_env(),
+            coalesce=_env_bool("LETMECOUNT_HTTP_COALESCE", True),
+            retry=RetryPolicy.from_env(),
+            breakers=CircuitBreakers.from_env(),
+            max_concurrency=_env_int("LETMECOUNT_HTTP_MAX_CONCURRENCY", 16),
+            store=store,
+            rate_limit=_env_float("LETMECOUNT_HTTP_RATE_LIMIT", 0.0),
+        )
+
+    async def start(self) -> None:
+        self._open()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "ApiClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Client httpx partagé (créé à la demande si le cycle de vie n'a pas été démarré)"""
+        return self._open()
+
+    def _open(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+            )
+        return self._client
+
+    async def request(self, method: str, endpoint: str, stream: bool = False, **kwargs: Any) -> httpx.Response:
+        """Envoie une requête sur le pool partagé, retentée si l'échec est transitoire
+
+        Lève resilience.CircuitOpenError si le disjoncteur de l'endpoint est ouvert.
+        Après la dernière tentative, la réponse en erreur est renvoyée telle quelle.
+        Avec `stream`, le corps n'est pas lu : voir open_stream().
+        """
+        method = method.upper()
+        template = endpoint_template(endpoint)
+        breaker = self.breakers.get(template)
+        attempt = 0
+        while True:
+            attempt += 1
+            if breaker is not None:
+                breaker.before_request()
+            try:
+                response = await self._send(method, endpoint, stream, **kwargs)
+            except httpx.TransportError as e:
+                if breaker is not None:
+                    breaker.record_failure()
+                retryable = method in IDEMPOTENT_METHODS or connection_not_sent(e)
+                delay = self.retry.delay(attempt) if retryable else None
+                if delay is None:
+                    raise
+                reason = type(e).__name__
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                if breaker is not None:
+                    if response.status_code in BREAKER_STATUSES:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                delay = None
+                # Une réponse 429 garantit que la requête n'a pas été traitée
+                if response.status_code in RETRY_STATUSES and (method in IDEMPOTENT_METHODS or response.status_code == 429):
+                    delay = self.retry.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                if delay is None:
+                    break
+                reason = str(response.status_code)
+                await response.aclose()
+            self.retries += 1
+            UPSTREAM_RETRIES.labels(method, template, reason).inc()
+            await asyncio.sleep(delay)
+
+        if self.cache is not None and method in MUTATING_METHODS and response.is_success:
+            resources = self.cache.invalidate_after_write(endpoint)
+            if self._shared:
+                for resource in resources:
+                    self.cache.generations[resource] = await self.store.incr(f"cache:gen:{resource}")
+        return response
+
+    @property
+    def _shared(self) -> bool:
+        return self.store.shared
+
+    async def open_stream(self, method: str, endpoint: str, **kwargs: Any) -> httpx.Response:
+        """Requête dont le corps reste à lire (`aiter_bytes`) puis à fermer (`aclose`)
+
+        Le corps d'une réponse en erreur est lu d'office, pour raise_for_status().
+        """
+        response = await self.request(method, endpoint, stream=True, **kwargs)
+        if not response.is_success:
+            await response.aread()
+        return response
+
+    async def _send(self, method: str, endpoint: str, stream: bool = False, **kwargs: Any) -> httpx.Response:
+        """Une tentative, mesurée et tracée"""
+        async with self._slot():
+            with upstream_request(method, endpoint) as trace:
+                if trace["traceparent"]:
+                    kwargs["headers"] = {**(kwargs.get("headers") or {}), "traceparent": trace["traceparent"]}
+                observe_pool(self.client, self.limits.max_connections)
+                if stream:
+                    response = await self.client.send(self.client.build_request(method, endpoint, **kwargs), stream=True)
+                else:
+                    response = await self.client.request(method, endpoint, **kwargs)
+                trace["status"] = response.status_code
+            observe_pool(self.client, self.limits.max_connections)
+        return response
+
+    async def _throttle(self) -> None:
+        """Fenêtre d'une seconde comptée dans le stockage (partagée entre workers)"""
+        while True:
+            window = int(time.time())
+            if await self.store.incr(f"ratelimit:{window}", ttl=2) <= self.rate_limit:
+                return
+            await asyncio.sleep(window + 1 - time.time())
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        if self.rate_limit > 0:
+            await self._throttle()
+        if self._limiter is None:
+            yield
+            return
+        self._queued += 1
+        UPSTREAM_QUEUED.inc()
+        try:
+            await self._limiter.acquire()
+        finally:
+            self._queued -= 1
+            UPSTREAM_QUEUED.dec()
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._limiter.release()
+
+    def resilience_stats(self) -> Dict[str, Any]:
+        """État des disjoncteurs, du limiteur et nombre de nouvelles tentatives"""
+        return {
+            "retries": self.retries,
+            "concurrency": {"limit": self.max_concurrency or None, "active": self._active, "queued": self._queued},
+            "breakers": self.breakers.snapshot(),
+        }
+
+    async def get_json(
+        self,
+        endpoint: str,
+        params: Optional[Mapping[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Any:
+        """GET décodé en JSON, servi depuis le cache quand le chemin s'y prête
+
+        Lève httpx.HTTPStatusError si l'API répond une erreur.
+        """
+        if not self.coalesce:
+            return await self._get_json(endpoint, params, headers)
+
+        key = ResponseCache.key(identity_from_headers(headers), "GET", endpoint, params)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            COALESCED_REQUESTS.labels(endpoint_template(endpoint)).inc()
+        else:
+            task = self._inflight[key] = asyncio.ensure_future(self._get_json(endpoint, params, headers))
+            task.add_done_callback(lambda done: self._settle(key, done))
+        # shield : l'annulation d'un appelant n'interrompt pas la requête des autres
+        return await asyncio.shield(task)
+
+    def _settle(self, key: CacheKey, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # exception consultée même si plus personne n'attend
+
+    async def _get_json(
+        self,
+        endpoint: str,
+        params: Optional[Mapping[str, Any]],
+        headers: Optional[Dict[str, str]],
+    ) -> Any:
+        resource = self.cache.policy(endpoint) if self.cache is not None else None
+        if resource is None:
+            response = await self.request("GET", endpoint, params=params, headers=headers)
+            response.raise_for_status()
+            return response.json()
+
+        if self._shared:
+            self.cache.observe_generation(resource, await self.store.get(f"cache:gen:{resource}"))
+        key = self.cache.key(identity_from_headers(headers), "GET", endpoint, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.fresh:
+            self.cache.hits += 1
+            return entry.data
+
+        conditional = {**(headers or {}), **entry.validators()} if entry is not None else headers
+        response = await self.request("GET", endpoint, params=params, headers=conditional)
+        if entry is not None and response.status_code == 304:
+            self.cache.hits += 1
+            self.cache.refresh(entry)
+            return entry.data
+
+        self.cache.misses += 1
+        response.raise_for_status()
+        data = response.json()
+        self.cache.store(key, resource, data, response.headers)
+        return data
+
+
+def _h2_available() -> bool:
+    """HTTP/2 nécessite le paquet optionnel h2 (pip install 'httpx[http2]')"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,213 @@
+"""
+Utilitaires d'authentification JWT pour les serveurs MCP
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Mapping, Optional
+
+if TYPE_CHECKING:
+    from api_client import ApiClient
+    from shared_store import SharedStore
+
+# Renouvellement du JWT lorsqu'il expire dans moins de REFRESH_MARGIN secondes
+REFRESH_MARGIN = float(os.getenv("LETMECOUNT_JWT_REFRESH_MARGIN", "60"))
+SESSION_IDLE_TTL = float(os.getenv("LETMECOUNT_SESSION_IDLE_TTL", "86400"))
+
+
+def decode_jwt_claims(token: str) -> Dict[str, Any]:
+    """Décode la charge utile d'un JWT sans vérifier la signature (vérifiée par l'API)"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return {}
+
+
+def jwt_subject(token: str) -> str:
+    """Identité portée par le token : `username` (lexik), `sub`, ou à défaut une empreinte du token"""
+    claims = decode_jwt_claims(token)
+    subject = claims.get("username") or claims.get("sub")
+    if subject:
+        return str(subject)
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def identity_from_headers(headers: Optional[Mapping[str, str]]) -> Optional[str]:
+    """Identité de l'appelant d'après l'en-tête Authorization, None si anonyme"""
+    if not headers:
+        return None
+    authorization = headers.get("Authorization", "")
+    if not authorization.startswith("Bearer "):
+        return None
+    return jwt_subject(authorization[len("Bearer "):])
+
+
+class Credentials:
+    """JWT et refresh token (gesdinet) d'une session MCP"""
+
+    def __init__(self):
+        self.token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.refresh_token_expires_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        self.last_used = time.monotonic()
+        self._refresh_lock = asyncio.Lock()
+
+    def update(self, data: Mapping[str, Any]) -> None:
+        """Enregistre une réponse de /auth ou /auth/refresh"""
+        self.token = data["token"]
+        self.refresh_token = data.get("refresh_token", self.refresh_token)
+        self.refresh_token_expires_at = data.get("refresh_token_expiration", self.refresh_token_expires_at)
+        exp = decode_jwt_claims(self.token).get("exp")
+        self.expires_at = float(exp) if exp is not None else None
+
+    def clear(self) -> None:
+        self.token = self.refresh_token = None
+        self.expires_at = self.refresh_token_expires_at = None
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "token": self.token,
+            "refresh_token": self.refresh_token,
+            "refresh_token_expiration": self.refresh_token_expires_at,
+            "expires_at": self.expires_at,
+        }
+
+    def restore(self, data: Optional[Mapping[str, Any]]) -> None:
+        data = data or {}
+        self.token = data.get("token")
+        self.refresh_token = data.get("refresh_token")
+        self.refresh_token_expires_at = data.get("refresh_token_expiration")
+        self.expires_at = data.get("expires_at")
+
+    @property
+    def can_refresh(self) -> bool:
+        if not self.refresh_token:
+            return False
+        return self.refresh_token_expires_at is None or time.time() < self.refresh_token_expires_at
+
+    def expires_within(self, margin: float) -> bool:
+        return self.expires_at is not None and time.time() + margin >= self.expires_at
+
+    async def ensure_fresh(self, api: "ApiClient", margin: float = REFRESH_MARGIN) -> None:
+        """Renouvelle le JWT avant son expiration"""
+        if self.token and self.can_refresh and self.expires_within(margin):
+            await self.refresh(api, stale_token=self.token)
+
+    async def refresh(self, api: "ApiClient", stale_token: Optional[str] = None) -> bool:
+        """Échange le refresh token contre un nouveau JWT via /auth/refresh
+
+        Les appels concurrents sont dédupliqués : seul le premier interroge
+        l'API, les suivants réutilisent le token obtenu.
+        """
+        async with self._refresh_lock:
+            if stale_token is not None and self.token != stale_token:
+                return True
+            if not self.can_refresh:
+                return False
+            response = await api.request(
+                "POST",
+                "/auth/refresh",
+                json={"refresh_token": self.refresh_token},
+                headers={"Content-Type": "application/json"},
+            )
+            if response.status_code in (400, 401, 403):
+                # Refresh token invalide ou déjà consommé : une reconnexion est nécessaire
+                self.clear()
+                return False
+            response.raise_for_status()
+            self.update(response.json())
+            return True
+
+
+class SessionStore:
+    """Identifiants par session MCP, purgés après une période d'inactivité"""
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._sessions: Dict[str, Credentials] = {}
+
+    def get(self, session_id: str) -> Credentials:
+        self._purge()
+        credentials = self._sessions.get(session_id)
+        if credentials is None:
+            credentials = self._sessions[session_id] = Credentials()
+        credentials.last_used = time.monotonic()
+        return credentials
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Credentials]:
+        yield self.get(session_id)
+
+    async def drop(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _purge(self) -> None:
+        deadline = time.monotonic() - self.idle_ttl
+        for session_id in [sid for sid, c in self._sessions.items() if c.last_used < deadline]:
+            del self._sessions[session_id]
+
+
+class SharedCredentials(Credentials):
+    """Identifiants relus et enregistrés dans le stockage partagé à chaque appel
+
+    Le renouvellement est sérialisé entre workers par un verrou du stockage :
+    le refresh token étant à usage unique, un seul worker doit l'échanger,
+    les autres relisent le JWT obtenu.
+    """
+
+    def __init__(self, store: "SharedStore", key: str, idle_ttl: float):
+        super().__init__()
+        self.store = store
+        self.key = key
+        self.idle_ttl = idle_ttl
+
+    async def load(self) -> None:
+        self.restore(await self.store.get(self.key))
+
+    async def save(self) -> None:
+        if self.token is None and self.refresh_token is None:
+            await self.store.delete(self.key)
+        else:
+            await self.store.set(self.key, self.dump(), ttl=self.idle_ttl)
+
+    async def refresh(self, api: "ApiClient", stale_token: Optional[str] = None) -> bool:
+        async with self.store.lock(f"{self.key}:refresh"):
+            await self.load()
+            refreshed = await super().refresh(api, stale_token)
+            await self.save()
+            return refreshed
+
+
+class SharedSessionStore:
+    """Identifiants par session MCP dans un stockage partagé entre workers"""
+
+    def __init__(self, store: "SharedStore", idle_ttl: float = SESSION_IDLE_TTL):
+        self.store = store
+        self.idle_ttl = idle_ttl
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Credentials]:
+        """Charge les identifiants de la session et enregistre leurs changements à la sortie"""
+        credentials = SharedCredentials(self.store, f"session:{session_id}", self.idle_ttl)
+        await credentials.load()
+        before = credentials.dump()
+        try:
+            yield credentials
+        finally:
+            # Pas de réécriture sans changement : un autre worker a pu renouveler le JWT entre-temps
+            if credentials.dump() != before:
+                await credentials.save()
+
+    async def drop(self, session_id: str) -> None:
+        await self.store.delete(f"session:{session_id}")
@@ -0,0 +1,205 @@
+"""
+Moteur de soldes local
+
+Rejoue le flux des dépenses (collection paginée /depenses) une seule fois puis
+le maintient à jour de façon incrémentale à partir du journal /logs, comme
+l'index de recherche : seules les dépenses créées ou modifiées depuis le
+dernier log traité (le filigrane) sont relues. Les soldes sont tenus en centimes
+entiers dans un tableau indexé par utilisateur, comme le calcule l'API dans
+User::getSolde() : le payeur est crédité du montant, chaque participant est
+débité de sa part.
+
+L'API ne renvoie que les dépenses auxquelles l'utilisateur connecté participe :
+son propre solde est exact, celui des autres porte sur ces dépenses seulement.
+Le conjoint n'est pas agrégé (équivalent de `soldeIndividuel`).
+"""
+
+import asyncio
+import heapq
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from auth import identity_from_headers
+from pagination import CollectionStream, collection_total
+from registry import ToolContext
+from search_index import latest_log_id, logs_since
+
+# (payeur, montant, ((participant, part), ...)) en centimes, indices d'utilisateurs
+Contribution = Tuple[int, int, Tuple[Tuple[int, int], ...]]
+
+
+class BalancesInput(BaseModel):
+    tag: Optional[str] = Field(default=None, description="Restreindre aux dépenses d'un tag (IRI)")
+    refresh: Literal["auto", "full"] = Field(default="auto", description="auto : synchronisation incrémentale, full : relecture complète")
+
+
+def to_cents(value: float) -> int:
+    return int(round(value * 100))
+
+
+class BalanceEngine:
+    """Soldes en centimes des utilisateurs, mis à jour dépense par dépense"""
+
+    def __init__(self):
+        self.user_index: Dict[str, int] = {}
+        self.users: List[str] = []
+        self.cents = array("q")
+        self.contributions: Dict[str, Contribution] = {}
+        self.loaded = False
+        # Dernier log /logs intégré (None : journal inaccessible, chaque synchronisation est complète)
+        self.watermark: Optional[int] = None
+        self.lock = asyncio.Lock()
+
+    def _index(self, user_iri: str) -> int:
+        index = self.user_index.get(user_iri)
+        if index is None:
+            index = self.user_index[user_iri] = len(self.users)
+            self.users.append(user_iri)
+            self.cents.append(0)
+        return index
+
+    def contribution(self, depense: Dict[str, Any]) -> Contribution:
+        """Montant du payeur et parts des participants, telles qu'enregistrées
+
+        Comme User::getSolde(), seul le montant stocké de chaque détail compte,
+        quel que soit le mode de partage (`parts` ne sert qu'à l'affichage).
+        """
+        shares = tuple(
+            (self._index(detail["user"]), to_cents(detail["montant"])) for detail in depense.get("details") or []
+        )
+        return self._index(depense["payePar"]), to_cents(depense["montant"]), shares
+
+    def _apply(self, contribution: Contribution, sign: int) -> None:
+        payer, montant, shares = contribution
+        self.cents[payer] += sign * montant
+        for user, share in shares:
+            self.cents[user] -= sign * share
+
+    def upsert(self, depense: Dict[str, Any]) -> bool:
+        """Intègre une dépense nouvelle ou modifiée ; False si elle était déjà connue à l'identique"""
+        iri = depense["@id"]
+        contribution = self.contribution(depense)
+        previous = self.contributions.get(iri)
+        if previous == contribution:
+            return False
+        if previous is not None:
+            self._apply(previous, -1)
+        self._apply(contribution, 1)
+        self.contributions[iri] = contribution
+        return True
+
+    def remove(self, iri: str) -> bool:
+        previous = self.contributions.pop(iri, None)
+        if previous is None:
+            return False
+        self._apply(previous, -1)
+        return True
+
+    def reset(self) -> None:
+        self.user_index.clear()
+        self.users.clear()
+        self.cents = array("q")
+        self.contributions.clear()
+        self.loaded = False
+        self.watermark = None
+
+    def balances(self) -> Dict[str, float]:
+        return {user: self.cents[i] / 100 for i, user in enumerate(self.users)}
+
+    def settlements(self) -> List[Dict[str, Any]]:
+        """Virements minimisant le nombre d'échanges (appariement glouton des plus gros soldes)"""
+        creditors = [(-c, i) for i, c in enumerate(self.cents) if c > 0]
+        debtors = [(c, i) for i, c in enumerate(self.cents) if c < 0]
+        heapq.heapify(creditors)
+        heapq.heapify(debtors)
+        transfers = []
+        while creditors and debtors:
+            credit, creditor = heapq.heappop(creditors)
+            debt, debtor = heapq.heappop(debtors)
+            amount = min(-credit, -debt)
+            transfers.append({"from": self.users[debtor], "to": self.users[creditor], "montant": amount / 100})
+            if -credit > amount:
+                heapq.heappush(creditors, (credit + amount, creditor))
+            if -debt > amount:
+                heapq.heappush(debtors, (debt + amount, debtor))
+        return transfers
+
+    async def _refetch(self, ctx: ToolContext, headers: Dict[str, str], iris: Iterable[str], params: Dict[str, Any]) -> int:
+        """Relit les dépenses citées par le journal (hors cache) ; 404 : supprimée ou plus visible"""
+        tag = params.get("tag")
+        changed = 0
+        for iri in iris:
+            response = await ctx.api.request("GET", iri, headers=headers)
+            if response.status_code in (403, 404):
+                changed += self.remove(iri)
+                continue
+            response.raise_for_status()
+            depense = response.json()
+            # Une dépense changée de tag sort de la vue filtrée
+            changed += self.upsert(depense) if not tag or depense.get("tag") == tag else self.remove(iri)
+        return changed
+
+    async def sync(self, ctx: ToolContext, params: Dict[str, Any], full: bool = False) -> Dict[str, Any]:
+        """Synchronise avec /depenses
+
+        En mode incrémental, seules les dépenses citées par les logs postérieurs
+        au filigrane sont relues, quelle que soit leur date. Les suppressions
+        n'apparaissent pas dans le journal : si le nombre total de dépenses ne
+        correspond plus, ou si le journal est inaccessible ou trop long, une
+        relecture complète est faite.
+        """
+        headers = ctx.headers()
+        if self.loaded and not full and self.watermark is not None:
+            since = await logs_since(ctx, headers, self.watermark)
+            if since is not None:
+                iris, latest = since
+                changed = await self._refetch(ctx, headers, iris, params)
+                first = await ctx.api.get_json("/depenses", params={**params, "page": 1}, headers=headers)
+                if collection_total(first) == len(self.contributions):
+                    self.watermark = latest
+                    return {"mode": "incremental", "refetched": len(iris), "changed": changed}
+
+        # Filigrane lu avant la collection : un changement concurrent sera relu au prochain passage
+        latest = await latest_log_id(ctx, headers)
+        self.reset()
+        stream = CollectionStream(ctx.api, "/depenses", params, headers, max_items=sys.maxsize)
+        async for depense in stream:
+            self.upsert(depense)
+        self.loaded = True
+        self.watermark = latest
+        return {"mode": "full", "pages": stream.pages, "changed": len(self.contributions)}
+
+
+# Un moteur par identité et par filtre de tag
+_engines: Dict[Tuple[Optional[str], Optional[str]], BalanceEngine] = {}
+
+
+def engine_for(ctx: ToolContext, tag: Optional[str]) -> BalanceEngine:
+    key = (identity_from_headers(ctx.headers()), tag)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = _engines[key] = BalanceEngine()
+    return engine
+
+
+async def _synced_engine(ctx: ToolContext, args: BalancesInput) -> Tuple[BalanceEngine, Dict[str, Any]]:
+    engine = engine_for(ctx, args.tag)
+    params = {"tag": args.tag} if args.tag else {}
+    async with engine.lock:
+        sync = await engine.sync(ctx, params, full=args.refresh == "full")
+    return engine, sync
+
+
+async def balances_compute(ctx: ToolContext, args: BalancesInput) -> Dict[str, Any]:
+    """Soldes par utilisateur"""
+    engine, sync = await _synced_engine(ctx, args)
+    return {"balances": engine.balances(), "depenses": len(engine.contributions), "sync": sync}
+
+
+async def settle_up(ctx: ToolContext, args: BalancesInput) -> Dict[str, Any]:
+    """Virements à effectuer pour solder les comptes"""
+    engine, sync = await _synced_engine(ctx, args)
+    return {"transfers": engine.settlements(), "balances": engine.balances(), "sync": sync}
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la couche MCP contre un bouchon local de l'API
+
+Lance le bouchon (stub_api.py) dans le processus, puis pilote mcp-server.py en
+stdio et/ou http_server.py sur /api/mcp avec N clients simultanés. Pour chaque
+outil : latences p50/p95/p99, débit et mémoire résidente (RSS) des serveurs.
+
+    python bench/run.py --transport both --clients 8 --iterations 50 --latency 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from stub_api import StubData, StubServer, create_app
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Outil → arguments (forme stdio, à plat)
+WORKLOAD: Dict[str, Dict[str, Any]] = {
+    "depenses_list": {},
+    "depenses_list_all": {"all_pages": True},
+    "depenses_get": {"id": "1"},
+    "tags_list": {},
+    "users_list": {},
+    "users_me": {},
+    "balances_compute": {},
+    "depenses_search": {"q": "depense", "montant_min": 50},
+}
+# Alias du workload → nom réel de l'outil
+TOOL_ALIASES = {"depenses_list_all": "depenses_list"}
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentile par rang le plus proche"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def children_rss_mb(pids: Optional[List[int]] = None) -> Optional[float]:
+    """RSS cumulée (Mo) des processus fils, lue dans /proc (Linux uniquement)"""
+    if pids is None:
+        try:
+            pids = [
+                int(pid)
+                for task in os.listdir("/proc/self/task")
+                for pid in Path(f"/proc/self/task/{task}/children").read_text().split()
+            ]
+        except OSError:
+            return None
+    total_kb = 0
+    for pid in pids:
+        try:
+            for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def descendants(pid: int) -> List[int]:
+    """Le processus et ses descendants (workers uvicorn), lus dans /proc"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                pids.extend(int(child) for child in Path(f"/proc/{current}/task/{task}/children").read_text().split())
+        except OSError:
+            continue
+    return pids
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Transport:
+    """Ouvre des sessions MCP clientes vers un serveur"""
+
+    name = ""
+    wrap_input = False
+
+    async def start(self, api_url: str) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def session(self, stack: AsyncExitStack):
+        raise NotImplementedError
+
+    def rss_mb(self) -> Optional[float]:
+        return children_rss_mb()
+
+    def arguments(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        # http_server.py regroupe les arguments dans un objet `input`
+        return {"input": args} if self.wrap_input and args else args
+
+
+class StdioTransport(Transport):
+    """Un processus mcp-server.py par client simulé, comme un agent réel"""
+
+    name = "stdio"
+
+    async def start(self, api_url: str) -> None:
+        self.params = StdioServerParameters(
+            command=sys.executable,
+            args=[str(SERVER_DIR / "mcp-server.py")],
+            cwd=str(SERVER_DIR),
+            env={**os.environ, "LETMECOUNT_API_URL": api_url},
+        )
+
+    async def session(self, stack: AsyncExitStack) -> ClientSession:
+        read, write = await stack.enter_async_context(stdio_client(self.params))
+        return await stack.enter_async_context(ClientSession(read, write))
+
+
+class HttpTransport(Transport):
+    """Un seul processus http_server.py partagé par tous les clients"""
+
+    name = "http"
+    wrap_input = True
+
+    async def start(self, api_url: str) -> None:
+        port = free_port()
+        self.url = f"http://127.0.0.1:{port}/api/mcp/"
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, str(SERVER_DIR / "http_server.py"),
+            cwd=str(SERVER_DIR),
+            env={**os.environ, "LETMECOUNT_API_URL": api_url, "LETMECOUNT_MCP_PORT": str(port)},
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                return
+            except OSError:
+                if time.monotonic() > deadline or self.process.returncode is not None:
+                    raise RuntimeError("http_server.py n'a pas démarré")
+                await asyncio.sleep(0.1)
+
+    async def stop(self) -> None:
+        self.process.terminate()
+        await self.process.wait()
+
+    async def session(self, stack: AsyncExitStack) -> ClientSession:
+        read, write, _ = await stack.enter_async_context(streamablehttp_client(self.url))
+        return await stack.enter_async_context(ClientSession(read, write))
+
+    def rss_mb(self) -> Optional[float]:
+        return children_rss_mb(descendants(self.process.pid))
+
+
+async def call(session: ClientSession, transport: Transport, tool: str, args: Dict[str, Any]) -> Tuple[float, bool]:
+    started = time.perf_counter()
+    result = await session.call_tool(TOOL_ALIASES.get(tool, tool), transport.arguments(args))
+    elapsed = time.perf_counter() - started
+    text = result.content[0].text if result.content else ""
+    ok = not result.isError and not text.startswith("Erreur")
+    return elapsed, ok
+
+
+async def run_transport(transport: Transport, api_url: str, tools: List[str], clients: int, iterations: int) -> Dict[str, Any]:
+    await transport.start(api_url)
+    try:
+        async with AsyncExitStack() as stack:
+            sessions = []
+            for i in range(clients):
+                session = await transport.session(stack)
+                await session.initialize()
+                await session.call_tool("auth_login", transport.arguments({"username": f"user{1 + i % 5}", "password": "bench"}))
+                sessions.append(session)
+
+            report: Dict[str, Any] = {"rss_start_mb": transport.rss_mb(), "tools": {}}
+            for tool in tools:
+                args = WORKLOAD[tool]
+                # Échauffement : une requête par client, hors mesure
+                await asyncio.gather(*(call(session, transport, tool, args) for session in sessions))
+                latencies: List[float] = []
+                errors = 0
+
+                async def client(session: ClientSession) -> None:
+                    nonlocal errors
+                    for _ in range(iterations):
+                        elapsed, ok = await call(session, transport, tool, args)
+                        latencies.append(elapsed)
+                        errors += not ok
+
+                started = time.perf_counter()
+                await asyncio.gather(*(client(session) for session in sessions))
+                wall = time.perf_counter() - started
+                report["tools"][tool] = {
+                    "calls": len(latencies),
+                    "errors": errors,
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                    "throughput_rps": round(len(latencies) / wall, 1),
+                    "rss_mb": transport.rss_mb(),
+                }
+            return report
+    finally:
+        await transport.stop()
+
+
+def print_report(name: str, report: Dict[str, Any]) -> None:
+    print(f"\n== {name} (RSS au démarrage : {report['rss_start_mb']} Mo)")
+    print(f"{'outil':<20}{'appels':>8}{'erreurs':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'RSS Mo':>10}")
+    for tool, row in report["tools"].items():
+        print(f"{tool:<20}{row['calls']:>8}{row['errors']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['throughput_rps']:>10}{str(row['rss_mb']):>10}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["stdio", "http", "both"], default="both")
+    parser.add_argument("--clients", type=int, default=4, help="Clients MCP simultanés")
+    parser.add_argument("--iterations", type=int, default=20, help="Appels par client et par outil")
+    parser.add_argument("--latency", type=float, default=5.0, help="Latence simulée de l'API (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variation aléatoire de la latence (± ms)")
+    parser.add_argument("--depenses", type=int, default=200, help="Nombre de dépenses du bouchon")
+    parser.add_argument("--tools", default=",".join(WORKLOAD), help="Outils à mesurer, séparés par des virgules")
+    parser.add_argument("--json", dest="json_path", help="Écrire le rapport complet dans ce fichier JSON")
+    options = parser.parse_args()
+
+    tools = [tool for tool in options.tools.split(",") if tool]
+    unknown = [tool for tool in tools if tool not in WORKLOAD]
+    if unknown:
+        parser.error(f"outils inconnus : {', '.join(unknown)}")
+
+    app = create_app(StubData(depenses=options.depenses), options.latency / 1000, options.jitter / 1000)
+    stub = StubServer(app).start()
+    transports = {"stdio": [StdioTransport()], "http": [HttpTransport()],
+                  "both": [StdioTransport(), HttpTransport()]}[options.transport]
+    results: Dict[str, Any] = {"options": vars(options), "transports": {}}
+    try:
+        for transport in transports:
+            report = await run_transport(transport, stub.url, tools, options.clients, options.iterations)
+            results["transports"][transport.name] = report
+            print_report(transport.name, report)
+    finally:
+        stub.stop()
+    results["stub_requests"] = app.state.stats["requests"]
+    print(f"\nRequêtes reçues par le bouchon : {results['stub_requests']}")
+    if options.json_path:
+        Path(options.json_path).write_text(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
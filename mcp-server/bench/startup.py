@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Temps de démarrage du serveur stdio
+
+Lance mcp-server.py plusieurs fois, comme un client de bureau qui ouvre une
+session, et mesure depuis le lancement du processus le temps de réponse à
+`initialize`, à `tools/list` et au premier appel d'outil (`auth_login` sur le
+bouchon de l'API), avec et sans démarrage rapide. Mesure aussi le temps
+d'import du serveur complet.
+
+    python bench/startup.py --runs 20 --max-initialize-ms 150
+
+Avec `--max-initialize-ms`, le code de sortie est 1 si la médiane du temps de
+réponse à `initialize` en démarrage rapide dépasse le seuil.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from run import SERVER_DIR, percentile
+from stub_api import StubData, StubServer, create_app
+
+MODES = {"fast": "1", "full": "0"}
+STEPS = ("initialize", "tools/list", "tools/call")
+CLIENT_INFO = {"name": "bench-startup", "version": "1.0"}
+
+
+class Session:
+    """Client JSON-RPC minimal sur les pipes d'un processus mcp-server.py"""
+
+    def __init__(self, env: Dict[str, str]):
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, str(SERVER_DIR / "mcp-server.py")],
+            cwd=str(SERVER_DIR), env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        self.next_id = 0
+
+    def send(self, method: str, params: Optional[Dict[str, Any]] = None, notification: bool = False) -> Optional[int]:
+        message: Dict[str, Any] = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        message_id = None
+        if not notification:
+            message_id = message["id"] = self.next_id
+            self.next_id += 1
+        self.process.stdin.write(json.dumps(message).encode() + b"\n")
+        self.process.stdin.flush()
+        return message_id
+
+    def request(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        message_id = self.send(method, params)
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"mcp-server.py s'est arrêté pendant {method}")
+            message = json.loads(line)
+            if message.get("id") == message_id:
+                if "error" in message:
+                    raise RuntimeError(f"{method} : {message['error']}")
+                return message["result"]
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        self.process.wait(timeout=30)
+
+
+def run_session(env: Dict[str, str]) -> Dict[str, float]:
+    session = Session(env)
+    timings = {}
+    try:
+        session.request("initialize", {"protocolVersion": "2025-06-18", "capabilities": {}, "clientInfo": CLIENT_INFO})
+        timings["initialize"] = session.elapsed_ms()
+        session.send("notifications/initialized", notification=True)
+        session.request("tools/list")
+        timings["tools/list"] = session.elapsed_ms()
+        result = session.request("tools/call", {"name": "auth_login", "arguments": {"username": "user1", "password": "bench"}})
+        if result.get("isError") or not result["content"][0]["text"].startswith("Connexion réussie"):
+            raise RuntimeError(f"auth_login : {result}")
+        timings["tools/call"] = session.elapsed_ms()
+    finally:
+        session.close()
+    return timings
+
+
+def import_time_ms(runs: int) -> float:
+    """Médiane du temps d'import du serveur complet, interpréteur seul déduit"""
+
+    def run(code: str) -> float:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=str(SERVER_DIR), check=True, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - started
+
+    baseline = percentile([run("pass") for _ in range(runs)], 50)
+    full = percentile([run("import stdio_app") for _ in range(runs)], 50)
+    return round((full - baseline) * 1000, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Sessions mesurées par mode")
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    parser.add_argument("--max-initialize-ms", type=float, help="Seuil de la médiane d'initialize en démarrage rapide")
+    parser.add_argument("--json", dest="json_path", help="Écrire le rapport complet dans ce fichier JSON")
+    options = parser.parse_args()
+
+    modes = list(MODES) if options.mode == "both" else [options.mode]
+    stub = StubServer(create_app(StubData())).start()
+    results: Dict[str, Any] = {"options": vars(options), "modes": {}}
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            for mode in modes:
+                env = {**os.environ, "LETMECOUNT_API_URL": stub.url, "LETMECOUNT_DATA_DIR": data_dir,
+                       "LETMECOUNT_FAST_START": MODES[mode]}
+                # Session d'échauffement, hors mesure : écrit l'instantané des schémas
+                run_session(env)
+                samples: Dict[str, List[float]] = {step: [] for step in STEPS}
+                for _ in range(options.runs):
+                    for step, value in run_session(env).items():
+                        samples[step].append(value)
+                results["modes"][mode] = {
+                    step: {"p50_ms": round(percentile(values, 50), 1), "p95_ms": round(percentile(values, 95), 1)}
+                    for step, values in samples.items()
+                }
+    finally:
+        stub.stop()
+    results["import_ms"] = import_time_ms(max(3, options.runs // 2))
+
+    print(f"{'mode':<8}" + "".join(f"{step + ' p50':>18}{'p95':>8}" for step in STEPS))
+    for mode, row in results["modes"].items():
+        print(f"{mode:<8}" + "".join(f"{row[step]['p50_ms']:>18}{row[step]['p95_ms']:>8}" for step in STEPS))
+    print(f"\nImport du serveur complet (stdio_app) : {results['import_ms']} ms")
+    if options.json_path:
+        Path(options.json_path).write_text(json.dumps(results, indent=2, ensure_ascii=False))
+
+    limit = options.max_initialize_ms
+    fast = results["modes"].get("fast")
+    if limit is not None and fast is not None and fast["initialize"]["p50_ms"] > limit:
+        print(f"Régression : initialize {fast['initialize']['p50_ms']} ms > {limit} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
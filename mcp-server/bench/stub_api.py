@@ -0,0 +1,228 @@
+"""
+Bouchon de l'API Let-me-count pour les benchmarks
+
+Application Starlette servie dans le processus du benchmark : mêmes routes
+et même forme JSON-LD que l'API Symfony (/auth, /depenses, /tags, /users,
+/logs, /historique), données générées de façon déterministe et latence simulée
+configurable.
+"""
+
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+PAGE_SIZE = 30
+JSON_LD = "application/ld+json"
+
+
+def make_token(username: str, ttl: int = 3600) -> str:
+    """JWT non signé portant les mêmes claims que lexik (username, exp)"""
+    def encode(data: Dict[str, Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    return f"{encode({'alg': 'none'})}.{encode({'username': username, 'exp': int(time.time()) + ttl})}.stub"
+
+
+class StubData:
+    """Utilisateurs, tags et dépenses générés à partir d'une graine"""
+
+    def __init__(self, users: int = 5, tags: int = 3, depenses: int = 200, seed: int = 42):
+        rng = random.Random(seed)
+        self.users = [
+            {"@id": f"/users/{i}", "@type": "User", "id": i, "username": f"user{i}",
+             "tags": [f"/tags/{t}" for t in range(1, tags + 1)], "solde": 0.0, "soldeIndividuel": 0.0}
+            for i in range(1, users + 1)
+        ]
+        self.tags = [
+            {"@id": f"/tags/{i}", "@type": "Tag", "id": i, "libelle": f"Tag {i}",
+             "users": [user["@id"] for user in self.users]}
+            for i in range(1, tags + 1)
+        ]
+        self.depenses: List[Dict[str, Any]] = []
+        for i in range(1, depenses + 1):
+            participants = rng.sample(self.users, rng.randint(2, users))
+            montant = round(rng.uniform(5, 200), 2)
+            share = round(montant / len(participants), 2)
+            details = [
+                {"@type": "Detail", "user": user["@id"], "parts": 1, "montant": share}
+                for user in participants
+            ]
+            details[-1]["montant"] = round(montant - share * (len(participants) - 1), 2)
+            self.depenses.append({
+                "@id": f"/depenses/{i}", "@type": "Depense", "id": i,
+                "titre": f"Dépense {i}", "montant": montant,
+                "date": f"2025-{1 + i * 12 // (depenses + 1):02d}-{1 + i % 28:02d}T12:00:00+00:00",
+                "partage": "parts", "tag": f"/tags/{1 + i % tags}",
+                "payePar": rng.choice(participants)["@id"], "details": details,
+            })
+        # Tri par date décroissante, comme l'API
+        self.depenses.sort(key=lambda d: d["date"], reverse=True)
+        self.next_id = depenses + 1
+        self.logs: List[Dict[str, Any]] = []
+        for depense in sorted(self.depenses, key=lambda d: d["id"]):
+            self.log("CREATE", depense)
+
+    def log(self, action: str, depense: Dict[str, Any]) -> None:
+        """Journal /logs, le plus récent en tête (comme DepenseLogListener)"""
+        log_id = len(self.logs) and self.logs[0]["id"]
+        self.logs.insert(0, {
+            "@id": f"/logs/{log_id + 1}", "@type": "Log", "id": log_id + 1,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime()), "action": action,
+            "user": depense["payePar"], "depense": depense["@id"],
+            "libelle": depense.get("titre", ""), "montant": depense.get("montant", 0.0),
+        })
+
+    def historique(self) -> Dict[str, Dict[str, float]]:
+        soldes = {user["@id"]: 0.0 for user in self.users}
+        history: Dict[str, Dict[str, float]] = {}
+        for depense in sorted(self.depenses, key=lambda d: d["date"]):
+            soldes[depense["payePar"]] += depense["montant"]
+            for detail in depense["details"]:
+                soldes[detail["user"]] -= detail["montant"]
+            history[depense["date"][:10]] = {iri: round(s, 2) for iri, s in soldes.items()}
+        return history
+
+
+def collection(items: List[Dict[str, Any]], path: str, page: int) -> Dict[str, Any]:
+    last = max(1, -(-len(items) // PAGE_SIZE))
+    data = {
+        "@context": f"/contexts/{path.strip('/').capitalize()}",
+        "@id": path,
+        "@type": "Collection",
+        "totalItems": len(items),
+        "member": items[(page - 1) * PAGE_SIZE:page * PAGE_SIZE],
+    }
+    if last > 1:
+        view = {"@id": f"{path}?page={page}", "@type": "PartialCollectionView",
+                "first": f"{path}?page=1", "last": f"{path}?page={last}"}
+        if page < last:
+            view["next"] = f"{path}?page={page + 1}"
+        data["view"] = view
+    return data
+
+
+def create_app(data: StubData, latency: float = 0.0, jitter: float = 0.0) -> Starlette:
+    """Application ASGI ; `latency` et `jitter` en secondes, appliqués à chaque requête"""
+    stats = {"requests": 0}
+
+    async def delay() -> None:
+        stats["requests"] += 1
+        if latency or jitter:
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+    def json_ld(payload: Any, status_code: int = 200) -> JSONResponse:
+        return JSONResponse(payload, status_code=status_code, media_type=JSON_LD)
+
+    def not_found() -> JSONResponse:
+        return JSONResponse({"title": "An error occurred", "detail": "Not Found"}, status_code=404)
+
+    async def auth(request: Request) -> Response:
+        await delay()
+        body = await request.json()
+        username = body.get("username") or "user1"
+        return JSONResponse({"token": make_token(username), "refresh_token": f"refresh-{username}",
+                             "refresh_token_expiration": int(time.time()) + 86400})
+
+    async def auth_refresh(request: Request) -> Response:
+        await delay()
+        body = await request.json()
+        username = str(body.get("refresh_token", "")).removeprefix("refresh-") or "user1"
+        return JSONResponse({"token": make_token(username), "refresh_token": f"refresh-{username}"})
+
+    def listing(source: str):
+        async def endpoint(request: Request) -> Response:
+            await delay()
+            items = getattr(data, source)
+            tag = request.query_params.get("tag")
+            if source == "depenses" and tag:
+                items = [item for item in items if item["tag"] == tag]
+            return json_ld(collection(items, request.url.path, int(request.query_params.get("page", "1"))))
+        return endpoint
+
+    def item(source: str):
+        async def endpoint(request: Request) -> Response:
+            await delay()
+            items = getattr(data, source)
+            iri = request.url.path
+            found = next((entry for entry in items if entry["@id"] == iri), None)
+            if found is None:
+                return not_found()
+            if request.method == "DELETE":
+                items.remove(found)
+                # ON DELETE CASCADE : les logs de la dépense disparaissent avec elle
+                data.logs[:] = [log for log in data.logs if log["depense"] != iri]
+                return Response(status_code=204)
+            if request.method == "PATCH":
+                found.update(await request.json())
+                if source == "depenses":
+                    data.log("UPDATE", found)
+            return json_ld(found)
+        return endpoint
+
+    async def create_depense(request: Request) -> Response:
+        await delay()
+        body = await request.json()
+        depense = {"@id": f"/depenses/{data.next_id}", "@type": "Depense", "id": data.next_id, **body}
+        data.next_id += 1
+        data.depenses.insert(0, depense)
+        data.log("CREATE", depense)
+        return json_ld(depense, status_code=201)
+
+    async def users_me(request: Request) -> Response:
+        await delay()
+        return json_ld(data.users[0])
+
+    async def historique(request: Request) -> Response:
+        await delay()
+        return JSONResponse(data.historique())
+
+    app = Starlette(routes=[
+        Route("/auth", auth, methods=["POST"]),
+        Route("/auth/refresh", auth_refresh, methods=["POST"]),
+        Route("/depenses", listing("depenses"), methods=["GET"]),
+        Route("/depenses", create_depense, methods=["POST"]),
+        Route("/depenses/{id:int}", item("depenses"), methods=["GET", "PATCH", "DELETE"]),
+        Route("/tags", listing("tags"), methods=["GET"]),
+        Route("/tags/{id:int}", item("tags"), methods=["GET", "PATCH", "DELETE"]),
+        Route("/users", listing("users"), methods=["GET"]),
+        Route("/users/me", users_me, methods=["GET"]),
+        Route("/users/{id:int}", item("users"), methods=["GET"]),
+        Route("/logs", listing("logs"), methods=["GET"]),
+        Route("/historique", historique, methods=["GET"]),
+    ])
+    app.state.stats = stats
+    return app
+
+
+class StubServer:
+    """Sert l'application bouchon dans un thread dédié (boucle asyncio séparée)"""
+
+    def __init__(self, app: Starlette, host: str = "127.0.0.1", port: int = 0):
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        if self.thread is not None:
+            self.thread.join()
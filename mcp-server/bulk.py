@@ -0,0 +1,237 @@
+"""
+Opérations en masse sur les dépenses
+
+Les éléments sont validés localement avant tout envoi, puis soumis en
+parallèle avec une concurrence bornée et un plafond de débit optionnel.
+Chaque élément obtient sa propre ligne de résultat.
+
+Les modifications et suppressions en masse visent une liste d'IDs ou un
+filtre (tag, période, payeur) ; le filtre est évalué sur l'index local de
+recherche, synchronisé juste avant, sans relire toute la collection.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from pydantic import BaseModel, Field
+
+from models import DepensePatch, DepensesCreateInput
+from registry import MERGE_PATCH, ToolContext
+from search_index import DepensesSearchInput, iri_id, loaded_index, synced_index
+from splits import depense_body, validate_depense
+
+DEFAULT_CONCURRENCY = int(os.getenv("LETMECOUNT_BATCH_CONCURRENCY", "8"))
+
+
+class DepensesCreateBatchInput(BaseModel):
+    items: List[DepensesCreateInput] = Field(..., description="Dépenses à créer", min_length=1)
+    concurrency: int = Field(default=DEFAULT_CONCURRENCY, description="Nombre de requêtes simultanées", ge=1, le=32)
+    rate_limit: Optional[float] = Field(default=None, description="Nombre maximum de requêtes par seconde (optionnel)", gt=0)
+    stop_on_error: bool = Field(default=False, description="Ne rien envoyer si un élément est invalide et s'arrêter à la première erreur HTTP")
+
+
+# Filtres de sélection, évalués sur l'index local
+FILTER_FIELDS = frozenset({"tag", "date_min", "date_max", "payePar"})
+
+
+class DepensesSelectionInput(BaseModel):
+    ids: Optional[List[str]] = Field(default=None, description="IDs des dépenses visées (à la place des filtres)", min_length=1)
+    tag: Optional[str] = Field(default=None, description="Filtre : IRI du tag")
+    date_min: Optional[str] = Field(default=None, description="Filtre : date minimale incluse (AAAA-MM-JJ)")
+    date_max: Optional[str] = Field(default=None, description="Filtre : date maximale incluse (AAAA-MM-JJ)")
+    payePar: Optional[str] = Field(default=None, description="Filtre : IRI du payeur")
+    dry_run: bool = Field(default=False, description="Lister les dépenses visées sans rien modifier")
+    concurrency: int = Field(default=DEFAULT_CONCURRENCY, description="Nombre de requêtes simultanées", ge=1, le=32)
+    rate_limit: Optional[float] = Field(default=None, description="Nombre maximum de requêtes par seconde (optionnel)", gt=0)
+    stop_on_error: bool = Field(default=False, description="S'arrêter à la première erreur HTTP")
+
+
+class DepensesUpdateManyInput(DepensesSelectionInput):
+    changes: DepensePatch = Field(..., description="Champs à modifier, appliqués en merge-patch à chaque dépense")
+
+
+class DepensesDeleteManyInput(DepensesSelectionInput):
+    pass
+
+
+class RateLimiter:
+    """Espace les départs de requêtes d'au moins 1/rate secondes"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+async def run_bounded(
+    items: Sequence[Tuple[int, Any]],
+    worker: Callable[[Any], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+    rate_limit: Optional[float] = None,
+    stop_on_error: bool = False,
+) -> Dict[int, Dict[str, Any]]:
+    """Exécute `worker` sur chaque (index, élément) et renvoie le résultat par index"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    stop = asyncio.Event()
+    results: Dict[int, Dict[str, Any]] = {}
+
+    async def run(index: int, item: Any) -> None:
+        async with semaphore:
+            if stop.is_set():
+                results[index] = {"index": index, "status": "skipped"}
+                return
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                results[index] = {"index": index, **await worker(item)}
+                return
+            except httpx.HTTPStatusError as e:
+                error = f"{e.response.status_code} - {e.response.text}"
+            except Exception as e:
+                error = str(e)
+            results[index] = {"index": index, "status": "error", "error": error}
+            if stop_on_error:
+                stop.set()
+
+    await asyncio.gather(*(run(index, item) for index, item in items))
+    return results
+
+
+def summarize(results: Dict[int, Dict[str, Any]], count: int) -> Dict[str, Any]:
+    rows = [results[index] for index in range(count)]
+    statuses: Dict[str, int] = {}
+    for row in rows:
+        statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+    return {"total": count, **statuses, "results": rows}
+
+
+async def depenses_create_batch(ctx: ToolContext, args: DepensesCreateBatchInput) -> Dict[str, Any]:
+    """Création de dépenses en masse"""
+    results: Dict[int, Dict[str, Any]] = {}
+    valid: List[Tuple[int, DepensesCreateInput]] = []
+    for index, depense in enumerate(args.items):
+        errors = validate_depense(depense)
+        if errors:
+            results[index] = {"index": index, "status": "invalid", "error": "; ".join(errors)}
+        else:
+            valid.append((index, depense))
+
+    if args.stop_on_error and results:
+        for index, _ in valid:
+            results[index] = {"index": index, "status": "skipped"}
+        return summarize(results, len(args.items))
+
+    headers = ctx.headers()
+
+    async def create(depense: DepensesCreateInput) -> Dict[str, Any]:
+        response = await ctx.api.request("POST", "/depenses", json=depense_body(depense), headers=headers)
+        response.raise_for_status()
+        return {"status": "created", "id": response.json().get("@id")}
+
+    results.update(await run_bounded(valid, create, args.concurrency, args.rate_limit, args.stop_on_error))
+    return summarize(results, len(args.items))
+
+
+async def select_depenses(ctx: ToolContext, args: DepensesSelectionInput) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """(ID, dépense si connue) des dépenses visées, sans doublon"""
+    filters = args.model_dump(include=FILTER_FIELDS, exclude_none=True)
+    if args.ids is not None:
+        if filters:
+            raise ValueError("ids et filtres (tag, date_min, date_max, payePar) ne peuvent pas être combinés")
+        return [(depense_id, None) for depense_id in dict.fromkeys(args.ids)]
+    if not filters:
+        raise ValueError("ids ou au moins un filtre (tag, date_min, date_max, payePar) est requis")
+    # Synchronisation incrémentale systématique : le filtre porte sur l'état actuel
+    index, _ = await synced_index(ctx, max_age=0)
+    return [(str(iri_id(depense["@id"])), depense) for depense in index.select(DepensesSearchInput(**filters))]
+
+
+def _preview(depense_id: str, depense: Dict[str, Any], status: str) -> Dict[str, Any]:
+    return {"status": status, "id": depense_id,
+            **{key: depense.get(key) for key in ("titre", "date", "montant", "tag", "payePar")}}
+
+
+def _changes(depense: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs que le patch modifierait réellement"""
+    return {key: {"from": depense.get(key), "to": value} for key, value in patch.items() if depense.get(key) != value}
+
+
+async def _run_selection(
+    ctx: ToolContext,
+    args: DepensesSelectionInput,
+    verb: str,
+    apply: Callable[[str], Awaitable[None]],
+    patch: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Aperçu (dry_run) ou application de `apply` à chaque dépense visée"""
+    targets = await select_depenses(ctx, args)
+    targets_by_id = dict(targets)
+    headers = ctx.headers()
+    results: Dict[int, Dict[str, Any]] = {}
+    pending: List[Tuple[int, str]] = []
+    for index, (depense_id, depense) in enumerate(targets):
+        if depense is not None and patch is not None and not _changes(depense, patch):
+            results[index] = {"status": "unchanged"}
+        else:
+            pending.append((index, depense_id))
+
+    async def preview(depense_id: str) -> Dict[str, Any]:
+        depense = targets_by_id[depense_id]
+        if depense is None:
+            depense = await ctx.api.get_json(f"/depenses/{depense_id}", headers=headers)
+        row = _preview(depense_id, depense, f"would_{verb}")
+        if patch is not None:
+            row["changes"] = _changes(depense, patch)
+        return row
+
+    async def run(depense_id: str) -> Dict[str, Any]:
+        await apply(depense_id)
+        return {"status": f"{verb}d"}
+
+    results.update(await run_bounded(
+        pending, preview if args.dry_run else run, args.concurrency, args.rate_limit, args.stop_on_error,
+    ))
+    if not args.dry_run and pending:
+        # Les recherches suivantes resynchronisent l'index avant de répondre
+        index = loaded_index(ctx)
+        if index is not None:
+            index.synced_at = 0.0
+    summary = summarize({index: {"index": index, "id": targets[index][0], **row} for index, row in results.items()}, len(targets))
+    return {"dry_run": args.dry_run, **summary}
+
+
+async def depenses_update_many(ctx: ToolContext, args: DepensesUpdateManyInput) -> Dict[str, Any]:
+    """Modification en masse (merge-patch) des dépenses visées"""
+    patch = args.changes.model_dump(exclude_unset=True)
+    if not patch:
+        raise ValueError("changes : au moins un champ à modifier est requis")
+    headers = ctx.headers(MERGE_PATCH)
+
+    async def update(depense_id: str) -> None:
+        response = await ctx.api.request("PATCH", f"/depenses/{depense_id}", json=patch, headers=headers)
+        response.raise_for_status()
+
+    return await _run_selection(ctx, args, "update", update, patch)
+
+
+async def depenses_delete_many(ctx: ToolContext, args: DepensesDeleteManyInput) -> Dict[str, Any]:
+    """Suppression en masse des dépenses visées"""
+    headers = ctx.headers()
+
+    async def delete(depense_id: str) -> None:
+        response = await ctx.api.request("DELETE", f"/depenses/{depense_id}", headers=headers)
+        response.raise_for_status()
+
+    return await _run_selection(ctx, args, "delete", delete)
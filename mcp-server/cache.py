@@ -0,0 +1,183 @@
+"""
+Cache LRU des réponses GET de l'API Let-me-count
+
+Les entrées sont isolées par identité (sujet du JWT), expirent selon un TTL
+propre à chaque ressource et sont revalidées via If-None-Match /
+If-Modified-Since lorsque l'API fournit un ETag ou un Last-Modified.
+Toute écriture réussie sur une ressource invalide les ressources qui en
+dépendent.
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+# Chemins mis en cache et ressource à laquelle ils appartiennent
+CACHE_POLICIES: Tuple[Tuple[re.Pattern, str], ...] = (
+    (re.compile(r"^/users/(me|\d+)$"), "users"),
+    (re.compile(r"^/tags(/\d+)?$"), "tags"),
+    (re.compile(r"^/depenses/\d+$"), "depenses"),
+)
+
+# Ressources à invalider après une écriture sur une ressource donnée
+# (le solde des utilisateurs dépend des dépenses, les utilisateurs exposent leurs tags)
+INVALIDATIONS: Dict[str, Tuple[str, ...]] = {
+    "depenses": ("depenses", "users"),
+    "tags": ("tags", "users"),
+    "users": ("users", "tags"),
+}
+
+DEFAULT_TTLS: Dict[str, float] = {
+    "users": float(os.getenv("LETMECOUNT_CACHE_TTL_USERS", "120")),
+    "tags": float(os.getenv("LETMECOUNT_CACHE_TTL_TAGS", "300")),
+    "depenses": float(os.getenv("LETMECOUNT_CACHE_TTL_DEPENSES", "60")),
+}
+
+CacheKey = Tuple[Optional[str], str, str, Tuple[Tuple[str, str], ...]]
+
+
+def resource_of(endpoint: str) -> Optional[str]:
+    """Nom de la ressource d'un chemin d'API (`/depenses/3` → `depenses`)"""
+    name = endpoint.lstrip("/").split("/", 1)[0].split("?", 1)[0]
+    return name or None
+
+
+@dataclass
+class CacheEntry:
+    resource: str
+    data: Any
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """En-têtes de requête conditionnelle"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Cache LRU en mémoire avec TTL par ressource et compteurs de hit/miss"""
+
+    def __init__(self, max_entries: int = 512, ttls: Optional[Mapping[str, float]] = None):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Génération connue de chaque ressource dans le stockage partagé entre workers
+        self.generations: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Cache configuré par LETMECOUNT_CACHE_SIZE (0 désactive le cache)"""
+        size = int(os.getenv("LETMECOUNT_CACHE_SIZE", "512"))
+        return cls(size) if size > 0 else None
+
+    @staticmethod
+    def policy(endpoint: str) -> Optional[str]:
+        """Ressource du chemin si celui-ci est cacheable, None sinon"""
+        for pattern, resource in CACHE_POLICIES:
+            if pattern.match(endpoint):
+                return resource
+        return None
+
+    @staticmethod
+    def key(identity: Optional[str], method: str, endpoint: str, params: Optional[Mapping[str, Any]] = None) -> CacheKey:
+        items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return identity, method.upper(), endpoint, items
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        """Entrée (éventuellement expirée) associée à la clé"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: CacheKey, resource: str, data: Any, headers: Mapping[str, str]) -> None:
+        self._entries[key] = CacheEntry(
+            resource=resource,
+            data=data,
+            expires_at=time.monotonic() + self.ttls.get(resource, 0.0),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(self, entry: CacheEntry) -> None:
+        """Prolonge une entrée revalidée par un 304"""
+        entry.expires_at = time.monotonic() + self.ttls.get(entry.resource, 0.0)
+        self.revalidations += 1
+
+    def invalidate(self, resources: Iterable[str]) -> None:
+        """Supprime les entrées des ressources données, pour toutes les identités"""
+        resources = set(resources)
+        stale = [key for key, entry in self._entries.items() if entry.resource in resources]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def invalidate_paths(self, endpoints: Iterable[str]) -> None:
+        """Supprime les entrées de chemins précis (`/depenses/3`), pour toutes les identités"""
+        endpoints = set(endpoints)
+        stale = [key for key in self._entries if key[2] in endpoints]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def expire_paths(self, endpoints: Iterable[str]) -> None:
+        """Force la revalidation (requête conditionnelle) des entrées de ces chemins"""
+        endpoints = set(endpoints)
+        for key, entry in self._entries.items():
+            if key[2] in endpoints:
+                entry.expires_at = 0.0
+
+    def invalidate_after_write(self, endpoint: str) -> Tuple[str, ...]:
+        """Invalide les ressources touchées par une écriture et les renvoie"""
+        resource = resource_of(endpoint)
+        if not resource:
+            return ()
+        resources = INVALIDATIONS.get(resource, ())
+        self.invalidate(resources)
+        return resources
+
+    def observe_generation(self, resource: str, generation: Optional[int]) -> None:
+        """Vide la ressource si un autre worker y a écrit depuis la dernière lecture"""
+        generation = generation or 0
+        if self.generations.get(resource, 0) != generation:
+            self.invalidate((resource,))
+            self.generations[resource] = generation
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "ttls": self.ttls,
+        }
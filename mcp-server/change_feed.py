@@ -0,0 +1,277 @@
+"""
+Flux des modifications de dépenses (outil depenses_watch)
+
+Le backend journalise chaque création et modification de dépense dans /logs
+(DepenseLogListener), trié par date décroissante : le flux lit ce journal
+depuis un curseur jusqu'au dernier log déjà vu, au lieu de relire /depenses.
+Les logs d'une dépense supprimée disparaissent avec elle (ON DELETE CASCADE) ;
+les suppressions sont donc détectées quand `totalItems` sur /depenses est
+inférieur au total du curseur augmenté des créations lues depuis.
+
+Chaque lecture alimente aussi les caches locaux : entrées du cache des
+réponses invalidées, index de recherche mis à jour sans relire le journal.
+Avec `subscribe`, une tâche de fond interroge le journal à intervalle adaptatif
+(court après un changement, allongé tant que rien ne bouge) et pousse les
+changements à la session MCP sous forme de notifications.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel, Field
+
+from auth import identity_from_headers
+from pagination import collection_members, collection_total
+from registry import ToolContext
+from search_index import iri_id, loaded_index, scan_logs
+
+logger = logging.getLogger(__name__)
+
+POLL_MIN = float(os.getenv("LETMECOUNT_WATCH_POLL_MIN", "2"))
+POLL_MAX = float(os.getenv("LETMECOUNT_WATCH_POLL_MAX", "60"))
+# Au-delà, le curseur est trop ancien : le client doit se resynchroniser
+MAX_LOG_PAGES = int(os.getenv("LETMECOUNT_WATCH_MAX_LOG_PAGES", "10"))
+
+
+class DepensesWatchInput(BaseModel):
+    cursor: Optional[str] = Field(
+        None, description="Curseur renvoyé par l'appel précédent ; absent : position actuelle, sans changement",
+    )
+    wait: float = Field(0, ge=0, le=60, description="Attente maximale en secondes de nouveaux changements (long polling)")
+    limit: int = Field(100, ge=1, le=1000, description="Nombre maximum de changements renvoyés")
+    include_depense: bool = Field(False, description="Joindre la dépense à jour aux créations et modifications")
+    subscribe: Optional[bool] = Field(
+        None, description="true : pousser les changements à cette session par notifications ; false : arrêter",
+    )
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Dernier log vu et nombre de dépenses visibles à ce moment"""
+
+    log: int
+    total: int
+
+    def __str__(self) -> str:
+        return f"{self.log}-{self.total}"
+
+    @classmethod
+    def parse(cls, value: str) -> "Cursor":
+        try:
+            log, total = value.split("-")
+            return cls(int(log), int(total))
+        except ValueError:
+            raise ValueError(f"Curseur invalide : {value}") from None
+
+
+@dataclass
+class FeedPage:
+    changes: List[Dict[str, Any]]
+    cursor: Cursor
+    more: bool = False
+    # Curseur trop ancien : des changements ont pu être perdus
+    gap: bool = False
+
+
+def log_change(log: Dict[str, Any]) -> Dict[str, Any]:
+    iri = log.get("depense")
+    return {
+        "log": log["id"],
+        "action": log.get("action"),
+        "date": log.get("date"),
+        "depense": iri,
+        "id": iri_id(iri) if iri else None,
+        "libelle": log.get("libelle"),
+        "montant": log.get("montant"),
+        "user": log.get("user"),
+    }
+
+
+class ChangeFeed:
+    """Lecture incrémentale du journal pour une identité"""
+
+    def __init__(self):
+        self.interval = POLL_MIN
+        self.polls = 0
+
+    def adapt(self, changed: bool) -> None:
+        self.interval = POLL_MIN if changed else min(POLL_MAX, self.interval * 1.5)
+
+    async def position(self, ctx: ToolContext) -> Cursor:
+        headers = ctx.headers()
+        logs, depenses = await asyncio.gather(
+            ctx.api.get_json("/logs", params={"page": 1}, headers=headers),
+            ctx.api.get_json("/depenses", params={"page": 1}, headers=headers),
+        )
+        members = collection_members(logs)
+        return Cursor(members[0]["id"] if members else 0, collection_total(depenses) or 0)
+
+    async def read(self, ctx: ToolContext, since: Cursor, limit: int) -> FeedPage:
+        """Changements postérieurs au curseur, du plus ancien au plus récent"""
+        headers = ctx.headers()
+        self.polls += 1
+        depenses = asyncio.ensure_future(ctx.api.get_json("/depenses", params={"page": 1}, headers=headers))
+        try:
+            logs, head, complete = await scan_logs(ctx, headers, since.log, MAX_LOG_PAGES)
+            total = collection_total(await depenses) or 0
+        finally:
+            depenses.cancel()
+
+        if not complete:
+            self.adapt(True)
+            return FeedPage([], Cursor(head, total), gap=True)
+
+        logs.sort(key=lambda log: log["id"])
+        more = len(logs) > limit
+        changes = [log_change(log) for log in logs[:limit]]
+        # Une création et une suppression entre deux lectures se compensent dans `totalItems` :
+        # le total attendu compte les créations lues depuis le curseur
+        expected = since.total + sum(change["action"] == "CREATE" for change in changes)
+        if more:
+            # Suite au prochain appel ; le décompte des suppressions attend la fin du rattrapage
+            cursor = Cursor(changes[-1]["log"], expected)
+        else:
+            cursor = Cursor(max(head, since.log), total)
+            if total < expected:
+                changes.append({"log": None, "action": "DELETE", "depense": None, "id": None,
+                                "count": expected - total})
+        self.adapt(bool(changes))
+        return FeedPage(changes, cursor, more=more)
+
+
+async def feed_caches(ctx: ToolContext, since: Cursor, page: FeedPage) -> None:
+    """Répercute les changements lus sur le cache des réponses et l'index de recherche"""
+    if not page.changes and not page.gap:
+        return
+    deleted = page.gap or any(change["depense"] is None for change in page.changes)
+    iris = {change["depense"] for change in page.changes if change["depense"]}
+    cache = ctx.api.cache
+    if cache is not None:
+        # Les soldes des utilisateurs dépendent des dépenses
+        cache.invalidate(("depenses", "users") if deleted else ("users",))
+        cache.invalidate_paths(iris)
+
+    index = loaded_index(ctx)
+    if index is None:
+        return
+    async with index.lock:
+        watermark = index.watermark
+        if deleted or watermark is None or watermark < since.log:
+            # L'index ne peut pas être complété par ces seuls logs : synchronisation à la prochaine recherche
+            index.synced_at = 0.0
+        elif watermark < page.cursor.log:
+            newer = {change["depense"] for change in page.changes if change["depense"] and change["log"] > watermark}
+            await index.apply_changes(ctx, watermark, newer, page.cursor.log)
+
+
+async def attach_depenses(ctx: ToolContext, changes: List[Dict[str, Any]]) -> None:
+    """Ajoute l'état actuel de chaque dépense créée ou modifiée (None si elle n'est plus visible)"""
+    headers = ctx.headers()
+
+    async def fetch(iri: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await ctx.api.get_json(iri, headers=headers)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (403, 404):
+                return None
+            raise
+
+    iris = sorted({change["depense"] for change in changes if change["depense"]})
+    found = dict(zip(iris, await asyncio.gather(*(fetch(iri) for iri in iris))))
+    for change in changes:
+        if change["depense"]:
+            change["data"] = found[change["depense"]]
+
+
+# --- Abonnements ---
+
+# Un flux par identité, une tâche de diffusion par session MCP
+_feeds: Dict[Optional[str], ChangeFeed] = {}
+_watchers: Dict[int, "asyncio.Task[None]"] = {}
+
+
+def feed_for(ctx: ToolContext) -> ChangeFeed:
+    identity = identity_from_headers(ctx.headers())
+    feed = _feeds.get(identity)
+    if feed is None:
+        feed = _feeds[identity] = ChangeFeed()
+    return feed
+
+
+async def _push(ctx: ToolContext, session: Any, cursor: Cursor, include_depense: bool) -> None:
+    feed = feed_for(ctx)
+    while True:
+        await asyncio.sleep(feed.interval)
+        try:
+            await ctx.credentials.ensure_fresh(ctx.api)
+            page = await feed.read(ctx, cursor, limit=1000)
+            await feed_caches(ctx, cursor, page)
+            if include_depense:
+                await attach_depenses(ctx, page.changes)
+        except Exception as e:
+            # API indisponible ou disjoncteur ouvert : nouvel essai au prochain intervalle
+            logger.warning("depenses_watch : lecture du journal impossible (%s)", e)
+            feed.adapt(False)
+            continue
+        cursor = page.cursor
+        if page.changes or page.gap:
+            await session.send_log_message(
+                level="info",
+                data={"event": "depenses_watch", "cursor": str(cursor), "changes": page.changes, "gap": page.gap},
+                logger="letmecount.depenses_watch",
+            )
+
+
+def subscribe(ctx: ToolContext, cursor: Cursor, include_depense: bool) -> None:
+    if ctx.session is None:
+        raise ValueError("Abonnement impossible sans session MCP persistante (transport HTTP sans état) : "
+                         "utilisez `cursor` et `wait`")
+    unsubscribe(ctx)
+    key = id(ctx.session)
+    task = _watchers[key] = asyncio.create_task(_push(ctx, ctx.session, cursor, include_depense))
+    # Fin de la session (envoi impossible) : la tâche s'arrête et se désinscrit
+    task.add_done_callback(lambda done: _watchers.pop(key, None) if _watchers.get(key) is done else None)
+
+
+def unsubscribe(ctx: ToolContext) -> bool:
+    task = _watchers.pop(id(ctx.session), None) if ctx.session is not None else None
+    if task is None:
+        return False
+    task.cancel()
+    return True
+
+
+async def depenses_watch(ctx: ToolContext, args: DepensesWatchInput) -> Dict[str, Any]:
+    """Changements de dépenses depuis un curseur, avec attente optionnelle"""
+    feed = feed_for(ctx)
+    if args.cursor is None:
+        page = FeedPage([], await feed.position(ctx))
+    else:
+        since = Cursor.parse(args.cursor)
+        deadline = time.monotonic() + args.wait
+        while True:
+            page = await feed.read(ctx, since, args.limit)
+            remaining = deadline - time.monotonic()
+            if page.changes or page.gap or remaining <= 0:
+                break
+            await asyncio.sleep(min(feed.interval, remaining))
+        await feed_caches(ctx, since, page)
+        if args.include_depense:
+            await attach_depenses(ctx, page.changes)
+
+    result: Dict[str, Any] = {"cursor": str(page.cursor), "changes": page.changes, "more": page.more}
+    if page.gap:
+        result["gap"] = True
+    if args.subscribe:
+        subscribe(ctx, page.cursor, args.include_depense)
+        result["subscribed"] = True
+    elif args.subscribe is False:
+        result["subscribed"] = False
+        unsubscribe(ctx)
+    result["poll_interval"] = round(feed.interval, 1)
+    return result
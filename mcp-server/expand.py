@@ -0,0 +1,173 @@
+"""
+Expansion des IRIs d'utilisateurs et de tags dans les dépenses
+
+Dans une dépense, `payePar`, `tag` et `details[].user` sont des IRIs
+(`/users/3`). Avec `expand`, chacun est remplacé par un objet portant son
+libellé : `{"@id": "/users/3", "id": 3, "username": "bob"}` ou
+`{"@id": "/tags/1", "id": 1, "libelle": "Vacances"}`.
+
+Les libellés sont gardés dans une table d'identité par utilisateur connecté.
+Les IRIs inconnus d'un résultat sont résolus en un seul lot : lecture des
+collections /users et /tags (une ou deux pages chacune), puis lecture
+individuelle, concurrente et dédoublonnée, des IRIs qui n'y figurent pas.
+Une page de dépenses coûte donc au plus deux requêtes de plus, aucune tant que
+la table est à jour.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Set, Tuple
+
+import httpx
+from pydantic import BaseModel, Field
+
+from auth import identity_from_headers
+from pagination import DEFAULT_MAX_ITEMS, CollectionStream
+from registry import ToolContext
+from search_index import iri_id
+
+EXPAND_TTL = float(os.getenv("LETMECOUNT_EXPAND_TTL", "300"))
+# Collection → champ servant de libellé
+LABELS = {"users": "username", "tags": "libelle"}
+
+
+class ExpandInput(BaseModel):
+    expand: bool = Field(
+        default=False,
+        description="Remplacer les IRIs payePar, tag et details.user par {@id, id, username | libelle}",
+    )
+
+
+def _kind(iri: str) -> Optional[str]:
+    parts = iri.strip("/").split("/")
+    return parts[0] if len(parts) == 2 and parts[0] in LABELS and parts[1].isdigit() else None
+
+
+def depense_iris(depense: Any) -> Set[str]:
+    """IRIs d'utilisateurs et de tags référencés par une dépense"""
+    if not isinstance(depense, dict):
+        return set()
+    values = [depense.get("payePar"), depense.get("tag")]
+    values += [detail.get("user") for detail in depense.get("details") or [] if isinstance(detail, dict)]
+    return {value for value in values if isinstance(value, str) and _kind(value)}
+
+
+class IdentityMap:
+    """Libellés des utilisateurs et des tags déjà vus, avec leur date de lecture"""
+
+    def __init__(self):
+        # IRI → (libellé, lu à) ; libellé None : inaccessible (403/404)
+        self.labels: Dict[str, Tuple[Optional[str], float]] = {}
+        # Collection → date de sa dernière lecture complète
+        self.loaded: Dict[str, float] = {}
+        self.requests = 0
+        self.lock = asyncio.Lock()
+
+    def _fresh(self, stamp: Optional[float]) -> bool:
+        return stamp is not None and time.monotonic() - stamp < EXPAND_TTL
+
+    def known(self, iri: str) -> bool:
+        entry = self.labels.get(iri)
+        return entry is not None and self._fresh(entry[1])
+
+    async def _load_collection(self, ctx: ToolContext, kind: str) -> None:
+        stream = CollectionStream(ctx.api, f"/{kind}", headers=ctx.headers(), max_items=DEFAULT_MAX_ITEMS)
+        now = time.monotonic()
+        try:
+            async for item in stream:
+                if isinstance(item, dict) and isinstance(item.get("@id"), str):
+                    self.labels[item["@id"]] = (item.get(LABELS[kind]), now)
+        finally:
+            self.requests += stream.pages
+        self.loaded[kind] = now
+
+    async def _load_one(self, ctx: ToolContext, iri: str) -> None:
+        self.requests += 1
+        try:
+            item = await ctx.api.get_json(iri, headers=ctx.headers())
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in (403, 404):
+                raise
+            item = {}
+        self.labels[iri] = (item.get(LABELS[_kind(iri)]) if isinstance(item, dict) else None, time.monotonic())
+
+    async def preload(self, ctx: ToolContext) -> None:
+        """Lit les collections qui ne l'ont pas été depuis EXPAND_TTL"""
+        async with self.lock:
+            kinds = [kind for kind in LABELS if not self._fresh(self.loaded.get(kind))]
+            await asyncio.gather(*(self._load_collection(ctx, kind) for kind in kinds))
+
+    async def resolve(self, ctx: ToolContext, iris: Iterable[str]) -> None:
+        """Résout en un lot les IRIs absents de la table"""
+        if all(self.known(iri) for iri in iris):
+            return
+        async with self.lock:
+            missing = {iri for iri in iris if not self.known(iri)}
+            # Plusieurs IRIs d'une même collection : une lecture de la collection plutôt qu'une par IRI
+            kinds = {_kind(iri) for iri in missing}
+            batch = [kind for kind in kinds
+                     if sum(_kind(iri) == kind for iri in missing) > 1 and not self._fresh(self.loaded.get(kind))]
+            await asyncio.gather(*(self._load_collection(ctx, kind) for kind in batch))
+            await asyncio.gather(*(self._load_one(ctx, iri) for iri in missing if not self.known(iri)))
+
+    def inline(self, iri: Any) -> Any:
+        if not isinstance(iri, str) or _kind(iri) is None:
+            return iri
+        expanded: Dict[str, Any] = {"@id": iri, "id": iri_id(iri)}
+        label = self.labels.get(iri, (None, 0.0))[0]
+        if label is not None:
+            expanded[LABELS[_kind(iri)]] = label
+        return expanded
+
+    def expand(self, depense: Any) -> Any:
+        """Copie de la dépense, IRIs remplacés (la dépense reçue peut venir du cache)"""
+        if not isinstance(depense, dict):
+            return depense
+        expanded = dict(depense)
+        for key in ("payePar", "tag"):
+            if key in expanded:
+                expanded[key] = self.inline(expanded[key])
+        if isinstance(expanded.get("details"), list):
+            expanded["details"] = [
+                {**detail, "user": self.inline(detail.get("user"))} if isinstance(detail, dict) and "user" in detail else detail
+                for detail in expanded["details"]
+            ]
+        return expanded
+
+
+# Une table par identité
+_maps: Dict[Optional[str], IdentityMap] = {}
+
+
+def identity_map(ctx: ToolContext) -> IdentityMap:
+    key = identity_from_headers(ctx.headers())
+    identities = _maps.get(key)
+    if identities is None:
+        identities = _maps[key] = IdentityMap()
+    return identities
+
+
+async def expand_depense(ctx: ToolContext, depense: Any) -> Any:
+    identities = identity_map(ctx)
+    await identities.resolve(ctx, depense_iris(depense))
+    return identities.expand(depense)
+
+
+async def expand_depenses(ctx: ToolContext, depenses: AsyncIterable[Any]) -> AsyncIterator[Any]:
+    """
+    Dépenses développées au fil de la lecture ; les collections sont lues en
+    même temps que la première page, les IRIs restants résolus à la demande
+    """
+    identities = identity_map(ctx)
+    preload = asyncio.ensure_future(identities.preload(ctx))
+    try:
+        async for depense in depenses:
+            if preload is not None:
+                await preload
+                preload = None
+            await identities.resolve(ctx, depense_iris(depense))
+            yield identities.expand(depense)
+    finally:
+        if preload is not None:
+            preload.cancel()
@@ -0,0 +1,135 @@
+"""
+Démarrage rapide du serveur stdio
+
+Importer le SDK MCP, httpx et pydantic prend plusieurs centaines de
+millisecondes, alors qu'une session courte ne fait souvent que `initialize`
+et `tools/list`. Ce module, limité à la bibliothèque standard, répond à ces
+requêtes (et à `ping`) depuis un instantané des schémas écrit par le serveur
+complet dans LETMECOUNT_DATA_DIR. À la première autre requête, le serveur
+complet (stdio_app.py) est chargé et reçoit les messages déjà lus : la
+requête `initialize` rejouée, dont la réponse est écartée, puis la suite.
+
+Le chargement commence en arrière-plan dès la fin de l'initialisation.
+L'instantané est ignoré (et réécrit) si le code du serveur, les versions de
+mcp et pydantic ou les variables LETMECOUNT_* ont changé.
+LETMECOUNT_FAST_START=0 désactive ce mode.
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from storage import data_path
+
+FAST_START = os.getenv("LETMECOUNT_FAST_START", "1") != "0"
+SERVER_DIR = Path(__file__).resolve().parent
+SNAPSHOT_FILE = "stdio-snapshot.json"
+# Identifiant de la requête initialize rejouée au serveur complet
+REPLAY_ID = "letmecount-fast-start"
+# Paquets dont dépendent les schémas et le protocole
+DEPENDENCIES = ("mcp", "pydantic")
+
+
+def fingerprint() -> str:
+    """Empreinte de tout ce qui détermine l'instantané"""
+    digest = hashlib.sha256(sys.version.encode())
+    for path in sorted(SERVER_DIR.glob("*.py")):
+        digest.update(path.name.encode() + b"\0" + path.read_bytes())
+    for name in DEPENDENCIES:
+        spec = find_spec(name)
+        origin = spec.origin if spec is not None else None
+        stamp = os.stat(origin).st_mtime_ns if origin else 0
+        digest.update(f"{name}\0{origin}\0{stamp}".encode())
+    for key, value in sorted(os.environ.items()):
+        if key.startswith("LETMECOUNT_"):
+            digest.update(f"{key}\0{value}".encode())
+    return digest.hexdigest()
+
+
+def load_snapshot() -> Optional[Dict[str, Any]]:
+    """Instantané à jour, ou None"""
+    try:
+        with open(data_path(SNAPSHOT_FILE), encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return snapshot if snapshot.get("fingerprint") == fingerprint() else None
+
+
+def save_snapshot(snapshot: Dict[str, Any]) -> None:
+    """Écrit l'instantané ; sans effet si le répertoire de données n'est pas accessible"""
+    try:
+        path = data_path(SNAPSHOT_FILE)
+        tmp = f"{path}.{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({**snapshot, "fingerprint": fingerprint()}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def prewarm() -> None:
+    """Charge le serveur complet en arrière-plan pendant que le client réfléchit"""
+    threading.Thread(target=importlib.import_module, args=("stdio_app",), daemon=True).start()
+
+
+def _reply(message_id: Any, result: Any) -> None:
+    sys.stdout.buffer.write(json.dumps({"jsonrpc": "2.0", "id": message_id, "result": result}).encode() + b"\n")
+    sys.stdout.buffer.flush()
+
+
+def _initialize_result(snapshot: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    requested = params.get("protocolVersion")
+    result = {
+        "protocolVersion": requested if requested in snapshot["protocol_versions"] else snapshot["latest_protocol_version"],
+        "capabilities": snapshot["capabilities"],
+        "serverInfo": snapshot["server_info"],
+    }
+    if snapshot.get("instructions"):
+        result["instructions"] = snapshot["instructions"]
+    return result
+
+
+def serve(snapshot: Dict[str, Any]) -> Optional[List[bytes]]:
+    """
+    Répond depuis l'instantané jusqu'à la première requête qui nécessite le
+    serveur complet ; renvoie alors les lignes à lui rejouer (None : stdin fermé)
+    """
+    stdin = sys.stdin.buffer
+    initialize: Optional[Dict[str, Any]] = None
+    initialized: Optional[bytes] = None
+    for line in iter(stdin.readline, b""):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            message = {}
+        method = message.get("method")
+        params = message.get("params") or {}
+
+        if method == "initialize" and initialize is None:
+            initialize = message
+            _reply(message["id"], _initialize_result(snapshot, params))
+        elif method == "notifications/initialized" and initialize is not None and initialized is None:
+            initialized = line
+            prewarm()
+        elif method == "ping" and "id" in message:
+            _reply(message["id"], {})
+        elif method == "tools/list" and initialized is not None and not params.get("cursor"):
+            _reply(message["id"], {"tools": snapshot["tools"]})
+        else:
+            replay = []
+            if initialize is not None:
+                replay.append(json.dumps({**initialize, "id": REPLAY_ID}).encode() + b"\n")
+            if initialized is not None:
+                replay.append(initialized)
+            replay.append(line)
+            return replay
+    return None
@@ -0,0 +1,151 @@
+"""
+Historique des soldes en série temporelle
+
+Équivalent local de /historique : pour chaque jour comportant une dépense, le
+solde cumulé de chaque utilisateur. La série est tenue en cache et seuls les
+jours modifiés depuis le dernier calcul sont recalculés ; les appels suivants
+ne relisent que les dépenses citées par le journal /logs depuis le dernier
+passage, y compris les modifications de dépenses anciennes.
+Comme pour balances.py, seules les dépenses visibles par l'utilisateur
+connecté sont prises en compte.
+"""
+
+import bisect
+import datetime
+from array import array
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from auth import identity_from_headers
+from balances import BalanceEngine, Contribution
+from registry import ToolContext
+
+
+class HistoriqueSeriesInput(BaseModel):
+    granularity: Literal["daily", "weekly", "monthly"] = Field(default="monthly", description="Pas de temps de la série")
+    start: Optional[str] = Field(default=None, description="Date de début incluse (AAAA-MM-JJ)")
+    end: Optional[str] = Field(default=None, description="Date de fin incluse (AAAA-MM-JJ)")
+    users: Optional[List[str]] = Field(default=None, description="IRIs des utilisateurs à inclure (tous par défaut)")
+    tag: Optional[str] = Field(default=None, description="Restreindre aux dépenses d'un tag (IRI)")
+    refresh: Literal["auto", "full"] = Field(default="auto", description="auto : synchronisation incrémentale, full : relecture complète")
+
+
+def bucket(day: str, granularity: str) -> str:
+    """Libellé du pas de temps contenant le jour (lundi de la semaine, mois)"""
+    if granularity == "monthly":
+        return day[:7]
+    if granularity == "weekly":
+        date = datetime.date.fromisoformat(day)
+        return (date - datetime.timedelta(days=date.weekday())).isoformat()
+    return day
+
+
+class HistoryEngine(BalanceEngine):
+    """Moteur de soldes conservant les variations journalières"""
+
+    def __init__(self):
+        super().__init__()
+        self.dates: Dict[str, str] = {}
+        # Variations par jour : jour → {index utilisateur: centimes}
+        self.deltas: Dict[str, Dict[int, int]] = {}
+        # Série cumulée calculée, triée par jour, valable jusqu'à `_dirty_from` exclu
+        self._days: List[str] = []
+        self._cumulative: List[array] = []
+        self._dirty_from: Optional[str] = None
+
+    def _shift(self, day: str, contribution: Contribution, sign: int) -> None:
+        payer, montant, shares = contribution
+        delta = self.deltas.setdefault(day, {})
+        delta[payer] = delta.get(payer, 0) + sign * montant
+        for user, share in shares:
+            delta[user] = delta.get(user, 0) - sign * share
+        if self._dirty_from is None or day < self._dirty_from:
+            self._dirty_from = day
+
+    def upsert(self, depense: Dict[str, Any]) -> bool:
+        iri = depense["@id"]
+        day = depense["date"][:10]
+        previous = self.contributions.get(iri)
+        previous_day = self.dates.get(iri)
+        if not super().upsert(depense) and previous_day == day:
+            return False
+        if previous is not None:
+            self._shift(previous_day, previous, -1)
+        self._shift(day, self.contributions[iri], 1)
+        self.dates[iri] = day
+        return True
+
+    def remove(self, iri: str) -> bool:
+        previous = self.contributions.get(iri)
+        if not super().remove(iri):
+            return False
+        self._shift(self.dates.pop(iri), previous, -1)
+        return True
+
+    def reset(self) -> None:
+        super().reset()
+        self.dates.clear()
+        self.deltas.clear()
+        self._days, self._cumulative, self._dirty_from = [], [], None
+
+    def series(self) -> Tuple[List[str], List[array]]:
+        """Soldes cumulés par jour, recalculés à partir du premier jour modifié"""
+        if self._dirty_from is not None:
+            keep = bisect.bisect_left(self._days, self._dirty_from)
+            del self._days[keep:]
+            del self._cumulative[keep:]
+            running = array("q", self._cumulative[-1]) if self._cumulative else array("q")
+            for day in sorted(d for d in self.deltas if d >= self._dirty_from):
+                running.extend([0] * (len(self.users) - len(running)))
+                for user, cents in self.deltas[day].items():
+                    running[user] += cents
+                self._days.append(day)
+                self._cumulative.append(array("q", running))
+            self._dirty_from = None
+        return self._days, self._cumulative
+
+    def view(self, args: HistoriqueSeriesInput) -> Dict[str, Any]:
+        days, cumulative = self.series()
+        users = args.users if args.users is not None else self.users
+        indexes = [(user, self.user_index.get(user)) for user in users]
+
+        # Dernier point de chaque pas de temps dans l'intervalle demandé
+        points: Dict[str, array] = {}
+        for day, soldes in zip(days, cumulative):
+            if (args.start and day < args.start) or (args.end and day > args.end[:10]):
+                continue
+            points[bucket(day, args.granularity)] = soldes
+
+        return {
+            "granularity": args.granularity,
+            "dates": list(points),
+            "series": {
+                user: [
+                    soldes[index] / 100 if index is not None and index < len(soldes) else 0.0
+                    for soldes in points.values()
+                ]
+                for user, index in indexes
+            },
+        }
+
+
+# Un moteur par identité et par filtre de tag
+_engines: Dict[Tuple[Optional[str], Optional[str]], HistoryEngine] = {}
+
+
+def engine_for(ctx: ToolContext, tag: Optional[str]) -> HistoryEngine:
+    key = (identity_from_headers(ctx.headers()), tag)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = _engines[key] = HistoryEngine()
+    return engine
+
+
+async def historique_series(ctx: ToolContext, args: HistoriqueSeriesInput) -> Dict[str, Any]:
+    """Série des soldes cumulés, échantillonnée par jour, semaine ou mois"""
+    engine = engine_for(ctx, args.tag)
+    params = {"tag": args.tag} if args.tag else {}
+    async with engine.lock:
+        sync = await engine.sync(ctx, params, full=args.refresh == "full")
+        return {**engine.view(args), "sync": sync}
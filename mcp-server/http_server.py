@@ -1,271 +1,217 @@
 #!/usr/bin/env python3
 """
 HTTP Server for the Let-me-count API using FastMCP and FastAPI.
+
+With a shared store (LETMECOUNT_STORE=sqlite:// or redis://) the server can run
+several workers (LETMECOUNT_MCP_WORKERS) or replicas: the MCP transport is then
+stateless and session credentials live in the store, so any worker can serve
+any request without sticky routing.
 """
 import os
-from typing import Any, Dict, List, Optional
+import secrets
+from contextlib import asynccontextmanager
+from typing import Any
 
-import httpx
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastmcp import FastMCP
-from pydantic import BaseModel, Field
+from fastmcp.server.dependencies import get_context
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+import resources
+from api_client import ApiClient
+from auth import SessionStore, SharedSessionStore
+from projection import dumps
+from registry import ToolContext, ToolSpec, run_tool
+from shared_store import open_store
+from tools import TOOLS
 
 # --- Configuration ---
 BASE_URL = os.getenv("LETMECOUNT_API_URL", "http://localhost:8888")
-JWT_TOKEN: Optional[str] = None
+WORKERS = int(os.getenv("LETMECOUNT_MCP_WORKERS", "1"))
+
+# --- Shared state (sessions, cache generations, rate limit) ---
+store = open_store()
+STATELESS = store.shared
+
+# --- Shared HTTP client (one connection pool per process) ---
+api = ApiClient.from_env(BASE_URL, store)
+
+# --- Per-session credentials (JWT + refresh token of each MCP client) ---
+sessions = SharedSessionStore(store) if STATELESS else SessionStore()
+
+
+def current_session_id() -> str:
+    try:
+        return get_context().session_id
+    except RuntimeError:
+        return "default"
+
+
+def tool_context(credentials) -> ToolContext:
+    """Context of a tool call; the MCP session is only kept for push notifications when stateful."""
+    session = None
+    if not STATELESS:
+        try:
+            session = get_context().session
+        except RuntimeError:
+            pass
+    return ToolContext(api, credentials, session)
+
 
 # --- FastMCP Server Initialization ---
 mcp = FastMCP("letmecount-api")
 
-# --- API Request Helper ---
-async def get_headers() -> Dict[str, str]:
-    """Return HTTP headers with authentication."""
-    headers = {"Content-Type": "application/ld+json"}
-    if JWT_TOKEN:
-        headers["Authorization"] = f"Bearer {JWT_TOKEN}"
-    return headers
-
-async def make_api_request(
-    method: str,
-    endpoint: str,
-    **kwargs,
-) -> Any:
-    """Make a request to the backend API."""
-    async with httpx.AsyncClient() as client:
-        try:
-            url = f"{BASE_URL}{endpoint}"
-            
-            # Get default headers and merge with any custom headers
-            headers = await get_headers()
-            if "headers" in kwargs:
-                headers.update(kwargs.pop("headers"))
-
-            response = await client.request(method, url, headers=headers, **kwargs)
-            response.raise_for_status()
-
-            if response.status_code == 204:  # No Content
-                return "Operation successful."
-            
-            return response.json()
-
-        except httpx.HTTPStatusError as e:
-            return f"Erreur HTTP: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Erreur: {str(e)}"
-
-# --- Authentication ---
-class AuthLoginInput(BaseModel):
-    username: str = Field(..., description="Username")
-    password: str = Field(..., description="Password")
-
-@mcp.tool
-async def auth_login(input: AuthLoginInput) -> str:
-    """Se connecter à l'API avec username/password pour obtenir un token JWT"""
-    global JWT_TOKEN
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/auth",
-                json={"username": input.username, "password": input.password},
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            data = response.json()
-            JWT_TOKEN = data["token"]
-            return "Connexion réussie. Token JWT configuré."
-        except httpx.HTTPStatusError as e:
-            return f"Erreur d'authentification: {e.response.status_code} - {e.response.text}"
-        except Exception as e:
-            return f"Erreur: {str(e)}"
-
-# --- Dépenses ---
-class DepensesListInput(BaseModel):
-    page: int = Field(default=1, description="Numéro de page")
-    tag: Optional[str] = Field(default=None, description="Filtrer par tag")
-    tags: Optional[List[str]] = Field(default=None, description="Filtrer par plusieurs tags")
-
-@mcp.tool
-async def depenses_list(input: DepensesListInput) -> Dict[str, Any]:
-    """Récupérer la liste des dépenses avec filtres optionnels"""
-    params = input.dict(exclude_none=True)
-    if 'tags' in params:
-        params['tag[]'] = params.pop('tags')
-    return await make_api_request("GET", "/depenses", params=params)
-
-class DetailInput(BaseModel):
-    user: str = Field(..., description="IRI de l'utilisateur")
-    parts: int = Field(..., description="Nombre de parts", ge=0)
-    montant: float = Field(..., description="Montant pour ce détail")
-
-class DepensesCreateInput(BaseModel):
-    titre: str = Field(..., description="Titre de la dépense", max_length=255)
-    montant: float = Field(..., description="Montant total de la dépense", ge=0)
-    date: str = Field(..., description="Date de la dépense")
-    partage: str = Field(..., description="Mode de partage")
-    payePar: str = Field(..., description="IRI de l'utilisateur qui a payé")
-    tag: Optional[str] = Field(default=None, description="IRI du tag (optionnel)")
-    details: List[DetailInput] = Field(..., min_items=1)
-
-@mcp.tool
-async def depenses_create(input: DepensesCreateInput) -> Dict[str, Any]:
-    """Créer une nouvelle dépense"""
-    return await make_api_request("POST", "/depenses", json=input.dict())
-
-class DepensesGetInput(BaseModel):
-    id: str = Field(..., description="ID de la dépense")
-
-@mcp.tool
-async def depenses_get(input: DepensesGetInput) -> Dict[str, Any]:
-    """Récupérer une dépense par son ID"""
-    return await make_api_request("GET", f"/depenses/{input.id}")
-
-class DepensesUpdateInput(BaseModel):
-    id: str = Field(..., description="ID de la dépense")
-    titre: Optional[str] = Field(default=None, description="Titre de la dépense", max_length=255)
-    montant: Optional[float] = Field(default=None, description="Montant total de la dépense", ge=0)
-    date: Optional[str] = Field(default=None, description="Date de la dépense")
-    partage: Optional[str] = Field(default=None, description="Mode de partage")
-    payePar: Optional[str] = Field(default=None, description="IRI de l'utilisateur qui a payé")
-    tag: Optional[str] = Field(default=None, description="IRI du tag (optionnel)")
-
-@mcp.tool
-async def depenses_update(input: DepensesUpdateInput) -> Dict[str, Any]:
-    """Mettre à jour une dépense existante"""
-    data = input.dict(exclude_unset=True, exclude={"id"})
-    return await make_api_request(
-        "PATCH",
-        f"/depenses/{input.id}",
-        json=data,
-        headers={"Content-Type": "application/merge-patch+json"},
-    )
-
-class DepensesDeleteInput(BaseModel):
-    id: str = Field(..., description="ID de la dépense")
-
-@mcp.tool
-async def depenses_delete(input: DepensesDeleteInput) -> str:
-    """Supprimer une dépense"""
-    return await make_api_request("DELETE", f"/depenses/{input.id}")
-
-# --- Tags ---
-class TagsListInput(BaseModel):
-    page: int = Field(default=1, description="Numéro de page")
-
-@mcp.tool
-async def tags_list(input: TagsListInput) -> Dict[str, Any]:
-    """Récupérer la liste des tags"""
-    return await make_api_request("GET", "/tags", params=input.dict())
-
-class TagsCreateInput(BaseModel):
-    libelle: str = Field(..., description="Libellé du tag", max_length=255)
-    users: Optional[List[str]] = Field(default=None, description="Liste des IRIs des utilisateurs associés")
-
-@mcp.tool
-async def tags_create(input: TagsCreateInput) -> Dict[str, Any]:
-    """Créer un nouveau tag"""
-    return await make_api_request("POST", "/tags", json=input.dict())
-
-class TagsGetInput(BaseModel):
-    id: str = Field(..., description="ID du tag")
-
-@mcp.tool
-async def tags_get(input: TagsGetInput) -> Dict[str, Any]:
-    """Récupérer un tag par son ID"""
-    return await make_api_request("GET", f"/tags/{input.id}")
-
-class TagsUpdateInput(BaseModel):
-    id: str = Field(..., description="ID du tag")
-    libelle: Optional[str] = Field(default=None, description="Libellé du tag", max_length=255)
-    users: Optional[List[str]] = Field(default=None, description="Liste des IRIs des utilisateurs associés")
-
-@mcp.tool
-async def tags_update(input: TagsUpdateInput) -> Dict[str, Any]:
-    """Mettre à jour un tag existant"""
-    data = input.dict(exclude_unset=True, exclude={"id"})
-    return await make_api_request(
-        "PATCH",
-        f"/tags/{input.id}",
-        json=data,
-        headers={"Content-Type": "application/merge-patch+json"},
-    )
-
-class TagsDeleteInput(BaseModel):
-    id: str = Field(..., description="ID du tag")
-
-@mcp.tool
-async def tags_delete(input: TagsDeleteInput) -> str:
-    """Supprimer un tag"""
-    return await make_api_request("DELETE", f"/tags/{input.id}")
-
-# --- Utilisateurs ---
-class UsersListInput(BaseModel):
-    page: int = Field(default=1, description="Numéro de page")
-    username: Optional[str] = Field(default=None, description="Filtrer par nom d'utilisateur")
-
-@mcp.tool
-async def users_list(input: UsersListInput) -> Dict[str, Any]:
-    """Récupérer la liste des utilisateurs"""
-    return await make_api_request("GET", "/users", params=input.dict(exclude_none=True))
-
-class UsersGetInput(BaseModel):
-    id: str = Field(..., description="ID de l'utilisateur")
-
-@mcp.tool
-async def users_get(input: UsersGetInput) -> Dict[str, Any]:
-    """Récupérer un utilisateur par son ID"""
-    return await make_api_request("GET", f"/users/{input.id}")
-
-@mcp.tool
-async def users_me() -> Dict[str, Any]:
-    """Récupérer les informations de l'utilisateur connecté"""
-    return await make_api_request("GET", "/users/me")
-
-class UsersCreateInput(BaseModel):
-    username: str = Field(..., description="Nom d'utilisateur")
-    email: str = Field(..., description="Adresse email")
-    password: str = Field(..., description="Mot de passe")
-    roles: Optional[List[str]] = Field(default=None, description="Rôles de l'utilisateur (optionnel)")
-
-@mcp.tool
-async def users_create(input: UsersCreateInput) -> Dict[str, Any]:
-    """Créer un nouvel utilisateur (réservé aux administrateurs)"""
-    return await make_api_request("POST", "/users", json=input.dict())
-
-class UsersUpdateCredentialsInput(BaseModel):
-    token: str = Field(..., description="Token de sécurité pour authentification")
-    username: Optional[str] = Field(default=None, description="Nouveau nom d'utilisateur (optionnel)")
-    email: Optional[str] = Field(default=None, description="Nouvelle adresse email (optionnel)")
-    password: Optional[str] = Field(default=None, description="Nouveau mot de passe (optionnel)")
-
-@mcp.tool
-async def users_update_credentials(input: UsersUpdateCredentialsInput) -> Dict[str, Any]:
-    """Mettre à jour les credentials d'un utilisateur via token"""
-    return await make_api_request(
-        "PATCH",
-        "/users",
-        json=input.dict(),
-        headers={"Content-Type": "application/merge-patch+json"},
-    )
-
-class UsersGenerateTokenInput(BaseModel):
-    id: str = Field(..., description="ID de l'utilisateur")
-
-@mcp.tool
-async def users_generate_token(input: UsersGenerateTokenInput) -> Dict[str, Any]:
-    """Générer un token pour un utilisateur (réservé aux administrateurs)"""
-    return await make_api_request("GET", f"/users/{input.id}/token")
+
+def register_tool(spec: ToolSpec) -> None:
+    """Expose a registry tool; its arguments are wrapped in a single `input` object."""
+    if spec.input_model.model_fields:
+        async def tool(input) -> Any:
+            async with sessions.session(current_session_id()) as credentials:
+                return await run_tool(spec, tool_context(credentials), input.model_dump(exclude_unset=True))
+        tool.__annotations__ = {"input": spec.input_model, "return": Any}
+        # `input` may be omitted when all of its fields are optional (users_me, lists)
+        if not any(field.is_required() for field in spec.input_model.model_fields.values()):
+            tool.__defaults__ = (spec.input_model(),)
+    else:
+        async def tool() -> Any:
+            async with sessions.session(current_session_id()) as credentials:
+                return await run_tool(spec, tool_context(credentials), {})
+    mcp.tool(tool, name=spec.name, description=spec.description)
+
+
+# Tools taking local filesystem paths (ledger_*) are not exposed to remote clients
+for spec in TOOLS.values():
+    if not spec.stdio_only:
+        register_tool(spec)
+
+
+# --- Resources (users, tags, months of expenses) ---
+async def read_resource(uri: str) -> str:
+    async with sessions.session(current_session_id()) as credentials:
+        return dumps(await resources.read_resource(tool_context(credentials), uri))
+
+
+def resource_template(uri_template: str):
+    name, description = resources.RESOURCE_TEMPLATES[uri_template]
+    return mcp.resource(uri_template, name=name, description=description, mime_type=resources.MIME_TYPE)
+
+
+@mcp.resource(resources.CURRENT_USER[0], name=resources.CURRENT_USER[1], mime_type=resources.MIME_TYPE)
+async def current_user_resource() -> str:
+    return await read_resource(resources.CURRENT_USER[0])
+
+
+@resource_template("letmecount://users/{id}")
+async def user_resource(id: str) -> str:
+    return await read_resource(f"letmecount://users/{id}")
+
+
+@resource_template("letmecount://tags/{id}")
+async def tag_resource(id: str) -> str:
+    return await read_resource(f"letmecount://tags/{id}")
+
+
+@resource_template("letmecount://depenses/{month}")
+async def month_resource(month: str) -> str:
+    return await read_resource(f"letmecount://depenses/{month}")
+
+
+if not STATELESS:
+    # Subscriptions need a session that outlives the request; FastMCP has no API
+    # for them, so the handlers are registered on its low-level server.
+    low_level = mcp._mcp_server
+
+    def request_session():
+        request_context = low_level.request_context
+        session_id = request_context.request.headers.get("mcp-session-id", "default")
+        return request_context.session, sessions.get(session_id)
+
+    @low_level.subscribe_resource()
+    async def subscribe_resource(uri) -> None:
+        session, credentials = request_session()
+        await resources.subscribe(ToolContext(api, credentials, session), session, str(uri))
+
+    @low_level.unsubscribe_resource()
+    async def unsubscribe_resource(uri) -> None:
+        resources.unsubscribe(low_level.request_context.session, str(uri))
+
+    base_capabilities = low_level.get_capabilities
+
+    def get_capabilities(*args, **kwargs):
+        capabilities = base_capabilities(*args, **kwargs)
+        capabilities.resources.subscribe = True
+        return capabilities
+    low_level.get_capabilities = get_capabilities
+
+# --- Stateless sessions ---
+class StatelessSessionMiddleware:
+    """Issue and honour `mcp-session-id` ourselves when the transport is stateless.
+
+    The stateless transport keeps no session and never sends the header, so a
+    random id is added to responses of requests that lack one; clients echo it
+    back and FastMCP exposes it as `session_id`, keying the credentials in the
+    shared store. DELETE (client closing the session) drops those credentials.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        session_id = dict(scope["headers"]).get(b"mcp-session-id")
+        if session_id is None:
+            issued = secrets.token_hex(16).encode()
+
+            async def send_with_session(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [*message.get("headers", []), (b"mcp-session-id", issued)]
+                await send(message)
+            return await self.app(scope, receive, send_with_session)
+        if scope["method"] == "DELETE":
+            await sessions.drop(session_id.decode())
+            return await Response(status_code=204)(scope, receive, send)
+        await self.app(scope, receive, send)
+
 
 # --- FastAPI App ---
-mcp_app = mcp.http_app(path="/mcp")
+mcp_app = mcp.http_app(path="/mcp", stateless_http=STATELESS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared HTTP client and store for the lifetime of the app."""
+    try:
+        async with api, mcp_app.lifespan(app):
+            yield
+    finally:
+        await store.aclose()
+
+
 app = FastAPI(
     title="Let Me Count API",
     description="An API for managing expenses between friends.",
     version="2.0.0",
-    lifespan=mcp_app.lifespan
+    lifespan=lifespan
 )
-app.mount("/api", mcp_app)
+app.mount("/api", StatelessSessionMiddleware(mcp_app) if STATELESS else mcp_app)
+
+
+# --- Metrics (tool calls, upstream requests, connection pool) ---
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Several workers: aggregate the metric files written by every process
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("LETMECOUNT_MCP_PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if WORKERS > 1 and not store.shared:
+        raise SystemExit("LETMECOUNT_MCP_WORKERS > 1 requires a shared LETMECOUNT_STORE (sqlite:// or redis://)")
+    # Workers import the app by name; a single process serves the object directly
+    uvicorn.run("http_server:app" if WORKERS > 1 else app, host="0.0.0.0", port=port, workers=WORKERS)
@@ -0,0 +1,165 @@
+"""
+Décodage incrémental des pages de collection
+
+`response.json()` garde en mémoire à la fois le corps brut et tout l'arbre
+décodé. Ici, les éléments de `member` (ou `hydra:member`) sont décodés un à un
+au fil des octets reçus, avec le décodeur C de la bibliothèque standard : seuls
+l'élément en cours et les octets pas encore consommés restent en mémoire. Les
+autres clés de premier niveau (`totalItems`, `view`, ...) sont conservées dans
+`metadata` ; API Platform les écrit après `member`, elles ne sont donc
+complètes qu'en fin de lecture.
+"""
+
+import codecs
+import json
+from json.decoder import WHITESPACE
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+MEMBER_KEYS = frozenset({"member", "hydra:member"})
+
+START, KEY, COLON, VALUE, MEMBERS, DONE = range(6)
+# Caractères pouvant suivre une valeur complète
+FOLLOWERS = frozenset(" \t\n\r,:]}")
+
+
+class MemberDecoder:
+    """Automate sur le document de premier niveau ; les valeurs sont décodées par json.JSONDecoder"""
+
+    def __init__(self):
+        self.metadata: Dict[str, Any] = {}
+        # Clés de premier niveau dans l'ordre du document, clé des éléments comprise
+        self.keys: List[str] = []
+        self.member_key: Optional[str] = None
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = START
+        self._key = ""
+        # Dernier élément lu dans l'objet ou le tableau courant : None (ouverture), "," ou une valeur
+        self._last: Optional[str] = None
+        # Taille de tampon à atteindre avant de retenter une valeur incomplète (coût linéaire)
+        self._wait = 0
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Éléments complets apportés par ce bloc d'octets"""
+        self._buffer = self._buffer[self._pos:] + self._text.decode(data)
+        self._pos = 0
+        return list(self._parse(final=False))
+
+    def close(self) -> List[Any]:
+        """Derniers éléments ; ValueError si le document est incomplet"""
+        items = self.feed(b"") + list(self._finish())
+        if self._state != DONE:
+            raise ValueError("Réponse JSON incomplète")
+        return items
+
+    def document(self, members: Any) -> Dict[str, Any]:
+        """Document complet, `members` à la place des éléments"""
+        return {key: members if key == self.member_key else self.metadata.get(key) for key in self.keys}
+
+    def _finish(self) -> Iterator[Any]:
+        self._buffer = self._buffer[self._pos:] + self._text.decode(b"", final=True)
+        self._pos = 0
+        self._wait = 0
+        return self._parse(final=True)
+
+    def _value(self, final: bool) -> Tuple[bool, Any]:
+        """Valeur JSON suivante, ou (False, None) si le tampon ne la contient pas encore entière"""
+        available = len(self._buffer) - self._pos
+        if not final and available < self._wait:
+            return False, None
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            self._wait = 2 * available
+            return False, None
+        # Un nombre en fin de tampon (« 1 » de « 1.5 ») peut se poursuivre dans le bloc suivant
+        if not final and (end == len(self._buffer) or self._buffer[end] not in FOLLOWERS):
+            self._wait = available + 1
+            return False, None
+        self._pos = end
+        self._wait = 0
+        return True, value
+
+    def _separator(self, char: str) -> None:
+        """Virgule entre deux valeurs, ou fermeture sans virgule finale"""
+        if (char == "," and self._last != "value") or (char != "," and self._last == ","):
+            raise ValueError(f"« {char} » inattendu")
+        self._pos += 1
+        self._last = ","
+
+    def _expect_value(self) -> None:
+        if self._last == "value":
+            raise ValueError("« , » attendu")
+
+    def _parse(self, final: bool) -> Iterator[Any]:
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos >= len(self._buffer):
+                return
+            char = self._buffer[self._pos]
+            if self._state == START:
+                if char != "{":
+                    raise ValueError("Objet JSON attendu")
+                self._pos += 1
+                self._state = KEY
+            elif self._state == KEY:
+                if char in ",}":
+                    self._separator(char)
+                    self._state = DONE if char == "}" else KEY
+                    continue
+                self._expect_value()
+                ok, key = self._value(final)
+                if not ok:
+                    return
+                if not isinstance(key, str):
+                    raise ValueError("Clé JSON attendue")
+                self._key = key
+                self._last = None
+                self.keys.append(key)
+                self._state = COLON
+            elif self._state == COLON:
+                if char != ":":
+                    raise ValueError("« : » attendu")
+                self._pos += 1
+                self._state = VALUE
+            elif self._state == VALUE:
+                if self._key in MEMBER_KEYS and char == "[":
+                    self._pos += 1
+                    self._last = None
+                    self.member_key = self._key
+                    self._state = MEMBERS
+                    continue
+                ok, value = self._value(final)
+                if not ok:
+                    return
+                self.metadata[self._key] = value
+                self._last = "value"
+                self._state = KEY
+            elif self._state == MEMBERS:
+                if char in ",]":
+                    self._separator(char)
+                    if char == "]":
+                        self._last = "value"
+                        self._state = KEY
+                    continue
+                self._expect_value()
+                ok, item = self._value(final)
+                if not ok:
+                    return
+                self._last = "value"
+                yield item
+            else:
+                raise ValueError("Données après la fin du document JSON")
+
+
+async def iter_members(chunks: AsyncIterable[bytes], decoder: MemberDecoder) -> AsyncIterator[Any]:
+    """Éléments d'une page de collection, au fil des blocs d'octets reçus"""
+    async for chunk in chunks:
+        for item in decoder.feed(chunk):
+            yield item
+    for item in decoder.close():
+        yield item
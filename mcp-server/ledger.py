@@ -0,0 +1,321 @@
+"""
+Export et import d'instantanés du grand livre
+
+`ledger_export` écrit les utilisateurs, tags, dépenses et détails visibles par
+l'utilisateur connecté dans un répertoire d'instantané, une table par fichier
+en colonnes : Parquet ou Arrow IPC (lisible par memory-map) si pyarrow est
+installé, CSV sinon. Les collections sont lues page par page et écrites par
+lots au fil de l'eau : la mémoire reste constante quelle que soit la taille du
+grand livre.
+
+`ledger_import` relit un instantané de la même identité pour amorcer les
+moteurs de soldes, l'historique, les statistiques et l'index de recherche,
+dont la synchronisation suivante reprend au filigrane /logs de l'instantané.
+
+Les chemins étant ceux du poste local, ces outils ne sont exposés qu'en stdio.
+"""
+
+import csv
+import datetime
+import json
+import os
+import shutil
+import sys
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+import balances
+import historique
+import stats
+from auth import identity_from_headers
+from pagination import CollectionStream
+from registry import ToolContext
+from search_index import index_for, latest_log_id
+from storage import data_path, identity_slug
+
+SNAPSHOT_VERSION = 1
+# Nombre de lignes écrites par lot (un row group Parquet / un record batch Arrow)
+BATCH_ROWS = int(os.getenv("LETMECOUNT_LEDGER_BATCH_ROWS", "1024"))
+
+Column = Tuple[str, str]
+
+TABLES: Dict[str, Tuple[Column, ...]] = {
+    "users": (("id", "int64"), ("iri", "string"), ("username", "string")),
+    "tags": (("id", "int64"), ("iri", "string"), ("libelle", "string")),
+    "depenses": (
+        ("id", "int64"), ("iri", "string"), ("titre", "string"), ("montant", "float64"),
+        ("date", "string"), ("partage", "string"), ("tag", "string"), ("payePar", "string"),
+    ),
+    "details": (("depense_id", "int64"), ("user", "string"), ("parts", "int64"), ("montant", "float64")),
+}
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+Format = Literal["auto", "parquet", "arrow", "csv"]
+Seed = Literal["balances", "historique", "stats", "search"]
+
+
+class LedgerExportInput(BaseModel):
+    path: Optional[str] = Field(default=None, description="Répertoire de l'instantané à créer (par défaut dans le répertoire de données)")
+    format: Format = Field(default="auto", description="parquet ou arrow (nécessitent pyarrow), csv ; auto : parquet si disponible, csv sinon")
+
+
+class LedgerImportInput(BaseModel):
+    path: str = Field(..., description="Répertoire d'un instantané créé par ledger_export")
+    seed: List[Seed] = Field(default=["balances", "historique", "stats", "search"], description="Caches locaux à amorcer")
+
+
+def _pyarrow():
+    """pyarrow est optionnel (pip install pyarrow) ; sans lui, seul le CSV est disponible"""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def resolve_format(requested: str) -> str:
+    if requested == "auto":
+        return "parquet" if _pyarrow() is not None else "csv"
+    if requested != "csv" and _pyarrow() is None:
+        raise ValueError(f"Le format {requested} nécessite pyarrow (pip install pyarrow)")
+    return requested
+
+
+# --- Écriture ---
+
+class TableWriter:
+    """Écrit une table par lots de BATCH_ROWS lignes"""
+
+    def __init__(self, path: str, columns: Sequence[Column], fmt: str):
+        self.columns = columns
+        self.format = fmt
+        self.rows = 0
+        self._buffer: List[Tuple[Any, ...]] = []
+        if fmt == "csv":
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(name for name, _ in columns)
+            return
+        pa = _pyarrow()
+        self._schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in columns])
+        if fmt == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, self._schema, compression="zstd")
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def write(self, row: Tuple[Any, ...]) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        self.rows += len(self._buffer)
+        if self.format == "csv":
+            self._csv.writerows(["" if value is None else value for value in row] for row in self._buffer)
+        else:
+            pa = _pyarrow()
+            arrays = [pa.array([row[i] for row in self._buffer], type=field.type) for i, field in enumerate(self._schema)]
+            batch = pa.record_batch(arrays, schema=self._schema)
+            if self.format == "parquet":
+                self._writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                self._writer.write_batch(batch)
+        self._buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self.format == "csv":
+            self._file.close()
+        else:
+            self._writer.close()
+            if self.format == "arrow":
+                self._sink.close()
+
+
+def iri_id(iri: Optional[str]) -> Optional[int]:
+    return int(iri.rstrip("/").rsplit("/", 1)[-1]) if iri else None
+
+
+# --- Lecture ---
+
+def _parse(value: str, kind: str) -> Any:
+    if value == "":
+        return None
+    if kind == "int64":
+        return int(value)
+    if kind == "float64":
+        return float(value)
+    return value
+
+
+def read_table(directory: str, manifest: Dict[str, Any], table: str) -> Iterator[Tuple[Any, ...]]:
+    """Lignes d'une table de l'instantané, lues par lots (memory-map pour Arrow)"""
+    fmt = manifest["format"]
+    columns = TABLES[table]
+    path = os.path.join(directory, manifest["tables"][table]["file"])
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                yield tuple(_parse(value, kind) for value, (_, kind) in zip(row, columns))
+        return
+    pa = _pyarrow()
+    if pa is None:
+        raise ValueError(f"La lecture d'un instantané {fmt} nécessite pyarrow (pip install pyarrow)")
+    if fmt == "parquet":
+        batches = pa.parquet.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    names = [name for name, _ in columns]
+    for batch in batches:
+        for row in batch.to_pylist():
+            yield tuple(row[name] for name in names)
+
+
+def read_depenses(directory: str, manifest: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Dépenses reconstituées au format de l'API, détails joints au fil de la lecture
+
+    Les détails sont écrits dans l'ordre des dépenses : une seule passe suffit.
+    """
+    details = read_table(directory, manifest, "details")
+    pending = next(details, None)
+    for depense_id, iri, titre, montant, date, partage, tag, paye_par in read_table(directory, manifest, "depenses"):
+        rows = []
+        while pending is not None and pending[0] == depense_id:
+            _, user, parts, detail_montant = pending
+            rows.append({"user": user, "parts": parts, "montant": detail_montant})
+            pending = next(details, None)
+        yield {
+            "@id": iri, "@type": "Depense", "id": depense_id, "titre": titre, "montant": montant,
+            "date": date, "partage": partage, "tag": tag, "payePar": paye_par, "details": rows,
+        }
+
+
+# --- Outils ---
+
+async def ledger_export(ctx: ToolContext, args: LedgerExportInput) -> Dict[str, Any]:
+    """Instantané en colonnes du grand livre de l'utilisateur connecté"""
+    fmt = resolve_format(args.format)
+    headers = ctx.headers()
+    identity = identity_from_headers(headers)
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+    target = args.path or data_path(
+        f"ledger-{identity_slug(ctx.api.base_url, identity)}-{created_at:%Y%m%d-%H%M%S}"
+    )
+    if os.path.exists(target):
+        raise ValueError(f"{target} existe déjà")
+
+    # Écriture dans un répertoire temporaire, renommé une fois l'instantané complet
+    staging = f"{target}.partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    writers = {
+        table: TableWriter(os.path.join(staging, table + EXTENSIONS[fmt]), columns, fmt)
+        for table, columns in TABLES.items()
+    }
+    try:
+        # Filigrane lu en premier : les changements pendant l'export seront relus à la synchronisation
+        watermark = await latest_log_id(ctx, headers)
+        async for user in CollectionStream(ctx.api, "/users", {}, headers, max_items=sys.maxsize):
+            writers["users"].write((user.get("id"), user["@id"], user.get("username")))
+        async for tag in CollectionStream(ctx.api, "/tags", {}, headers, max_items=sys.maxsize):
+            writers["tags"].write((tag.get("id"), tag["@id"], tag.get("libelle")))
+        async for depense in CollectionStream(ctx.api, "/depenses", {}, headers, max_items=sys.maxsize):
+            depense_id = depense.get("id", iri_id(depense["@id"]))
+            writers["depenses"].write((
+                depense_id, depense["@id"], depense.get("titre"), depense.get("montant"), depense.get("date"),
+                depense.get("partage"), depense.get("tag"), depense.get("payePar"),
+            ))
+            for detail in depense.get("details") or []:
+                writers["details"].write((depense_id, detail.get("user"), detail.get("parts"), detail.get("montant")))
+        for writer in writers.values():
+            writer.close()
+    except BaseException:
+        for writer in writers.values():
+            try:
+                writer.close()
+            except Exception:
+                pass
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "format": fmt,
+        "created_at": created_at.isoformat(),
+        "api_url": ctx.api.base_url,
+        "identity": identity,
+        "watermark": watermark,
+        "tables": {
+            table: {
+                "file": table + EXTENSIONS[fmt],
+                "rows": writer.rows,
+                "columns": [{"name": name, "type": kind} for name, kind in TABLES[table]],
+            }
+            for table, writer in writers.items()
+        },
+    }
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, ensure_ascii=False)
+    os.replace(staging, target)
+    return {"path": target, "format": fmt, "rows": {table: info["rows"] for table, info in manifest["tables"].items()}}
+
+
+async def ledger_import(ctx: ToolContext, args: LedgerImportInput) -> Dict[str, Any]:
+    """Amorce les caches locaux à partir d'un instantané"""
+    with open(os.path.join(args.path, "manifest.json"), encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Version d'instantané non prise en charge : {manifest.get('version')}")
+    identity = identity_from_headers(ctx.headers())
+    # L'API ne renvoie que les dépenses de l'utilisateur : un instantané n'est valable que pour son auteur
+    if manifest["api_url"] != ctx.api.base_url or manifest["identity"] != identity:
+        raise ValueError("Cet instantané a été créé pour une autre identité ou une autre instance de l'API")
+
+    engines = []
+    if "balances" in args.seed:
+        engines.append(balances.engine_for(ctx, None))
+    if "historique" in args.seed:
+        engines.append(historique.engine_for(ctx, None))
+    if "stats" in args.seed:
+        engines.append(stats.engine_for(ctx))
+    index = index_for(ctx) if "search" in args.seed else None
+
+    count = 0
+    async with AsyncExitStack() as stack:
+        for engine in engines:
+            await stack.enter_async_context(engine.lock)
+            engine.reset()
+        if index is not None:
+            await stack.enter_async_context(index.lock)
+            index.clear()
+        try:
+            for depense in read_depenses(args.path, manifest):
+                for engine in engines:
+                    engine.upsert(depense)
+                if index is not None:
+                    index.upsert(depense)
+                count += 1
+        except BaseException:
+            for engine in engines:
+                engine.reset()
+            if index is not None:
+                index.db.rollback()
+            raise
+        for engine in engines:
+            engine.loaded = True
+            engine.watermark = manifest.get("watermark")
+        if index is not None:
+            index.mark_synced(manifest.get("watermark"))
+            index.synced_at = 0.0
+
+    return {"path": args.path, "created_at": manifest["created_at"], "depenses": count, "seeded": list(args.seed)}
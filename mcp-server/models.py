@@ -0,0 +1,130 @@
+"""
+Modèles d'entrée des outils MCP de l'API Let-me-count
+"""
+
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from expand import ExpandInput
+from pagination import DEFAULT_MAX_ITEMS
+from projection import ProjectionInput
+
+Partage = Literal["parts", "montants"]
+
+
+class EmptyInput(BaseModel):
+    pass
+
+
+# --- Authentification ---
+class AuthLoginInput(BaseModel):
+    username: str = Field(..., description="Nom d'utilisateur")
+    password: str = Field(..., description="Mot de passe")
+
+
+# --- Pagination ---
+class PageInput(ProjectionInput):
+    page: int = Field(default=1, description="Numéro de page")
+    all_pages: bool = Field(default=False, description="Récupérer toutes les pages en parallèle")
+    max_items: int = Field(default=DEFAULT_MAX_ITEMS, description="Nombre maximum d'éléments en mode all_pages", ge=1)
+
+
+# --- Dépenses ---
+class DepensesListInput(PageInput, ExpandInput):
+    tag: Optional[str] = Field(default=None, description="Filtrer par tag")
+    tags: Optional[List[str]] = Field(default=None, description="Filtrer par plusieurs tags")
+
+
+class DetailInput(BaseModel):
+    user: str = Field(..., description="IRI de l'utilisateur")
+    parts: int = Field(..., description="Nombre de parts", ge=0)
+    montant: Optional[float] = Field(
+        default=None, description="Montant pour ce détail ; en partage par parts, omis sur tous les détails : calculé à partir des parts",
+    )
+
+
+class DepensesCreateInput(BaseModel):
+    titre: str = Field(..., description="Titre de la dépense", max_length=255)
+    montant: float = Field(..., description="Montant total de la dépense", ge=0)
+    date: str = Field(..., description="Date de la dépense", json_schema_extra={"format": "date-time"})
+    partage: Partage = Field(..., description="Mode de partage")
+    payePar: str = Field(..., description="IRI de l'utilisateur qui a payé")
+    tag: Optional[str] = Field(default=None, description="IRI du tag (optionnel)")
+    details: List[DetailInput] = Field(..., min_length=1)
+
+
+class DepensesGetInput(ProjectionInput, ExpandInput):
+    id: str = Field(..., description="ID de la dépense")
+
+
+class DepensePatch(BaseModel):
+    titre: Optional[str] = Field(default=None, description="Titre de la dépense", max_length=255)
+    montant: Optional[float] = Field(default=None, description="Montant total de la dépense", ge=0)
+    date: Optional[str] = Field(default=None, description="Date de la dépense", json_schema_extra={"format": "date-time"})
+    partage: Optional[Partage] = Field(default=None, description="Mode de partage")
+    payePar: Optional[str] = Field(default=None, description="IRI de l'utilisateur qui a payé")
+    tag: Optional[str] = Field(default=None, description="IRI du tag (optionnel)")
+
+
+class DepensesUpdateInput(DepensePatch):
+    id: str = Field(..., description="ID de la dépense")
+
+
+class DepensesDeleteInput(BaseModel):
+    id: str = Field(..., description="ID de la dépense")
+
+
+# --- Tags ---
+class TagsListInput(PageInput):
+    pass
+
+
+class TagsCreateInput(BaseModel):
+    libelle: str = Field(..., description="Libellé du tag", max_length=255)
+    users: Optional[List[str]] = Field(default=None, description="Liste des IRIs des utilisateurs associés")
+
+
+class TagsGetInput(ProjectionInput):
+    id: str = Field(..., description="ID du tag")
+
+
+class TagsUpdateInput(BaseModel):
+    id: str = Field(..., description="ID du tag")
+    libelle: Optional[str] = Field(default=None, description="Libellé du tag", max_length=255)
+    users: Optional[List[str]] = Field(default=None, description="Liste des IRIs des utilisateurs associés")
+
+
+class TagsDeleteInput(BaseModel):
+    id: str = Field(..., description="ID du tag")
+
+
+# --- Utilisateurs ---
+class UsersListInput(PageInput):
+    username: Optional[str] = Field(default=None, description="Filtrer par nom d'utilisateur")
+
+
+class UsersGetInput(ProjectionInput):
+    id: str = Field(..., description="ID de l'utilisateur")
+
+
+class UsersMeInput(ProjectionInput):
+    pass
+
+
+class UsersCreateInput(BaseModel):
+    username: str = Field(..., description="Nom d'utilisateur")
+    email: str = Field(..., description="Adresse email")
+    password: str = Field(..., description="Mot de passe")
+    roles: Optional[List[str]] = Field(default=None, description="Rôles de l'utilisateur (optionnel)")
+
+
+class UsersUpdateCredentialsInput(BaseModel):
+    token: str = Field(..., description="Token de sécurité pour authentification")
+    username: Optional[str] = Field(default=None, description="Nouveau nom d'utilisateur (optionnel)")
+    email: Optional[str] = Field(default=None, description="Nouvelle adresse email (optionnel)")
+    password: Optional[str] = Field(default=None, description="Nouveau mot de passe (optionnel)")
+
+
+class UsersGenerateTokenInput(BaseModel):
+    id: str = Field(..., description="ID de l'utilisateur")
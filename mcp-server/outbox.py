@@ -0,0 +1,400 @@
+"""
+File d'attente durable des écritures (outbox)
+
+Avec LETMECOUNT_OUTBOX=1, les créations, modifications et suppressions de
+dépenses et de tags ne sont plus envoyées pendant l'appel d'outil : elles sont
+ajoutées à un journal SQLite (WAL, synchronisation complète) propre à chaque
+utilisateur connecté, et l'outil répond aussitôt. Une création renvoie un ID
+provisoire (`/depenses/tmp-…`), utilisable dans les écritures suivantes.
+
+Une tâche de fond rejoue le journal vers l'API dans l'ordre d'arrivée, avec
+la clé `Idempotency-Key` de chaque entrée. Les IRIs provisoires sont remplacés
+par les IRIs réels au moment de l'envoi. Une panne de l'API (erreur réseau,
+5xx, 429, disjoncteur ouvert, JWT absent) suspend le rejeu, qui reprend avec
+un délai croissant. Un refus définitif (4xx) marque l'entrée en échec, ainsi
+que les entrées qui dépendent d'une création refusée.
+
+Tant qu'elles n'ont pas été envoyées, les écritures successives d'une même
+ressource sont regroupées : un PATCH est fusionné dans le PATCH ou la création
+en attente, une suppression annule une création jamais envoyée.
+"""
+
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Optional, Set
+
+import httpx
+from pydantic import BaseModel, Field
+
+from auth import identity_from_headers
+from registry import ToolContext, ToolSpec, authenticated, write_request
+from resilience import CircuitOpenError
+from storage import data_path, identity_slug
+
+logger = logging.getLogger(__name__)
+
+OUTBOX = os.getenv("LETMECOUNT_OUTBOX", "0") == "1"
+BACKOFF = float(os.getenv("LETMECOUNT_OUTBOX_BACKOFF", "1"))
+BACKOFF_MAX = float(os.getenv("LETMECOUNT_OUTBOX_BACKOFF_MAX", "60"))
+# Durée pendant laquelle un worker se réserve le rejeu, renouvelée à chaque entrée
+LEASE = 30.0
+# Outils dont les écritures passent par le journal
+OUTBOX_TOOLS = ("depenses_create", "depenses_update", "depenses_delete", "tags_create", "tags_update", "tags_delete")
+# Statuts après lesquels le rejeu est suspendu plutôt que l'entrée abandonnée
+TRANSIENT_STATUSES = frozenset({401, 408, 425, 429})
+
+PROVISIONAL = re.compile(r"^/(?:depenses|tags)/tmp-[0-9a-f]{12}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tool TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    body TEXT,
+    idempotency_key TEXT NOT NULL,
+    -- IRI provisoire de la ressource créée (POST)
+    provisional TEXT,
+    -- pending, sending (envoi commencé), failed ; les entrées rejouées sont supprimées
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_path ON entries (path, state);
+CREATE TABLE IF NOT EXISTS ids (
+    provisional TEXT PRIMARY KEY,
+    iri TEXT NOT NULL
+);
+-- Processus qui rejoue le journal (plusieurs workers partagent le fichier)
+CREATE TABLE IF NOT EXISTS lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+INSERT OR IGNORE INTO lease (id, owner, expires) VALUES (1, '', 0);
+"""
+
+
+class OutboxStatusInput(BaseModel):
+    discard_failed: bool = Field(default=False, description="Oublier les entrées en échec après les avoir listées")
+
+
+def _references(value: Any) -> Set[str]:
+    """IRIs provisoires cités dans un corps"""
+    if isinstance(value, str):
+        return {value} if PROVISIONAL.match(value) else set()
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return set().union(*(_references(item) for item in value)) if value else set()
+    return set()
+
+
+def compose_patches(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge-patch équivalent à appliquer `first` puis `second` (les null sont conservés)"""
+    result = dict(first)
+    for key, value in second.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = compose_patches(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """Application d'un merge-patch (RFC 7386) à un corps de création"""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+class Outbox:
+    """Journal des écritures d'une identité et tâche qui le rejoue"""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Une écriture acceptée doit survivre à un arrêt brutal
+        self.db.execute("PRAGMA synchronous=FULL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.ctx: Optional[ToolContext] = None
+        self.task: Optional["asyncio.Task[None]"] = None
+        self.wakeup = asyncio.Event()
+        self.replayed = 0
+        self.owner = f"{os.getpid()}-{id(self)}"
+
+    # --- Ajout ---
+
+    def _last_entry(self, path: str) -> Optional[sqlite3.Row]:
+        """Dernière entrée de la ressource, si elle n'a pas encore été envoyée"""
+        row = self.db.execute(
+            "SELECT * FROM entries WHERE (path = ? OR provisional = ?) AND state != 'failed' ORDER BY seq DESC LIMIT 1",
+            (path, path),
+        ).fetchone()
+        return row if row is not None and row["state"] == "pending" else None
+
+    def _created_after(self, iris: Set[str], seq: int) -> bool:
+        """Une des ressources provisoires est-elle créée après l'entrée `seq` ?"""
+        if not iris:
+            return False
+        marks = ",".join("?" * len(iris))
+        return self.db.execute(
+            f"SELECT 1 FROM entries WHERE provisional IN ({marks}) AND seq > ? LIMIT 1", [*iris, seq],
+        ).fetchone() is not None
+
+    def _referenced(self, iri: str) -> bool:
+        """La ressource provisoire est-elle citée par une autre entrée en attente ?"""
+        rows = self.db.execute(
+            "SELECT body FROM entries WHERE state != 'failed' AND body LIKE ? AND provisional IS NOT ?", (f"%{iri}%", iri),
+        )
+        return any(iri in _references(json.loads(row["body"])) for row in rows)
+
+    def pending_count(self) -> int:
+        return self.db.execute("SELECT count(*) FROM entries WHERE state != 'failed'").fetchone()[0]
+
+    def enqueue(self, spec: ToolSpec, path: str, body: Any) -> Dict[str, Any]:
+        """Ajoute l'écriture au journal, regroupée si possible avec la précédente sur la même ressource"""
+        with self.db:
+            result = self._coalesce(spec, path, body)
+            if result is None:
+                provisional = None
+                if spec.method == "POST":
+                    provisional = f"{path.rstrip('/')}/tmp-{uuid.uuid4().hex[:12]}"
+                seq = self.db.execute(
+                    "INSERT INTO entries (tool, method, path, content_type, body, idempotency_key, provisional, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (spec.name, spec.method, path, spec.content_type, json.dumps(body) if body is not None else None,
+                     str(uuid.uuid4()), provisional, time.time()),
+                ).lastrowid
+                result = {"status": "queued", "seq": seq, "@id": provisional or path}
+                if provisional is not None:
+                    result["id"] = provisional.rsplit("/", 1)[1]
+        self.wakeup.set()
+        return {**result, "pending": self.pending_count()}
+
+    def _coalesce(self, spec: ToolSpec, path: str, body: Any) -> Optional[Dict[str, Any]]:
+        if spec.method == "POST":
+            return None
+        previous = self._last_entry(path)
+        if previous is None:
+            return None
+        if previous["method"] == "DELETE":
+            # La ressource sera supprimée : une modification n'aurait plus de cible
+            if spec.method == "PATCH":
+                raise ValueError(f"{path} : une suppression est déjà en attente, modification refusée")
+            return {"status": "coalesced", "seq": previous["seq"], "@id": path}
+        if spec.method == "PATCH":
+            if self._created_after(_references(body), previous["seq"]):
+                return None
+            current = json.loads(previous["body"]) if previous["body"] else {}
+            merged = compose_patches(current, body) if previous["method"] == "PATCH" else merge_patch(current, body)
+            self.db.execute("UPDATE entries SET body = ? WHERE seq = ?", (json.dumps(merged), previous["seq"]))
+            return {"status": "coalesced", "seq": previous["seq"], "@id": path}
+        # DELETE : une création jamais envoyée (et pas citée ailleurs) est annulée avec ses modifications
+        creation = self.db.execute(
+            "SELECT seq FROM entries WHERE provisional = ? AND state = 'pending'", (path,),
+        ).fetchone()
+        if creation is not None:
+            if self._referenced(path):
+                return None
+            cancelled = self.db.execute(
+                "DELETE FROM entries WHERE (path = ? OR provisional = ?) AND state = 'pending'", (path, path),
+            ).rowcount
+            return {"status": "cancelled", "cancelled": cancelled, "@id": path}
+        # Sinon, les modifications en attente sont inutiles
+        self.db.execute("DELETE FROM entries WHERE path = ? AND method = 'PATCH' AND state = 'pending'", (path,))
+        return None
+
+    # --- Rejeu ---
+
+    def resume(self, ctx: ToolContext) -> None:
+        """(Re)démarre le rejeu avec les identifiants de `ctx`"""
+        self.ctx = ctx
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def _lease(self, hold: bool) -> bool:
+        """Réserve (ou libère) le rejeu pour ce processus ; False si un autre worker le détient"""
+        now = time.time()
+        with self.db:
+            if not hold:
+                self.db.execute("UPDATE lease SET expires = 0 WHERE owner = ?", (self.owner,))
+                return True
+            return self.db.execute(
+                "UPDATE lease SET owner = ?, expires = ? WHERE owner = ? OR expires < ?",
+                (self.owner, now + LEASE, self.owner, now),
+            ).rowcount == 1
+
+    def _next(self) -> Optional[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM entries WHERE state != 'failed' ORDER BY seq LIMIT 1").fetchone()
+
+    def _rewrite(self, value: Any) -> Any:
+        if isinstance(value, str):
+            if PROVISIONAL.match(value):
+                row = self.db.execute("SELECT iri FROM ids WHERE provisional = ?", (value,)).fetchone()
+                return row["iri"] if row is not None else value
+            return value
+        if isinstance(value, dict):
+            return {key: self._rewrite(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._rewrite(item) for item in value]
+        return value
+
+    def _fail(self, entry: sqlite3.Row, error: str) -> None:
+        with self.db:
+            self.db.execute("UPDATE entries SET state = 'failed', error = ? WHERE seq = ?", (error, entry["seq"]))
+        logger.warning("Écriture %s %s abandonnée : %s", entry["method"], entry["path"], error)
+
+    def _done(self, entry: sqlite3.Row, response: httpx.Response) -> None:
+        with self.db:
+            if entry["provisional"] is not None:
+                iri = response.json().get("@id")
+                self.db.execute("INSERT OR REPLACE INTO ids (provisional, iri) VALUES (?, ?)", (entry["provisional"], iri))
+            self.db.execute("DELETE FROM entries WHERE seq = ?", (entry["seq"],))
+        self.replayed += 1
+
+    async def _send(self, entry: sqlite3.Row, path: str, body: Any) -> httpx.Response:
+        ctx = self.ctx
+        headers = {**ctx.headers(entry["content_type"]), "Idempotency-Key": entry["idempotency_key"]}
+        response = await ctx.api.request(entry["method"], path, json=body, headers=headers)
+        # 401 : authenticated() renouvelle le JWT et renvoie une fois
+        if response.status_code == 401:
+            response.raise_for_status()
+        return response
+
+    async def _replay(self, entry: sqlite3.Row) -> bool:
+        """Rejoue une entrée ; False si l'API est indisponible"""
+        path = self._rewrite(entry["path"])
+        body = self._rewrite(json.loads(entry["body"])) if entry["body"] is not None else None
+        unresolved = _references(body) | _references(path)
+        if unresolved:
+            self._fail(entry, f"dépend d'une création en échec : {', '.join(sorted(unresolved))}")
+            return True
+        with self.db:
+            self.db.execute("UPDATE entries SET state = 'sending', attempts = attempts + 1 WHERE seq = ?", (entry["seq"],))
+        try:
+            response = await authenticated(self.ctx, lambda: self._send(entry, path, body))
+        except httpx.HTTPStatusError as e:
+            response = e.response
+        except (httpx.TransportError, CircuitOpenError) as e:
+            logger.info("API indisponible, rejeu suspendu (%s)", e)
+            return False
+        if response.status_code >= 500 or response.status_code in TRANSIENT_STATUSES:
+            logger.info("API indisponible, rejeu suspendu (%s)", response.status_code)
+            return False
+        if response.status_code >= 400:
+            self._fail(entry, f"{response.status_code} - {response.text}")
+        else:
+            self._done(entry, response)
+        return True
+
+    async def _run(self) -> None:
+        delay = BACKOFF
+        while True:
+            entry = self._next()
+            if entry is None:
+                # Au repos, un autre worker peut reprendre le rejeu
+                self._lease(hold=False)
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            if self.ctx is None or self.ctx.jwt_token is None or not self._lease(hold=True):
+                ok = False
+            else:
+                try:
+                    ok = await self._replay(entry)
+                except Exception as e:
+                    logger.warning("Rejeu de l'entrée %s impossible (%s)", entry["seq"], e)
+                    ok = False
+            if ok:
+                delay = BACKOFF
+                continue
+            # Panne : nouvel essai après un délai croissant, ou dès une nouvelle écriture
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(BACKOFF_MAX, delay * 2)
+
+    # --- État ---
+
+    def status(self, discard_failed: bool = False) -> Dict[str, Any]:
+        rows = self.db.execute("SELECT * FROM entries ORDER BY seq").fetchall()
+
+        def describe(row: sqlite3.Row) -> Dict[str, Any]:
+            entry = {key: row[key] for key in ("seq", "tool", "method", "path", "state", "attempts")}
+            if row["provisional"] is not None:
+                entry["@id"] = row["provisional"]
+            if row["error"] is not None:
+                entry["error"] = row["error"]
+            return entry
+
+        ids = {row["provisional"]: row["iri"] for row in self.db.execute("SELECT * FROM ids")}
+        if discard_failed:
+            with self.db:
+                self.db.execute("DELETE FROM entries WHERE state = 'failed'")
+        return {
+            "enabled": True,
+            "pending": [describe(row) for row in rows if row["state"] != "failed"],
+            "failed": [describe(row) for row in rows if row["state"] == "failed"],
+            "ids": ids,
+            "replayed": self.replayed,
+        }
+
+
+_outboxes: Dict[str, Outbox] = {}
+
+
+def outbox_for(ctx: ToolContext) -> Outbox:
+    slug = identity_slug(ctx.api.base_url, identity_from_headers(ctx.headers()))
+    outbox = _outboxes.get(slug)
+    if outbox is None:
+        outbox = _outboxes[slug] = Outbox(data_path(f"outbox-{slug}.db"))
+    return outbox
+
+
+def resume_outbox(ctx: ToolContext) -> None:
+    """Reprend le rejeu d'un journal laissé par une session précédente"""
+    if OUTBOX and ctx.jwt_token is not None:
+        outbox_for(ctx).resume(ctx)
+
+
+def queued(spec: ToolSpec) -> ToolSpec:
+    """Variante de l'outil qui ajoute l'écriture au journal au lieu de l'envoyer"""
+
+    async def handler(ctx: ToolContext, args: BaseModel) -> Dict[str, Any]:
+        path, body = write_request(spec, args)
+        outbox = outbox_for(ctx)
+        result = outbox.enqueue(spec, path, body)
+        outbox.resume(ctx)
+        return result
+
+    description = f"{spec.description} (différé : ajouté à la file d'écritures, une création renvoie un ID provisoire tmp-…)"
+    return dataclasses.replace(spec, handler=handler, description=description)
+
+
+async def outbox_status(ctx: ToolContext, args: OutboxStatusInput) -> Dict[str, Any]:
+    """Écritures en attente ou en échec, et IDs réels des créations rejouées"""
+    if not OUTBOX:
+        return {"enabled": False}
+    resume_outbox(ctx)
+    return outbox_for(ctx).status(args.discard_failed)
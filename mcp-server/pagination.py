@@ -0,0 +1,186 @@
+"""
+Pagination des collections Hydra de l'API Let-me-count
+
+Lit les métadonnées `totalItems` / `view` de la première page puis récupère les
+pages suivantes en parallèle (fan-out borné), en restituant les éléments dans
+l'ordre des pages. Chaque page est décodée au fil de la réponse (json_stream.py) :
+un élément n'est jamais en mémoire avec toute sa page.
+"""
+
+import asyncio
+import math
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from api_client import ApiClient
+from json_stream import MemberDecoder, iter_members
+
+DEFAULT_CONCURRENCY = int(os.getenv("LETMECOUNT_PAGINATION_CONCURRENCY", "4"))
+DEFAULT_MAX_ITEMS = int(os.getenv("LETMECOUNT_PAGINATION_MAX_ITEMS", "1000"))
+
+
+def collection_members(data: Dict[str, Any]) -> List[Any]:
+    """Éléments d'une page de collection (API Platform 4 : `member`, anciennes versions : `hydra:member`)"""
+    return data.get("member", data.get("hydra:member", []))
+
+
+def collection_total(data: Dict[str, Any]) -> Optional[int]:
+    return data.get("totalItems", data.get("hydra:totalItems"))
+
+
+def collection_last_page(data: Dict[str, Any], page_size: int) -> int:
+    """Numéro de la dernière page, d'après `view.last` ou à défaut `totalItems`"""
+    view = data.get("view", data.get("hydra:view")) or {}
+    last = view.get("last", view.get("hydra:last"))
+    if last:
+        page = parse_qs(urlparse(last).query).get("page")
+        if page:
+            return int(page[0])
+    total = collection_total(data)
+    if total is None or page_size <= 0:
+        return 1
+    return max(1, math.ceil(total / page_size))
+
+
+class PageStream:
+    """Itérateur asynchrone sur les éléments d'une seule page, décodés au fil de la réponse"""
+
+    def __init__(
+        self,
+        api: ApiClient,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.api = api
+        self.endpoint = endpoint
+        self.params = params
+        self.headers = headers
+        self.decoder = MemberDecoder()
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        response = await self.api.open_stream("GET", self.endpoint, params=self.params, headers=self.headers)
+        try:
+            response.raise_for_status()
+            async for item in iter_members(response.aiter_bytes(), self.decoder):
+                yield item
+        finally:
+            await response.aclose()
+
+    def document(self, members: List[Any]) -> Dict[str, Any]:
+        """La page telle que renvoyée par l'API, après lecture complète"""
+        return self.decoder.document(members)
+
+
+class CollectionStream:
+    """Itérateur asynchrone sur tous les éléments d'une collection paginée"""
+
+    def __init__(
+        self,
+        api: ApiClient,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        max_items: int = DEFAULT_MAX_ITEMS,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ):
+        self.api = api
+        self.endpoint = endpoint
+        self.params = {k: v for k, v in (params or {}).items() if k != "page"}
+        self.headers = headers
+        self.max_items = max_items
+        self.concurrency = max(1, concurrency)
+        self.total_items: Optional[int] = None
+        self.pages = 0
+        self.count = 0
+
+    async def _open_page(self, page: int) -> httpx.Response:
+        response = await self.api.open_stream(
+            "GET", self.endpoint, params={**self.params, "page": page}, headers=self.headers
+        )
+        response.raise_for_status()
+        self.pages += 1
+        return response
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._iterate()
+
+    def document(self, members: List[Any]) -> Dict[str, Any]:
+        """Document fusionné, après lecture complète"""
+        total = self.total_items if self.total_items is not None else self.count
+        return {
+            "totalItems": total,
+            "member": members,
+            "pages": self.pages,
+            "truncated": self.count < total,
+        }
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        remaining = self.max_items
+        page_size = 0
+        first = MemberDecoder()
+        response = await self._open_page(1)
+        try:
+            async for item in iter_members(response.aiter_bytes(), first):
+                page_size += 1
+                # Au-delà du plafond, la page est lue jusqu'au bout pour ses métadonnées (totalItems, view)
+                if remaining > 0:
+                    remaining -= 1
+                    self.count += 1
+                    yield item
+        finally:
+            await response.aclose()
+        self.total_items = collection_total(first.metadata)
+
+        last_page = collection_last_page(first.metadata, page_size)
+        if remaining <= 0 or last_page <= 1 or page_size == 0:
+            return
+
+        # Inutile de demander plus de pages que ce que le plafond permet de restituer
+        last_page = min(last_page, 1 + math.ceil(remaining / page_size))
+        # Fenêtre glissante : au plus `concurrency` pages ouvertes, lues dans l'ordre ; les
+        # corps en attente restent dans les tampons réseau, la mémoire reste bornée
+        pending: Deque["asyncio.Task[httpx.Response]"] = deque()
+        next_page = 2
+        try:
+            while pending or next_page <= last_page:
+                while next_page <= last_page and len(pending) < self.concurrency:
+                    pending.append(asyncio.ensure_future(self._open_page(next_page)))
+                    next_page += 1
+                response = await pending[0]
+                pending.popleft()
+                try:
+                    async for item in iter_members(response.aiter_bytes(), MemberDecoder()):
+                        if remaining <= 0:
+                            return
+                        remaining -= 1
+                        self.count += 1
+                        yield item
+                finally:
+                    await response.aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, httpx.Response):
+                    await result.aclose()
+
+
+async def fetch_all_pages(
+    api: ApiClient,
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    max_items: int = DEFAULT_MAX_ITEMS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, Any]:
+    """Fusionne toutes les pages d'une collection en un seul document"""
+    stream = CollectionStream(api, endpoint, params, headers, max_items, concurrency)
+    return stream.document([item async for item in stream])
@@ -0,0 +1,182 @@
+"""
+Projection et sérialisation compacte des réponses
+
+Les documents JSON-LD de l'API portent beaucoup de métadonnées (@context,
+@type, view, ...) inutiles pour un agent. Les outils de lecture acceptent
+`fields` pour ne garder que certains champs et `format` pour choisir la forme
+de sortie : JSON complet, JSON compact sans métadonnées, ou tableau CSV/TSV.
+
+Une collection lue au fil de l'eau (encode_collection) est projetée et
+sérialisée élément par élément : seul le texte de la réponse s'accumule.
+"""
+
+import csv
+import io
+import json
+import os
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+# Au-delà de cette taille (en octets), le JSON est renvoyé sans indentation
+PRETTY_MAX_BYTES = int(os.getenv("LETMECOUNT_PRETTY_JSON_MAX_BYTES", "4096"))
+
+# Champs de pilotage de la sortie, jamais transmis à l'API
+PROJECTION_FIELDS = frozenset({"fields", "format"})
+
+OutputFormat = Literal["json", "compact", "csv", "tsv"]
+
+
+class ProjectionInput(BaseModel):
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Champs à conserver, notation pointée pour les sous-objets (ex. id, titre, montant, details.user)",
+    )
+    format: OutputFormat = Field(
+        default="json",
+        description="json : document complet, compact : sans métadonnées JSON-LD, csv/tsv : tableau d'une ligne par élément",
+    )
+
+
+def _compact(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(data: Any) -> str:
+    """JSON indenté pour les petites réponses, compact au-delà de PRETTY_MAX_BYTES"""
+    text = _compact(data)
+    if len(text) <= PRETTY_MAX_BYTES:
+        return json.dumps(data, indent=2, ensure_ascii=False)
+    return text
+
+
+def _field_tree(fields: Iterable[str]) -> Dict[str, Any]:
+    """["a", "b.c", "b.d"] → {"a": {}, "b": {"c": {}, "d": {}}}"""
+    tree: Dict[str, Any] = {}
+    for path in fields:
+        node = tree
+        for part in path.split("."):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value: Any, tree: Dict[str, Any]) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _project(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+def _strip_metadata(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_strip_metadata(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _strip_metadata(item) for key, item in value.items() if not key.startswith(("@", "hydra:"))}
+    return value
+
+
+def _members(data: Dict[str, Any]) -> Optional[List[Any]]:
+    members = data.get("member", data.get("hydra:member"))
+    return members if isinstance(members, list) else None
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return _compact(value)
+    return str(value)
+
+
+def to_table(rows: List[Dict[str, Any]], columns: Optional[List[str]], delimiter: str) -> str:
+    """Une ligne par élément ; les valeurs imbriquées sont écrites en JSON compact"""
+    if columns is None:
+        columns = []
+        for row in rows:
+            columns.extend(key for key in row if key not in columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(row.get(column)) for column in columns])
+    return buffer.getvalue()
+
+
+def apply_projection(data: Any, args: ProjectionInput) -> Any:
+    """Applique `fields` et `format` à un document ou à une collection"""
+    if not isinstance(data, dict) or (args.fields is None and args.format == "json"):
+        return data
+
+    tree = _field_tree(args.fields or [])
+    members = _members(data)
+    if args.format == "json":
+        if members is None:
+            return _project(data, tree)
+        key = "member" if "member" in data else "hydra:member"
+        return {**data, key: _project(members, tree)}
+
+    rows = _strip_metadata(members if members is not None else [data])
+    rows = _project(rows, tree)
+    if args.format == "compact":
+        if members is None:
+            return rows[0]
+        total = data.get("totalItems", data.get("hydra:totalItems"))
+        extra = {key: data[key] for key in ("pages", "truncated") if key in data}
+        return {"totalItems": total, **extra, "member": rows}
+
+    columns = list(tree) if tree else None
+    return to_table(rows, columns, "," if args.format == "csv" else "\t")
+
+
+async def encode_collection(
+    items: AsyncIterable[Any],
+    args: ProjectionInput,
+    document: Callable[[List[Any]], Dict[str, Any]],
+) -> str:
+    """
+    Réponse d'une collection lue au fil de l'eau, identique à
+    dumps(apply_projection(document(éléments), args)) ; `document` n'est appelé
+    qu'après le dernier élément (les métadonnées suivent les éléments).
+    """
+    tree = _field_tree(args.fields or [])
+    table = args.format in ("csv", "tsv")
+    columns = list(tree) if tree else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter="," if args.format == "csv" else "\t", lineterminator="\n")
+    if table and columns is not None:
+        writer.writerow(columns)
+    # Sans `fields`, les colonnes d'un tableau ne sont connues qu'une fois tous les éléments lus
+    rows: List[Dict[str, Any]] = []
+    encoded: List[str] = []
+
+    async for item in items:
+        if args.format == "json":
+            encoded.append(_compact(_project(item, tree)))
+            continue
+        row = _project(_strip_metadata(item), tree)
+        if not table:
+            encoded.append(_compact(row))
+        elif columns is None:
+            rows.append(row)
+        else:
+            writer.writerow([_cell(row.get(column)) for column in columns])
+
+    if table:
+        return to_table(rows, None, writer.dialect.delimiter) if columns is None else buffer.getvalue()
+
+    members = "[" + ",".join(encoded) + "]"
+    del encoded
+    data = document([])
+    key = "member" if "member" in data else "hydra:member"
+    if args.format == "compact":
+        total = data.get("totalItems", data.get("hydra:totalItems"))
+        data = {"totalItems": total, **{k: data[k] for k in ("pages", "truncated") if k in data}, "member": []}
+        key = "member"
+    data.setdefault(key, [])
+    text = "{" + ",".join(f"{_compact(k)}:{members if k == key else _compact(v)}" for k, v in data.items()) + "}"
+    if len(text) <= PRETTY_MAX_BYTES:
+        return json.dumps(json.loads(text), indent=2, ensure_ascii=False)
+    return text
@@ -0,0 +1,152 @@
+"""
+Registre déclaratif des outils MCP
+
+Chaque outil est décrit une seule fois par un ToolSpec (modèle d'entrée,
+méthode HTTP, chemin, type de contenu). Les serveurs stdio et HTTP en dérivent
+leurs schémas et dispatchent les appels par simple recherche dans un dict.
+"""
+
+from dataclasses import dataclass
+from string import Formatter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+import httpx
+from pydantic import BaseModel, ValidationError
+
+from api_client import ApiClient
+from auth import Credentials
+from projection import PROJECTION_FIELDS, ProjectionInput, apply_projection
+from resilience import CircuitOpenError
+from telemetry import tool_call
+
+JSON_LD = "application/ld+json"
+MERGE_PATCH = "application/merge-patch+json"
+
+
+class ToolContext:
+    """État d'un appel d'outil : client HTTP partagé et identifiants de la session MCP"""
+
+    def __init__(self, api: ApiClient, credentials: Optional[Credentials] = None, session: Any = None):
+        self.api = api
+        self.credentials = credentials if credentials is not None else Credentials()
+        # Session MCP (ServerSession) pour les notifications ; None si le transport est sans état
+        self.session = session
+
+    @property
+    def jwt_token(self) -> Optional[str]:
+        return self.credentials.token
+
+    def headers(self, content_type: str = JSON_LD, authenticated: bool = True) -> Dict[str, str]:
+        """Retourne les headers HTTP avec authentification"""
+        headers = {"Content-Type": content_type}
+        if authenticated and self.jwt_token:
+            headers["Authorization"] = f"Bearer {self.jwt_token}"
+        return headers
+
+
+Handler = Callable[[ToolContext, BaseModel], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    name: str
+    description: str
+    input_model: Type[BaseModel]
+    method: str = "GET"
+    path: str = ""
+    content_type: str = JSON_LD
+    authenticated: bool = True
+    # Message renvoyé à la place du corps (réponses 204 No Content)
+    success_message: Optional[str] = None
+    # Implémentation spécifique, à la place de la requête générique
+    handler: Optional[Handler] = None
+    # Corps de la requête générique, à la place des champs du modèle
+    body: Optional[Callable[[BaseModel], Any]] = None
+    # Préfixe des messages d'erreur HTTP
+    error_label: str = "Erreur HTTP"
+    # Outil lisant ou écrivant des chemins locaux : exposé en stdio seulement, pas par http_server.py
+    stdio_only: bool = False
+
+    @property
+    def path_fields(self) -> Tuple[str, ...]:
+        return tuple(field for _, field, _, _ in Formatter().parse(self.path) if field)
+
+    def input_schema(self) -> Dict[str, Any]:
+        return self.input_model.model_json_schema()
+
+
+def write_request(spec: ToolSpec, args: BaseModel) -> Tuple[str, Any]:
+    """Chemin et corps d'une écriture générique (POST, PATCH, DELETE)"""
+    path_fields = set(spec.path_fields)
+    path = spec.path.format(**{field: getattr(args, field) for field in path_fields})
+    if spec.method == "DELETE":
+        return path, None
+    if spec.body is not None:
+        return path, spec.body(args)
+    # PATCH merge-patch : seuls les champs fournis sont envoyés
+    return path, args.model_dump(exclude_unset=spec.method == "PATCH", exclude_none=spec.method != "PATCH", exclude=path_fields)
+
+
+async def request_tool(spec: ToolSpec, ctx: ToolContext, args: BaseModel) -> Any:
+    """Exécution générique : chemin depuis les champs du modèle, le reste en query (GET) ou en corps"""
+    headers = ctx.headers(spec.content_type, spec.authenticated)
+
+    if spec.method == "GET":
+        path_fields = set(spec.path_fields)
+        path = spec.path.format(**{field: getattr(args, field) for field in path_fields})
+        params = args.model_dump(exclude_none=True, exclude=path_fields | PROJECTION_FIELDS)
+        return await ctx.api.get_json(path, params=params or None, headers=headers)
+
+    path, body = write_request(spec, args)
+    response = await ctx.api.request(spec.method, path, json=body, headers=headers)
+    response.raise_for_status()
+    if spec.success_message or response.status_code == 204:
+        return spec.success_message or "Opération réussie."
+    return response.json()
+
+
+async def _execute(spec: ToolSpec, ctx: ToolContext, args: BaseModel) -> Any:
+    if spec.handler is not None:
+        result = await spec.handler(ctx, args)
+    else:
+        result = await request_tool(spec, ctx, args)
+    if isinstance(args, ProjectionInput):
+        return apply_projection(result, args)
+    return result
+
+
+async def authenticated(ctx: ToolContext, operation: Callable[[], Awaitable[Any]]) -> Any:
+    """Exécute `operation` avec un JWT à jour, renouvelé au besoin"""
+    await ctx.credentials.ensure_fresh(ctx.api)
+    token = ctx.jwt_token
+    try:
+        return await operation()
+    except httpx.HTTPStatusError as e:
+        # JWT expiré ou révoqué : un seul nouvel essai après renouvellement
+        if e.response.status_code != 401 or token is None:
+            raise
+        if not await ctx.credentials.refresh(ctx.api, stale_token=token):
+            raise
+        return await operation()
+
+
+async def run_tool(spec: ToolSpec, ctx: ToolContext, arguments: Optional[Dict[str, Any]]) -> Any:
+    """Valide les arguments et exécute l'outil ; les erreurs sont renvoyées sous forme de texte"""
+    with tool_call(spec.name) as call:
+        try:
+            args = spec.input_model.model_validate(arguments or {})
+            if not spec.authenticated:
+                return await _execute(spec, ctx, args)
+            return await authenticated(ctx, lambda: _execute(spec, ctx, args))
+        except httpx.HTTPStatusError as e:
+            call["outcome"] = f"http_{e.response.status_code}"
+            return f"{spec.error_label}: {e.response.status_code} - {e.response.text}"
+        except ValidationError as e:
+            call["outcome"] = "validation_error"
+            return f"Erreur de validation: {e}"
+        except CircuitOpenError as e:
+            call["outcome"] = "circuit_open"
+            return f"Erreur: {e}"
+        except Exception as e:
+            call["outcome"] = "error"
+            return f"Erreur: {str(e)}"
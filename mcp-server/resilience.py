@@ -0,0 +1,178 @@
+"""
+Nouvelles tentatives, disjoncteurs et limite de concurrence vers l'API
+
+Une requête idempotente (GET, PUT, DELETE...) qui échoue sur une erreur de
+connexion ou une réponse 429/502/503/504 est retentée après un délai
+exponentiel avec gigue, ou après le délai demandé par `Retry-After`. Les POST
+et PATCH ne sont retentés que si la connexion n'a pas pu être établie (la
+requête n'est alors jamais partie).
+
+Chaque endpoint (`/depenses/{id}`, ...) a son disjoncteur : après plusieurs
+échecs consécutifs, les appels échouent immédiatement pendant un délai de
+repos, puis un seul appel d'essai décide de sa refermeture.
+"""
+
+import os
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+
+from telemetry import CIRCUIT_REJECTED, CIRCUIT_STATE
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# 429 signale une API vivante mais chargée : pas de quoi ouvrir le disjoncteur
+BREAKER_STATUSES = frozenset({502, 503, 504})
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """L'endpoint est en échec répété : l'appel est refusé sans contacter l'API"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"API indisponible sur {endpoint}, nouvel essai possible dans {retry_in:.0f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Délai en secondes d'un header Retry-After (nombre de secondes ou date HTTP)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def connection_not_sent(error: httpx.TransportError) -> bool:
+    """La requête n'a pas quitté le client : la rejouer est sans risque"""
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+    retry_after_max: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            attempts=max(1, int(os.getenv("LETMECOUNT_RETRY_ATTEMPTS", "3"))),
+            backoff_base=float(os.getenv("LETMECOUNT_RETRY_BACKOFF", "0.2")),
+            backoff_max=float(os.getenv("LETMECOUNT_RETRY_BACKOFF_MAX", "5")),
+            retry_after_max=float(os.getenv("LETMECOUNT_RETRY_AFTER_MAX", "30")),
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Attente avant la tentative suivante (`attempt` part de 1), None si on abandonne"""
+        if attempt >= self.attempts:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.retry_after_max else None
+        # Gigue complète : évite que tous les clients reviennent en même temps
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Disjoncteur d'un endpoint : fermé → ouvert après N échecs → semi-ouvert après le repos"""
+
+    def __init__(self, endpoint: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self._publish()
+
+    def before_request(self) -> None:
+        """Lève CircuitOpenError si l'appel doit être refusé"""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self._reject(remaining)
+            self._set(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            # Un seul appel d'essai à la fois
+            if self.probing:
+                self._reject(0)
+            self.probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.probing = False
+        if self.state != CLOSED:
+            self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set(OPEN)
+
+    def release(self) -> None:
+        """Appel interrompu sans verdict (annulation) : libère l'essai en cours"""
+        self.probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+        if self.state == OPEN:
+            data["retry_in"] = round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 1)
+        return data
+
+    def _reject(self, remaining: float) -> None:
+        self.rejected += 1
+        CIRCUIT_REJECTED.labels(self.endpoint).inc()
+        raise CircuitOpenError(self.endpoint, remaining)
+
+    def _set(self, state: str) -> None:
+        self.state = state
+        self._publish()
+
+    def _publish(self) -> None:
+        CIRCUIT_STATE.labels(self.endpoint).set(STATE_VALUES[self.state])
+
+
+class CircuitBreakers:
+    """Un disjoncteur par endpoint, créé à la première requête"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, enabled: bool = True):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.enabled = enabled
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreakers":
+        threshold = int(os.getenv("LETMECOUNT_BREAKER_THRESHOLD", "5"))
+        return cls(
+            failure_threshold=max(1, threshold),
+            reset_timeout=float(os.getenv("LETMECOUNT_BREAKER_RESET", "30")),
+            enabled=threshold > 0,
+        )
+
+    def get(self, endpoint: str) -> Optional[CircuitBreaker]:
+        if not self.enabled:
+            return None
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: breaker.snapshot() for endpoint, breaker in sorted(self._breakers.items())}
@@ -0,0 +1,181 @@
+"""
+Ressources MCP : utilisateurs, tags et dépenses par mois
+
+-   `letmecount://users/{id}` (ou `users/me`) et `letmecount://tags/{id}` : servis
+    par le cache des réponses, revalidés auprès de l'API à expiration ;
+-   `letmecount://depenses/{yyyy-mm}` : dépenses d'un mois lues dans l'index local
+    de recherche, construit à la première lecture puis synchronisé.
+
+Les deux serveurs (stdio et HTTP) partagent ces fonctions. Un abonnement
+(`resources/subscribe`) démarre pour la session une tâche qui suit le journal
+des dépenses (change_feed.py) et revérifie les ressources abonnées : une
+notification `resources/updated` n'est envoyée que si leur contenu a changé.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from mcp.shared.exceptions import McpError
+from mcp.types import ErrorData
+from pydantic import AnyUrl
+
+from change_feed import POLL_MAX, POLL_MIN, feed_caches, feed_for
+from registry import ToolContext, authenticated
+from search_index import synced_index
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPE = "application/json"
+RESOURCE_NOT_FOUND = -32002
+
+# Modèle d'URI → (nom, description)
+RESOURCE_TEMPLATES: Dict[str, Tuple[str, str]] = {
+    "letmecount://users/{id}": ("Utilisateur", "Utilisateur et son solde (`me` : l'utilisateur connecté)"),
+    "letmecount://tags/{id}": ("Tag", "Tag et ses membres"),
+    "letmecount://depenses/{month}": ("Dépenses du mois", "Dépenses d'un mois au format yyyy-mm, les plus récentes en premier"),
+}
+# Seule ressource listée telle quelle, les autres passent par les modèles
+CURRENT_USER = ("letmecount://users/me", "Utilisateur connecté")
+
+URI_PATTERN = re.compile(r"^letmecount://(?:(users)/(\d+|me)|(tags)/(\d+)|(depenses)/(\d{4}-(?:0[1-9]|1[0-2])))$")
+
+
+def parse_uri(uri: str) -> Tuple[str, str]:
+    """(`users` | `tags` | `depenses`, identifiant ou mois)"""
+    match = URI_PATTERN.match(str(uri))
+    if match is None:
+        raise McpError(ErrorData(code=RESOURCE_NOT_FOUND, message=f"Ressource inconnue : {uri}"))
+    kind, key = [group for group in match.groups() if group is not None]
+    return kind, key
+
+
+async def _load(ctx: ToolContext, kind: str, key: str) -> Any:
+    if kind == "depenses":
+        index, _ = await synced_index(ctx)
+        member = index.month(key)
+        return {"month": key, "totalItems": len(member), "member": member}
+    return await ctx.api.get_json(f"/{kind}/{key}", headers=ctx.headers())
+
+
+async def read_resource(ctx: ToolContext, uri: str) -> Any:
+    """Contenu JSON d'une ressource ; erreur MCP « ressource introuvable » sur 404"""
+    kind, key = parse_uri(uri)
+    try:
+        return await authenticated(ctx, lambda: _load(ctx, kind, key))
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            raise McpError(ErrorData(code=RESOURCE_NOT_FOUND, message=f"Ressource introuvable : {uri}")) from None
+        raise
+
+
+def digest(data: Any) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# --- Abonnements ---
+
+class ResourceWatcher:
+    """Ressources abonnées d'une session MCP et tâche qui les surveille"""
+
+    def __init__(self, ctx: ToolContext, session: Any):
+        self.ctx = ctx
+        self.session = session
+        # URI → empreinte du dernier contenu connu (None : introuvable)
+        self.digests: Dict[str, Optional[str]] = {}
+        self.interval = POLL_MIN
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    async def subscribe(self, uri: str) -> None:
+        parse_uri(uri)
+        self.digests[uri] = await self._digest(uri)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+            self.task.add_done_callback(self._finished)
+
+    def unsubscribe(self, uri: str) -> None:
+        self.digests.pop(uri, None)
+        if not self.digests:
+            self.stop()
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def _finished(self, task: "asyncio.Task[None]") -> None:
+        """Fin de la tâche hors désabonnement (session fermée, envoi impossible)"""
+        if task is not self.task:
+            return
+        self.task = None
+        self.digests.clear()
+        if _watchers.get(id(self.session)) is self:
+            del _watchers[id(self.session)]
+        if not task.cancelled() and task.exception() is not None:
+            logger.info("Surveillance des ressources arrêtée : %s", task.exception())
+
+    async def _digest(self, uri: str) -> Optional[str]:
+        try:
+            return digest(await read_resource(self.ctx, uri))
+        except McpError:
+            return None
+
+    async def _run(self) -> None:
+        feed = feed_for(self.ctx)
+        cursor = await authenticated(self.ctx, lambda: feed.position(self.ctx))
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                page = await authenticated(self.ctx, lambda: feed.read(self.ctx, cursor, limit=1000))
+                await feed_caches(self.ctx, cursor, page)
+                cursor = page.cursor
+                updated = await self._check(depenses_changed=bool(page.changes or page.gap))
+            except Exception as e:
+                logger.warning("Surveillance des ressources impossible (%s)", e)
+                self.interval = min(POLL_MAX, self.interval * 1.5)
+                continue
+            for uri in updated:
+                await self.session.send_resource_updated(AnyUrl(uri))
+            self.interval = POLL_MIN if updated else min(POLL_MAX, self.interval * 1.5)
+
+    async def _check(self, depenses_changed: bool) -> List[str]:
+        """URIs dont le contenu a changé depuis la dernière vérification"""
+        cache = self.ctx.api.cache
+        updated = []
+        for uri in list(self.digests):
+            kind, key = parse_uri(uri)
+            if kind == "depenses":
+                # L'index n'a bougé que si le journal a bougé
+                if not depenses_changed:
+                    continue
+            elif cache is not None:
+                # Utilisateurs et tags ne sont pas journalisés : revalidation (requête conditionnelle)
+                cache.expire_paths([f"/{kind}/{key}"])
+            current = await self._digest(uri)
+            if uri in self.digests and current != self.digests[uri]:
+                self.digests[uri] = current
+                updated.append(uri)
+        return updated
+
+
+_watchers: Dict[int, ResourceWatcher] = {}
+
+
+async def subscribe(ctx: ToolContext, session: Any, uri: str) -> None:
+    parse_uri(uri)
+    watcher = _watchers.get(id(session))
+    if watcher is None:
+        watcher = _watchers[id(session)] = ResourceWatcher(ctx, session)
+    await watcher.subscribe(str(uri))
+
+
+def unsubscribe(session: Any, uri: str) -> None:
+    watcher = _watchers.get(id(session))
+    if watcher is not None:
+        watcher.unsubscribe(str(uri))
+        if not watcher.digests:
+            del _watchers[id(session)]
@@ -0,0 +1,385 @@
+"""
+Index local de recherche des dépenses
+
+L'API ne filtre /depenses que par tag exact. Les dépenses visibles par
+l'utilisateur sont donc recopiées dans une base SQLite (une par identité, dans
+le répertoire de données) avec un index plein texte FTS5 sur le titre, ce qui
+permet les recherches par mots, intervalles de dates et de montants, payeur,
+tag et participant sans relire la collection.
+
+Synchronisation incrémentale : le journal /logs (trié par date décroissante)
+est lu jusqu'au dernier log déjà traité (le filigrane) et seules les dépenses
+qu'il cite sont relues. Les logs d'une dépense supprimée disparaissent avec
+elle (ON DELETE CASCADE) : une différence de `totalItems` sur /depenses
+déclenche donc une reconstruction complète.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Literal, Optional, Set, Tuple
+
+import httpx
+from pydantic import Field
+
+from auth import identity_from_headers
+from pagination import CollectionStream, collection_members, collection_total
+from projection import ProjectionInput
+from registry import ToolContext
+from storage import data_path, identity_slug
+
+SCHEMA_VERSION = "1"
+# Nombre minimum de secondes entre deux synchronisations automatiques
+SYNC_INTERVAL = float(os.getenv("LETMECOUNT_SEARCH_SYNC_INTERVAL", "30"))
+# Au-delà de ce nombre de pages de logs, une reconstruction complète est plus rapide
+MAX_LOG_PAGES = int(os.getenv("LETMECOUNT_SEARCH_MAX_LOG_PAGES", "10"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS depenses (
+    id INTEGER PRIMARY KEY,
+    iri TEXT NOT NULL,
+    titre TEXT NOT NULL,
+    montant REAL NOT NULL,
+    date TEXT NOT NULL,
+    tag TEXT,
+    paye_par TEXT,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS depenses_date ON depenses (date);
+CREATE INDEX IF NOT EXISTS depenses_montant ON depenses (montant);
+CREATE INDEX IF NOT EXISTS depenses_paye_par ON depenses (paye_par);
+CREATE INDEX IF NOT EXISTS depenses_tag ON depenses (tag);
+CREATE TABLE IF NOT EXISTS participants (
+    depense_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    PRIMARY KEY (depense_id, user)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS participants_user ON participants (user);
+CREATE VIRTUAL TABLE IF NOT EXISTS depenses_fts USING fts5(titre, tokenize = 'unicode61 remove_diacritics 2');
+"""
+
+
+class DepensesSearchInput(ProjectionInput):
+    q: Optional[str] = Field(default=None, description="Mots recherchés dans le titre (préfixes acceptés, ex. 'restau')")
+    date_min: Optional[str] = Field(default=None, description="Date minimale incluse (AAAA-MM-JJ)")
+    date_max: Optional[str] = Field(default=None, description="Date maximale incluse (AAAA-MM-JJ)")
+    montant_min: Optional[float] = Field(default=None, description="Montant minimal inclus")
+    montant_max: Optional[float] = Field(default=None, description="Montant maximal inclus")
+    payePar: Optional[str] = Field(default=None, description="IRI du payeur")
+    tag: Optional[str] = Field(default=None, description="IRI du tag")
+    participant: Optional[str] = Field(default=None, description="IRI d'un utilisateur participant")
+    limit: int = Field(default=50, description="Nombre maximum de résultats", ge=1, le=500)
+    offset: int = Field(default=0, description="Décalage dans les résultats", ge=0)
+    refresh: Literal["auto", "full"] = Field(default="auto", description="auto : synchronisation incrémentale si l'index a plus de quelques secondes, full : reconstruction complète")
+
+
+def iri_id(iri: str) -> int:
+    return int(iri.rstrip("/").rsplit("/", 1)[-1])
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Chaque mot devient un préfixe entre guillemets (pas d'injection de syntaxe FTS5)"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+async def latest_log_id(ctx: ToolContext, headers: Dict[str, str]) -> Optional[int]:
+    """Identifiant du log le plus récent (0 si le journal est vide, None s'il est inaccessible)"""
+    try:
+        data = await ctx.api.get_json("/logs", params={"page": 1}, headers=headers)
+    except httpx.HTTPStatusError:
+        return None
+    members = collection_members(data)
+    return members[0]["id"] if members else 0
+
+
+async def scan_logs(
+    ctx: ToolContext, headers: Dict[str, str], watermark: int, max_pages: int = MAX_LOG_PAGES,
+) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """Logs postérieurs au filigrane, dernier id vu, et False si le filigrane n'a pas été atteint
+
+    Le journal est trié par date décroissante : des logs d'une même seconde
+    peuvent arriver hors de l'ordre des ids. Les logs déjà vus sont donc ignorés
+    sans interrompre la lecture, qui s'arrête sur une page entièrement déjà vue
+    ou sur un log strictement plus ancien qu'un log déjà vu.
+    """
+    logs: List[Dict[str, Any]] = []
+    head = watermark
+    # Date la plus récente parmi les logs déjà vus : tout log antérieur l'est aussi
+    seen_date: Optional[str] = None
+    for page in range(1, max_pages + 1):
+        data = await ctx.api.get_json("/logs", params={"page": page}, headers=headers)
+        members = collection_members(data)
+        fresh = 0
+        for log in members:
+            date = log.get("date")
+            if seen_date is not None and date is not None and date < seen_date:
+                return logs, head, True
+            if log["id"] <= watermark:
+                if date is not None and (seen_date is None or date > seen_date):
+                    seen_date = date
+                continue
+            head = max(head, log["id"])
+            logs.append(log)
+            fresh += 1
+        if not members or not fresh or page * len(members) >= (collection_total(data) or 0):
+            return logs, head, True
+    return logs, head, False
+
+
+async def logs_since(ctx: ToolContext, headers: Dict[str, str], watermark: int) -> Optional[Tuple[Set[str], int]]:
+    """IRIs des dépenses citées par les logs postérieurs au filigrane, et le nouveau filigrane
+
+    None si le journal est indisponible ou trop long à parcourir.
+    """
+    try:
+        logs, latest, complete = await scan_logs(ctx, headers, watermark)
+    except httpx.HTTPStatusError:
+        return None
+    if not complete:
+        return None
+    return {log["depense"] for log in logs if log.get("depense")}, latest
+
+
+class SearchIndex:
+    """Copie locale et interrogeable des dépenses d'une identité"""
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self._meta("schema") not in (None, SCHEMA_VERSION):
+            self.db.executescript("DROP TABLE IF EXISTS depenses; DROP TABLE IF EXISTS participants; "
+                                  "DROP TABLE IF EXISTS depenses_fts; DROP TABLE IF EXISTS meta;")
+        self.db.executescript(SCHEMA)
+        self._set_meta("schema", SCHEMA_VERSION)
+        self.db.commit()
+        self.synced_at = 0.0
+        self.lock = asyncio.Lock()
+
+    # --- Métadonnées ---
+
+    def _meta(self, key: str) -> Optional[str]:
+        try:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        if value is None:
+            self.db.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def watermark(self) -> Optional[int]:
+        """Identifiant du dernier log intégré ; None tant que l'index n'a jamais été construit"""
+        value = self._meta("watermark")
+        return int(value) if value is not None else None
+
+    @property
+    def count(self) -> int:
+        return self.db.execute("SELECT count(*) FROM depenses").fetchone()[0]
+
+    # --- Écriture ---
+
+    def upsert(self, depense: Dict[str, Any]) -> None:
+        depense_id = iri_id(depense["@id"])
+        self.delete(depense_id)
+        self.db.execute(
+            "INSERT INTO depenses (id, iri, titre, montant, date, tag, paye_par, document) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (depense_id, depense["@id"], depense.get("titre", ""), depense.get("montant", 0.0), depense.get("date", ""),
+             depense.get("tag"), depense.get("payePar"), json.dumps(depense, ensure_ascii=False)),
+        )
+        self.db.execute("INSERT INTO depenses_fts (rowid, titre) VALUES (?, ?)", (depense_id, depense.get("titre", "")))
+        users = {detail["user"] for detail in depense.get("details") or [] if detail.get("user")}
+        self.db.executemany("INSERT INTO participants (depense_id, user) VALUES (?, ?)", [(depense_id, u) for u in users])
+
+    def delete(self, depense_id: int) -> None:
+        self.db.execute("DELETE FROM depenses WHERE id = ?", (depense_id,))
+        self.db.execute("DELETE FROM depenses_fts WHERE rowid = ?", (depense_id,))
+        self.db.execute("DELETE FROM participants WHERE depense_id = ?", (depense_id,))
+
+    def clear(self) -> None:
+        for table in ("depenses", "depenses_fts", "participants"):
+            self.db.execute(f"DELETE FROM {table}")
+
+    def mark_synced(self, latest_log: Optional[int]) -> None:
+        """Valide le contenu de l'index, à jour au log `latest_log` (None : journal inaccessible)"""
+        self._set_meta("watermark", str(latest_log if latest_log is not None else 0))
+        self._set_meta("logs", "1" if latest_log is not None else "0")
+        self.db.commit()
+
+    # --- Synchronisation ---
+
+    async def _refetch(self, ctx: ToolContext, headers: Dict[str, str], iris: Iterable[str]) -> int:
+        """Relit les dépenses modifiées (hors cache) ; 403 ou 404 : supprimée ou plus visible"""
+        count = 0
+        for iri in iris:
+            response = await ctx.api.request("GET", iri, headers=headers)
+            if response.status_code in (403, 404):
+                self.delete(iri_id(iri))
+            else:
+                response.raise_for_status()
+                self.upsert(response.json())
+            count += 1
+        return count
+
+    async def apply_changes(self, ctx: ToolContext, since: int, iris: Iterable[str], latest: int) -> bool:
+        """Applique des changements lus dans le journal par ailleurs (depenses_watch)
+
+        Sans effet (False) si l'index n'est pas exactement au filigrane `since`.
+        """
+        if self.watermark != since or self._meta("logs") != "1":
+            return False
+        try:
+            await self._refetch(ctx, ctx.headers(), iris)
+            self.mark_synced(latest)
+        except BaseException:
+            self.db.rollback()
+            raise
+        return True
+
+    async def _rebuild(self, ctx: ToolContext, headers: Dict[str, str]) -> Dict[str, Any]:
+        # Filigrane lu avant la collection : un changement concurrent sera relu au prochain passage
+        latest = await latest_log_id(ctx, headers)
+        stream = CollectionStream(ctx.api, "/depenses", {}, headers, max_items=sys.maxsize)
+        self.clear()
+        async for depense in stream:
+            self.upsert(depense)
+        self.mark_synced(latest)
+        return {"mode": "full", "pages": stream.pages, "indexed": self.count}
+
+    async def sync(self, ctx: ToolContext, full: bool = False) -> Dict[str, Any]:
+        """Met l'index à jour ; en cas d'erreur, il reste dans son état précédent"""
+        try:
+            return await self._sync(ctx, full)
+        except BaseException:
+            self.db.rollback()
+            raise
+
+    async def _sync(self, ctx: ToolContext, full: bool) -> Dict[str, Any]:
+        headers = ctx.headers()
+        watermark = self.watermark
+        if full or watermark is None or self._meta("logs") != "1":
+            return await self._rebuild(ctx, headers)
+
+        since = await logs_since(ctx, headers, watermark)
+        if since is None:
+            return await self._rebuild(ctx, headers)
+        changed, latest = since
+        refetched = await self._refetch(ctx, headers, changed)
+
+        # Les suppressions n'apparaissent pas dans /logs : contrôle par le nombre total
+        first = await ctx.api.get_json("/depenses", params={"page": 1}, headers=headers)
+        if collection_total(first) != self.count:
+            self.db.rollback()
+            return await self._rebuild(ctx, headers)
+        self._set_meta("watermark", str(latest))
+        self.db.commit()
+        return {"mode": "incremental", "changed": refetched, "indexed": self.count}
+
+    # --- Recherche ---
+
+    def _clause(self, args: DepensesSearchInput) -> Tuple[str, List[Any]]:
+        """Clause FROM ... WHERE des filtres de `args`, et ses paramètres"""
+        joins, where, params = [], [], []
+        query = fts_query(args.q) if args.q else None
+        if query:
+            joins.append("JOIN depenses_fts ON depenses_fts.rowid = d.id")
+            where.append("depenses_fts MATCH ?")
+            params.append(query)
+        if args.date_min:
+            where.append("d.date >= ?")
+            params.append(args.date_min)
+        if args.date_max:
+            where.append("substr(d.date, 1, 10) <= ?")
+            params.append(args.date_max[:10])
+        if args.montant_min is not None:
+            where.append("d.montant >= ?")
+            params.append(args.montant_min)
+        if args.montant_max is not None:
+            where.append("d.montant <= ?")
+            params.append(args.montant_max)
+        if args.payePar:
+            where.append("d.paye_par = ?")
+            params.append(args.payePar)
+        if args.tag:
+            where.append("d.tag = ?")
+            params.append(args.tag)
+        if args.participant:
+            where.append("EXISTS (SELECT 1 FROM participants p WHERE p.depense_id = d.id AND p.user = ?)")
+            params.append(args.participant)
+        return f"FROM depenses d {' '.join(joins)} {'WHERE ' + ' AND '.join(where) if where else ''}", params
+
+    def search(self, args: DepensesSearchInput) -> Tuple[int, List[Dict[str, Any]]]:
+        clause, params = self._clause(args)
+        query = fts_query(args.q) if args.q else None
+        total = self.db.execute(f"SELECT count(*) {clause}", params).fetchone()[0]
+        order = "bm25(depenses_fts), d.date DESC" if query else "d.date DESC, d.id DESC"
+        rows = self.db.execute(
+            f"SELECT d.document {clause} ORDER BY {order} LIMIT ? OFFSET ?", [*params, args.limit, args.offset],
+        ).fetchall()
+        return total, [json.loads(row[0]) for row in rows]
+
+    def select(self, args: DepensesSearchInput) -> List[Dict[str, Any]]:
+        """Toutes les dépenses retenues par les filtres, sans limite, les plus récentes en premier"""
+        clause, params = self._clause(args)
+        rows = self.db.execute(f"SELECT d.document {clause} ORDER BY d.date DESC, d.id DESC", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def month(self, month: str) -> List[Dict[str, Any]]:
+        """Dépenses d'un mois (`yyyy-mm`), de la plus récente à la plus ancienne"""
+        year, number = int(month[:4]), int(month[5:7])
+        following = f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+        rows = self.db.execute(
+            "SELECT document FROM depenses WHERE date >= ? AND date < ? ORDER BY date DESC, id DESC", (month, following),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def months(self) -> List[str]:
+        return [row[0] for row in self.db.execute("SELECT DISTINCT substr(date, 1, 7) FROM depenses ORDER BY 1 DESC")]
+
+
+_indexes: Dict[str, SearchIndex] = {}
+
+
+def loaded_index(ctx: ToolContext) -> Optional[SearchIndex]:
+    """Index de l'identité s'il est déjà ouvert dans ce processus"""
+    return _indexes.get(identity_slug(ctx.api.base_url, identity_from_headers(ctx.headers())))
+
+
+def index_for(ctx: ToolContext) -> SearchIndex:
+    slug = identity_slug(ctx.api.base_url, identity_from_headers(ctx.headers()))
+    index = _indexes.get(slug)
+    if index is None:
+        index = _indexes[slug] = SearchIndex(data_path(f"search-{slug}.db"))
+    return index
+
+
+async def synced_index(
+    ctx: ToolContext, full: bool = False, max_age: float = SYNC_INTERVAL,
+) -> Tuple[SearchIndex, Dict[str, Any]]:
+    """Index de l'identité, synchronisé s'il date de plus de `max_age` secondes"""
+    index = index_for(ctx)
+    sync: Dict[str, Any] = {"mode": "none"}
+    async with index.lock:
+        if full or time.monotonic() - index.synced_at >= max_age:
+            sync = await index.sync(ctx, full=full)
+            index.synced_at = time.monotonic()
+    return index, sync
+
+
+async def depenses_search(ctx: ToolContext, args: DepensesSearchInput) -> Dict[str, Any]:
+    """Recherche dans l'index local, synchronisé avant la requête si nécessaire"""
+    index, sync = await synced_index(ctx, full=args.refresh == "full")
+    started = time.perf_counter()
+    total, members = index.search(args)
+    elapsed = round((time.perf_counter() - started) * 1000, 2)
+    return {"totalItems": total, "member": members, "query_ms": elapsed, "sync": sync}
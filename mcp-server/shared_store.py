@@ -0,0 +1,256 @@
+"""
+Stockage clé-valeur partagé entre les workers du serveur HTTP
+
+Identifiants de session, générations du cache et fenêtres de limitation de
+débit y sont conservés pour que n'importe quel worker (ou réplique derrière un
+répartiteur de charge) puisse servir n'importe quelle requête. Le backend est
+choisi par LETMECOUNT_STORE :
+
+-   `memory://` (par défaut) : en mémoire, propre au processus ;
+-   `sqlite:///chemin/store.db` : fichier SQLite (WAL) partagé par les workers d'une même machine ;
+-   `redis://hôte:6379/0` : serveur Redis ou compatible (paquet optionnel `redis`).
+
+Les valeurs sont sérialisées en JSON et peuvent expirer (`ttl` en secondes).
+"""
+
+import abc
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from storage import data_path
+
+STORE_URL = os.getenv("LETMECOUNT_STORE", "memory://")
+LOCK_TTL = 30.0
+LOCK_POLL = 0.05
+
+
+class SharedStore(abc.ABC):
+    """Interface commune des backends"""
+
+    # False : l'état n'est visible que du processus courant
+    shared = True
+    url = ""
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        """Incrémente un compteur ; `ttl` n'est appliqué qu'à sa création"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _unlock(self, key: str, token: str) -> None:
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def lock(self, key: str, ttl: float = LOCK_TTL) -> AsyncIterator[None]:
+        """Verrou exclusif entre workers, libéré d'office après `ttl` secondes"""
+        token = secrets.token_hex(8)
+        while not await self._try_lock(f"lock:{key}", token, ttl):
+            await asyncio.sleep(LOCK_POLL)
+        try:
+            yield
+        finally:
+            await self._unlock(f"lock:{key}", token)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class MemoryStore(SharedStore):
+    shared = False
+    url = "memory://"
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _live(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.monotonic() + ttl if ttl else None
+
+    async def get(self, key: str) -> Any:
+        item = self._live(key)
+        return item[0] if item is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (value, self._expiry(ttl))
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        item = self._live(key)
+        value = (item[0] if item is not None else 0) + 1
+        self._data[key] = (value, item[1] if item is not None else self._expiry(ttl))
+        return value
+
+    async def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._data[key] = (token, self._expiry(ttl))
+        return True
+
+    async def _unlock(self, key: str, token: str) -> None:
+        item = self._live(key)
+        if item is not None and item[0] == token:
+            del self._data[key]
+
+
+class SqliteStore(SharedStore):
+    """Table clé-valeur SQLite ; les appels bloquants passent par un thread"""
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS store (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.url = f"sqlite:///{path}"
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        db = self._connect()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(self.SCHEMA)
+        db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = self._connect()
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        return self._db
+
+    async def _run(self, query: str, *params: Any) -> Optional[Tuple[Any, ...]]:
+        def run() -> Optional[Tuple[Any, ...]]:
+            with self._db_lock:
+                return self.db.execute(query, params).fetchone()
+        return await asyncio.to_thread(run)
+
+    async def get(self, key: str) -> Any:
+        row = await self._run(
+            "SELECT value FROM store WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", key, time.time(),
+        )
+        return json.loads(row[0]) if row is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._run(
+            "INSERT OR REPLACE INTO store (key, value, expires_at) VALUES (?, ?, ?)",
+            key, json.dumps(value), time.time() + ttl if ttl else None,
+        )
+
+    async def delete(self, key: str) -> None:
+        await self._run("DELETE FROM store WHERE key = ?", key)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        row = await self._run(
+            "INSERT INTO store (key, value, expires_at) VALUES (?, '1', ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN expires_at IS NULL OR expires_at > ? THEN CAST(value AS INTEGER) + 1 ELSE 1 END, "
+            "expires_at = CASE WHEN expires_at IS NULL OR expires_at > ? THEN expires_at ELSE excluded.expires_at END "
+            "RETURNING value",
+            key, now + ttl if ttl else None, now, now,
+        )
+        return int(row[0])
+
+    async def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        now = time.time()
+        row = await self._run(
+            "INSERT INTO store (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE store.expires_at <= ? RETURNING value",
+            key, json.dumps(token), now + ttl, now,
+        )
+        return row is not None
+
+    async def _unlock(self, key: str, token: str) -> None:
+        await self._run("DELETE FROM store WHERE key = ? AND value = ?", key, json.dumps(token))
+
+    async def aclose(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class RedisStore(SharedStore):
+    """Serveur Redis (ou compatible : Valkey, KeyDB, Dragonfly)"""
+
+    # Suppression du verrou seulement s'il appartient encore à l'appelant
+    UNLOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, prefix: str = "letmecount:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("LETMECOUNT_STORE=redis:// nécessite le paquet redis (pip install redis)") from None
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Any:
+        value = await self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        value = await self.client.incr(self.prefix + key)
+        if value == 1 and ttl:
+            await self.client.pexpire(self.prefix + key, int(ttl * 1000))
+        return int(value)
+
+    async def _try_lock(self, key: str, token: str, ttl: float) -> bool:
+        return bool(await self.client.set(self.prefix + key, token, nx=True, px=int(ttl * 1000)))
+
+    async def _unlock(self, key: str, token: str) -> None:
+        await self.client.eval(self.UNLOCK, 1, self.prefix + key, token)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def open_store(url: str = STORE_URL) -> SharedStore:
+    """Backend désigné par une URL memory://, sqlite:///chemin ou redis://"""
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemoryStore()
+    if scheme == "sqlite":
+        path = url[len("sqlite://"):]
+        return SqliteStore(path if path.strip("/") else data_path("store.db"))
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisStore(url)
+    raise ValueError(f"LETMECOUNT_STORE non reconnu : {url}")
@@ -0,0 +1,71 @@
+"""
+Répartition du montant d'une dépense entre ses participants
+
+Reprend localement les règles de l'API (Depense, Detail et
+DepenseConstraintValidator) pour qu'une dépense invalide ne soit jamais
+envoyée, et calcule les montants des détails d'une dépense partagée par
+parts : le montant est réparti au centime près par la méthode du plus fort
+reste, de sorte que la somme des détails vaut exactement le montant.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+from models import DepensesCreateInput
+
+# Tolérance du DepenseConstraintValidator côté API
+MONTANT_TOLERANCE = 0.02
+
+
+def split_by_parts(total_cents: int, parts: Sequence[int]) -> List[int]:
+    """Montant en centimes réparti proportionnellement aux parts (méthode du plus fort reste)
+
+    Chaque part est à moins d'un centime de sa valeur exacte, jamais négative,
+    et la somme vaut exactement le montant.
+    """
+    total_parts = sum(parts)
+    if total_parts <= 0:
+        raise ValueError("details: le nombre total de parts doit être positif")
+    shares = [divmod(total_cents * part, total_parts) for part in parts]
+    remaining = total_cents - sum(quotient for quotient, _ in shares)
+    # Les centimes restants vont aux plus forts restes, à égalité dans l'ordre des détails
+    bonus = set(sorted(range(len(parts)), key=lambda i: -shares[i][1])[:remaining])
+    return [quotient + (i in bonus) for i, (quotient, _) in enumerate(shares)]
+
+
+def validate_depense(depense: DepensesCreateInput) -> List[str]:
+    """Règles métier vérifiées par l'API, contrôlées avant envoi"""
+    errors = []
+    if not depense.tag:
+        errors.append("tag: cette valeur ne doit pas être vide")
+    montants = [detail.montant for detail in depense.details]
+    if all(montant is None for montant in montants) and depense.partage == "parts":
+        if sum(detail.parts for detail in depense.details) <= 0:
+            errors.append("details: le nombre total de parts doit être positif")
+        return errors
+    missing = [str(i) for i, montant in enumerate(montants) if montant is None]
+    if missing:
+        hint = " (ou omettre tous les montants pour les calculer à partir des parts)" if depense.partage == "parts" else ""
+        errors.append(f"details[{', '.join(missing)}].montant: valeur manquante{hint}")
+        return errors
+    total = sum(montants)
+    if abs(depense.montant - total) >= MONTANT_TOLERANCE:
+        errors.append(f"details: la somme des détails ({round(total, 2)}) ne correspond pas au montant ({depense.montant})")
+    return errors
+
+
+def depense_body(depense: DepensesCreateInput) -> Dict[str, Any]:
+    """Corps du POST /depenses, montants des détails calculés s'ils sont absents"""
+    body = depense.model_dump(exclude_none=True)
+    if all(detail.montant is None for detail in depense.details):
+        cents = split_by_parts(round(depense.montant * 100), [detail.parts for detail in depense.details])
+        for detail, share in zip(body["details"], cents):
+            detail["montant"] = share / 100
+    return body
+
+
+def prepare_depense(depense: DepensesCreateInput) -> Dict[str, Any]:
+    """Corps du POST /depenses ; ValueError si l'API refuserait la dépense"""
+    errors = validate_depense(depense)
+    if errors:
+        raise ValueError("; ".join(errors))
+    return depense_body(depense)
@@ -0,0 +1,328 @@
+"""
+Statistiques agrégées sur les dépenses
+
+Les dépenses sont tenues en colonnes (tableaux `array` d'entiers : montants en
+centimes, codes de tag, de payeur, de participant et de jour) et agrégées par
+groupe : somme, nombre, moyenne, minimum, maximum et percentiles. NumPy est
+utilisé s'il est installé (regroupement par np.unique + bincount), sinon le
+calcul se fait en Python pur sur les mêmes colonnes.
+
+Les dépenses sont synchronisées comme pour balances.py (journal /logs) et les
+parts sont les montants enregistrés des détails ; les résultats sont gardés en
+cache tant qu'aucune dépense nouvelle ou modifiée n'est vue.
+"""
+
+import json
+import math
+from array import array
+from typing import Any, Callable, Dict, List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from auth import identity_from_headers
+from balances import BalanceEngine
+from historique import bucket
+from registry import ToolContext
+
+Metric = Literal["sum", "count", "mean", "min", "max", "p50", "p90", "p95", "p99"]
+TimeDimension = Literal["day", "week", "month", "year"]
+
+# (jour, tag, payeur, montant en centimes, ((participant, part en centimes), ...))
+Record = Tuple[str, Optional[str], str, int, Tuple[Tuple[str, int], ...]]
+
+
+class StatsInput(BaseModel):
+    metrics: List[Metric] = Field(default=["sum", "count", "mean"], description="Agrégats calculés pour chaque groupe", min_length=1)
+    tag: Optional[str] = Field(default=None, description="Restreindre à un tag (IRI)")
+    date_min: Optional[str] = Field(default=None, description="Date minimale incluse (AAAA-MM-JJ)")
+    date_max: Optional[str] = Field(default=None, description="Date maximale incluse (AAAA-MM-JJ)")
+    refresh: Literal["auto", "full"] = Field(default="auto", description="auto : synchronisation incrémentale, full : relecture complète")
+
+
+class StatsDepensesInput(StatsInput):
+    group_by: List[Literal["tag", "payer", "day", "week", "month", "year"]] = Field(
+        default=["tag"], description="Dimensions de regroupement des montants des dépenses",
+    )
+
+
+class StatsPartsInput(StatsInput):
+    group_by: List[Literal["tag", "payer", "participant", "day", "week", "month", "year"]] = Field(
+        default=["participant"], description="Dimensions de regroupement des parts individuelles (ce que chacun a consommé)",
+    )
+    participant: Optional[str] = Field(default=None, description="Restreindre à un participant (IRI)")
+
+
+def _numpy():
+    """NumPy est optionnel (pip install numpy) ; sans lui, agrégation en Python pur"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def percentile(ordered: Sequence[int], p: float) -> float:
+    """Percentile par interpolation linéaire (méthode par défaut de numpy.percentile)"""
+    position = (len(ordered) - 1) * p / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class Codes:
+    """Table de codes entiers pour une dimension (valeur ↔ code)"""
+
+    def __init__(self):
+        self.index: Dict[Any, int] = {}
+        self.values: List[Any] = []
+
+    def code(self, value: Any) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class Columns:
+    """Vue en colonnes des dépenses (une ligne par dépense) et des parts (une ligne par participant)"""
+
+    def __init__(self, records: Sequence[Record]):
+        self.days = Codes()
+        self.iris = Codes()
+        self.tags = Codes()
+        # Dépenses
+        self.day = array("i")
+        self.tag = array("i")
+        self.payer = array("i")
+        self.montant = array("q")
+        # Parts
+        self.part_row = array("i")
+        self.participant = array("i")
+        self.part = array("q")
+        for row, (day, tag, payer, montant, shares) in enumerate(sorted(records)):
+            self.day.append(self.days.code(day))
+            self.tag.append(self.tags.code(tag))
+            self.payer.append(self.iris.code(payer))
+            self.montant.append(montant)
+            for user, share in shares:
+                self.part_row.append(row)
+                self.participant.append(self.iris.code(user))
+                self.part.append(share)
+        self._buckets: Dict[str, Tuple[array, Codes]] = {}
+
+    def buckets(self, granularity: str) -> Tuple[array, Codes]:
+        """Code du pas de temps de chaque jour connu"""
+        if granularity not in self._buckets:
+            labels = Codes()
+            granularity_name = {"day": "daily", "week": "weekly", "month": "monthly"}.get(granularity)
+            codes = array("i", (
+                labels.code(day[:4] if granularity == "year" else bucket(day, granularity_name))
+                for day in self.days.values
+            ))
+            self._buckets[granularity] = (codes, labels)
+        return self._buckets[granularity]
+
+
+def group_stats(keys: List[Sequence[int]], values: Sequence[int], metrics: Sequence[str]) -> List[Tuple[Tuple[int, ...], Dict[str, float]]]:
+    """Agrégats de `values` (centimes) par combinaison de codes, groupes triés par clé"""
+    np = _numpy()
+    if np is not None and len(values):
+        return _group_stats_numpy(np, keys, values, metrics)
+
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for position, value in enumerate(values):
+        groups.setdefault(tuple(key[position] for key in keys), []).append(value)
+    result = []
+    for key in sorted(groups):
+        ordered = sorted(groups[key])
+        total = sum(ordered)
+        result.append((key, _metrics(metrics, total, len(ordered), ordered)))
+    return result
+
+
+def _group_stats_numpy(np, keys, values, metrics):
+    vals = np.frombuffer(values, dtype=np.int64) if isinstance(values, array) else np.asarray(values, dtype=np.int64)
+    if keys:
+        matrix = np.column_stack([np.asarray(key, dtype=np.int64) for key in keys])
+        unique, inverse = np.unique(matrix, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    else:
+        unique, inverse = np.zeros((1, 0), dtype=np.int64), np.zeros(len(vals), dtype=np.int64)
+    sums = np.bincount(inverse, weights=vals, minlength=len(unique))
+    counts = np.bincount(inverse, minlength=len(unique))
+    # Valeurs triées par groupe puis par valeur : chaque groupe est une tranche contiguë
+    order = np.lexsort((vals, inverse))
+    ordered = vals[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = []
+    for group, key in enumerate(unique):
+        chunk = ordered[starts[group]:starts[group] + counts[group]]
+        result.append((tuple(int(k) for k in key), _metrics(metrics, int(sums[group]), int(counts[group]), chunk)))
+    return result
+
+
+def _metrics(metrics: Sequence[str], total: int, count: int, ordered: Sequence[int]) -> Dict[str, float]:
+    values: Dict[str, float] = {}
+    for metric in metrics:
+        if metric == "sum":
+            values[metric] = total / 100
+        elif metric == "count":
+            values[metric] = count
+        elif metric == "mean":
+            values[metric] = round(total / count / 100, 2)
+        elif metric == "min":
+            values[metric] = int(ordered[0]) / 100
+        elif metric == "max":
+            values[metric] = int(ordered[-1]) / 100
+        else:
+            values[metric] = round(float(percentile(ordered, float(metric[1:]))) / 100, 2)
+    return values
+
+
+class StatsEngine(BalanceEngine):
+    """Moteur de soldes conservant aussi jour et tag de chaque dépense, pour les agrégats"""
+
+    def __init__(self):
+        super().__init__()
+        self.records: Dict[str, Record] = {}
+        self.version = 0
+        self._columns: Optional[Columns] = None
+        self._results: Dict[str, Dict[str, Any]] = {}
+
+    def upsert(self, depense: Dict[str, Any]) -> bool:
+        super().upsert(depense)
+        iri = depense["@id"]
+        payer, montant, shares = self.contributions[iri]
+        record = (
+            depense["date"][:10], depense.get("tag"), self.users[payer], montant,
+            tuple((self.users[user], share) for user, share in shares),
+        )
+        if self.records.get(iri) == record:
+            return False
+        self.records[iri] = record
+        self._changed()
+        return True
+
+    def remove(self, iri: str) -> bool:
+        super().remove(iri)
+        if self.records.pop(iri, None) is None:
+            return False
+        self._changed()
+        return True
+
+    def reset(self) -> None:
+        super().reset()
+        self.records.clear()
+        self._changed()
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._columns = None
+        self._results.clear()
+
+    @property
+    def columns(self) -> Columns:
+        if self._columns is None:
+            self._columns = Columns(list(self.records.values()))
+        return self._columns
+
+    def cached(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """Résultat mis en cache jusqu'au prochain changement des dépenses"""
+        if key in self._results:
+            return self._results[key], True
+        result = self._results[key] = compute()
+        return result, False
+
+
+def _row_filter(columns: Columns, args: StatsInput) -> Callable[[int], bool]:
+    tag_code = columns.tags.index.get(args.tag, -1) if args.tag else None
+    days = columns.days.values
+
+    def keep(row: int) -> bool:
+        if tag_code is not None and columns.tag[row] != tag_code:
+            return False
+        day = days[columns.day[row]]
+        if args.date_min and day < args.date_min[:10]:
+            return False
+        if args.date_max and day > args.date_max[:10]:
+            return False
+        return True
+
+    return keep
+
+
+def _dimension(columns: Columns, name: str, rows: Sequence[int], part_rows: Optional[Sequence[int]] = None) -> Tuple[List[int], List[Any]]:
+    """Codes de la dimension pour chaque ligne retenue, et libellés des codes"""
+    if name == "participant":
+        return [columns.participant[i] for i in part_rows], columns.iris.values
+    source = [columns.part_row[i] for i in part_rows] if part_rows is not None else rows
+    if name == "tag":
+        return [columns.tag[row] for row in source], columns.tags.values
+    if name == "payer":
+        return [columns.payer[row] for row in source], columns.iris.values
+    codes, labels = columns.buckets(name)
+    return [codes[columns.day[row]] for row in source], labels.values
+
+
+def _table(group_by: Sequence[str], metrics: Sequence[str], labels: List[List[Any]], groups) -> Dict[str, Any]:
+    return {
+        "columns": [*group_by, *metrics],
+        "rows": [
+            [*(labels[d][code] for d, code in enumerate(key)), *(values[m] for m in metrics)]
+            for key, values in groups
+        ],
+    }
+
+
+def depense_stats(columns: Columns, args: StatsDepensesInput) -> Dict[str, Any]:
+    keep = _row_filter(columns, args)
+    rows = [row for row in range(len(columns.montant)) if keep(row)]
+    dimensions = [_dimension(columns, name, rows) for name in args.group_by]
+    values = array("q", (columns.montant[row] for row in rows))
+    groups = group_stats([codes for codes, _ in dimensions], values, args.metrics)
+    return _table(args.group_by, args.metrics, [labels for _, labels in dimensions], groups)
+
+
+def part_stats(columns: Columns, args: StatsPartsInput) -> Dict[str, Any]:
+    keep = _row_filter(columns, args)
+    participant = columns.iris.index.get(args.participant, -1) if args.participant else None
+    part_rows = [
+        i for i in range(len(columns.part))
+        if keep(columns.part_row[i]) and (participant is None or columns.participant[i] == participant)
+    ]
+    dimensions = [_dimension(columns, name, [], part_rows) for name in args.group_by]
+    values = array("q", (columns.part[i] for i in part_rows))
+    groups = group_stats([codes for codes, _ in dimensions], values, args.metrics)
+    return _table(args.group_by, args.metrics, [labels for _, labels in dimensions], groups)
+
+
+# Un moteur par identité (les filtres sont appliqués localement)
+_engines: Dict[Optional[str], StatsEngine] = {}
+
+
+def engine_for(ctx: ToolContext) -> StatsEngine:
+    identity = identity_from_headers(ctx.headers())
+    engine = _engines.get(identity)
+    if engine is None:
+        engine = _engines[identity] = StatsEngine()
+    return engine
+
+
+async def _run(ctx: ToolContext, args: StatsInput, kind: str, compute) -> Dict[str, Any]:
+    engine = engine_for(ctx)
+    async with engine.lock:
+        sync = await engine.sync(ctx, {}, full=args.refresh == "full")
+        key = json.dumps([kind, args.model_dump(exclude={"refresh"})], sort_keys=True)
+        table, cached = engine.cached(key, lambda: compute(engine.columns, args))
+    return {**table, "cached": cached, "sync": sync}
+
+
+async def stats_depenses(ctx: ToolContext, args: StatsDepensesInput) -> Dict[str, Any]:
+    """Agrégats des montants des dépenses par tag, payeur et période"""
+    return await _run(ctx, args, "depenses", depense_stats)
+
+
+async def stats_parts(ctx: ToolContext, args: StatsPartsInput) -> Dict[str, Any]:
+    """Agrégats des parts individuelles par participant, tag, payeur et période"""
+    return await _run(ctx, args, "parts", part_stats)
@@ -0,0 +1,170 @@
+"""
+Serveur MCP stdio pour l'API Let-me-count, lancé par mcp-server.py
+Permet d'interagir avec l'API de gestion de comptes entre amis
+"""
+
+import asyncio
+import json
+import os
+import sys
+from io import TextIOWrapper
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+import anyio
+from mcp.server import NotificationOptions, Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.server.models import InitializationOptions
+from mcp.shared.version import SUPPORTED_PROTOCOL_VERSIONS
+import mcp.server.stdio
+import mcp.types as types
+
+import fast_start
+import resources
+from api_client import ApiClient
+from projection import dumps
+from registry import ToolContext, run_tool
+from telemetry import METRICS_FILE, write_metrics_file, write_metrics_periodically
+from tools import TOOLS
+
+SERVER_NAME = "letmecount-api"
+SERVER_VERSION = "1.0.0"
+
+
+class LetMeCountMCPServer:
+    def __init__(self, snapshot: Optional[Dict[str, Any]] = None):
+        self.server = Server(SERVER_NAME)
+        self.base_url = os.getenv("LETMECOUNT_API_URL", "http://localhost:8888")
+        self.api = ApiClient.from_env(self.base_url)
+        self.context = ToolContext(self.api)
+        # Schémas construits une seule fois au démarrage, ou repris de l'instantané
+        if snapshot is not None:
+            self.tools = [types.Tool.model_validate(tool) for tool in snapshot["tools"]]
+        else:
+            self.tools = [
+                types.Tool(name=spec.name, description=spec.description, inputSchema=spec.input_schema())
+                for spec in TOOLS.values()
+            ]
+        self.setup_handlers()
+
+    def setup_handlers(self):
+        @self.server.list_tools()
+        async def handle_list_tools() -> List[types.Tool]:
+            """Liste tous les outils disponibles pour interagir avec l'API Let-me-count"""
+            return self.tools
+
+        @self.server.call_tool()
+        async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
+            """Gestionnaire principal pour tous les appels d'outils"""
+            spec = TOOLS.get(name)
+            if spec is None:
+                raise ValueError(f"Outil inconnu: {name}")
+            self.context.session = self.server.request_context.session
+            result = await run_tool(spec, self.context, arguments)
+            return [types.TextContent(type="text", text=self._format_result(result))]
+
+        @self.server.list_resources()
+        async def handle_list_resources() -> List[types.Resource]:
+            uri, name = resources.CURRENT_USER
+            return [types.Resource(uri=uri, name=name, mimeType=resources.MIME_TYPE)]
+
+        @self.server.list_resource_templates()
+        async def handle_list_resource_templates() -> List[types.ResourceTemplate]:
+            return [
+                types.ResourceTemplate(uriTemplate=uri, name=name, description=description, mimeType=resources.MIME_TYPE)
+                for uri, (name, description) in resources.RESOURCE_TEMPLATES.items()
+            ]
+
+        @self.server.read_resource()
+        async def handle_read_resource(uri) -> Iterable[ReadResourceContents]:
+            data = await resources.read_resource(self.context, str(uri))
+            return [ReadResourceContents(content=dumps(data), mime_type=resources.MIME_TYPE)]
+
+        @self.server.subscribe_resource()
+        async def handle_subscribe_resource(uri) -> None:
+            self.context.session = self.server.request_context.session
+            await resources.subscribe(self.context, self.context.session, str(uri))
+
+        @self.server.unsubscribe_resource()
+        async def handle_unsubscribe_resource(uri) -> None:
+            resources.unsubscribe(self.server.request_context.session, str(uri))
+
+    def capabilities(self) -> types.ServerCapabilities:
+        capabilities = self.server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        )
+        # Le SDK annonce toujours subscribe=False, même avec un gestionnaire d'abonnement
+        capabilities.resources.subscribe = True
+        return capabilities
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Réponses à initialize et tools/list pour le démarrage rapide"""
+        return {
+            "protocol_versions": SUPPORTED_PROTOCOL_VERSIONS,
+            "latest_protocol_version": types.LATEST_PROTOCOL_VERSION,
+            "capabilities": self.capabilities().model_dump(by_alias=True, exclude_none=True),
+            "server_info": {"name": SERVER_NAME, "version": SERVER_VERSION},
+            "tools": [tool.model_dump(by_alias=True, exclude_none=True) for tool in self.tools],
+        }
+
+    @staticmethod
+    def _format_result(result: Any) -> str:
+        if isinstance(result, str):
+            return result
+        return dumps(result)
+
+
+class ReplayInput:
+    """stdin précédé des messages déjà lus par le démarrage rapide"""
+
+    def __init__(self, lines: Sequence[bytes]):
+        self.lines = [line.decode("utf-8", errors="replace") for line in lines]
+        self.stdin = anyio.wrap_file(TextIOWrapper(sys.stdin.buffer, encoding="utf-8", errors="replace"))
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        for line in self.lines:
+            yield line
+        async for line in self.stdin:
+            yield line
+
+
+class ReplayOutput:
+    """stdout sans la réponse à la requête initialize rejouée"""
+
+    def __init__(self):
+        self.stdout = anyio.wrap_file(TextIOWrapper(sys.stdout.buffer, encoding="utf-8"))
+        self.pending = True
+
+    async def write(self, data: str) -> None:
+        if self.pending and json.loads(data).get("id") == fast_start.REPLAY_ID:
+            self.pending = False
+            return
+        await self.stdout.write(data)
+
+    async def flush(self) -> None:
+        await self.stdout.flush()
+
+
+async def main(replay: Sequence[bytes] = (), snapshot: Optional[Dict[str, Any]] = None):
+    server_instance = LetMeCountMCPServer(snapshot)
+    if snapshot is None:
+        fast_start.save_snapshot(server_instance.snapshot())
+    # Serveur stdio : pas d'endpoint /metrics, les métriques sont écrites dans un fichier
+    metrics_task = asyncio.create_task(write_metrics_periodically()) if METRICS_FILE else None
+    stdin, stdout = (ReplayInput(replay), ReplayOutput()) if replay else (None, None)
+
+    try:
+        async with server_instance.api, mcp.server.stdio.stdio_server(stdin, stdout) as (read_stream, write_stream):
+            await server_instance.server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name=SERVER_NAME,
+                    server_version=SERVER_VERSION,
+                    capabilities=server_instance.capabilities(),
+                ),
+            )
+    finally:
+        if metrics_task is not None:
+            metrics_task.cancel()
+        write_metrics_file()
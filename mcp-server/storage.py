@@ -0,0 +1,20 @@
+"""
+Répertoire de données locales du serveur MCP (index, exports, file d'attente)
+"""
+
+import hashlib
+import os
+from typing import Optional
+
+DATA_DIR = os.getenv("LETMECOUNT_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".local", "share", "letmecount-mcp")
+
+
+def data_path(name: str) -> str:
+    """Chemin d'un fichier du répertoire de données (créé au besoin)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, name)
+
+
+def identity_slug(base_url: str, identity: Optional[str]) -> str:
+    """Nom de fichier stable pour une identité sur une instance de l'API"""
+    return hashlib.sha256(f"{base_url}\0{identity or ''}".encode()).hexdigest()[:16]
@@ -0,0 +1,211 @@
+"""
+Métriques Prometheus et traces des appels d'outils
+
+Chaque appel d'outil et chaque requête vers l'API alimentent des histogrammes
+de latence, des compteurs par statut et des jauges de requêtes en cours. Les
+métriques sont exposées sur /metrics par http_server.py ; le serveur stdio peut
+les écrire dans un fichier au format texte (LETMECOUNT_METRICS_FILE).
+
+Les traces sont optionnelles : si LETMECOUNT_OTLP_FILE est défini, chaque span
+(appel d'outil, requête HTTP sortante) y est ajouté au format OTLP/JSON, une
+requête d'export par ligne. Le span de la requête HTTP a pour parent celui de
+l'appel d'outil et son contexte est propagé à l'API (header `traceparent`).
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, write_to_textfile
+
+OTLP_FILE = os.getenv("LETMECOUNT_OTLP_FILE") or None
+METRICS_FILE = os.getenv("LETMECOUNT_METRICS_FILE") or None
+METRICS_INTERVAL = float(os.getenv("LETMECOUNT_METRICS_INTERVAL", "15"))
+SERVICE_NAME = os.getenv("LETMECOUNT_SERVICE_NAME", "letmecount-mcp")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+TOOL_DURATION = Histogram(
+    "letmecount_tool_duration_seconds", "Durée des appels d'outils MCP", ["tool", "outcome"], buckets=LATENCY_BUCKETS,
+)
+TOOL_CALLS = Counter("letmecount_tool_calls_total", "Appels d'outils MCP", ["tool", "outcome"])
+TOOLS_IN_FLIGHT = Gauge("letmecount_tools_in_flight", "Appels d'outils en cours", ["tool"])
+
+UPSTREAM_DURATION = Histogram(
+    "letmecount_upstream_duration_seconds", "Durée des requêtes vers l'API", ["method", "endpoint"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_RESPONSES = Counter("letmecount_upstream_responses_total", "Réponses de l'API par statut", ["method", "endpoint", "status"])
+UPSTREAM_IN_FLIGHT = Gauge("letmecount_upstream_in_flight", "Requêtes vers l'API en cours")
+COALESCED_REQUESTS = Counter("letmecount_upstream_coalesced_total", "GET servis par une requête identique déjà en cours", ["endpoint"])
+UPSTREAM_RETRIES = Counter("letmecount_upstream_retries_total", "Nouvelles tentatives vers l'API", ["method", "endpoint", "reason"])
+UPSTREAM_QUEUED = Gauge("letmecount_upstream_queued", "Requêtes en attente du limiteur de concurrence")
+CIRCUIT_STATE = Gauge("letmecount_circuit_state", "État du disjoncteur par endpoint (0 fermé, 1 semi-ouvert, 2 ouvert)", ["endpoint"])
+CIRCUIT_REJECTED = Counter("letmecount_circuit_rejected_total", "Appels refusés par un disjoncteur ouvert", ["endpoint"])
+
+POOL_CONNECTIONS = Gauge("letmecount_http_pool_connections", "Connexions du pool HTTP", ["state"])
+POOL_PENDING = Gauge("letmecount_http_pool_pending_requests", "Requêtes en attente d'une connexion du pool")
+POOL_MAX = Gauge("letmecount_http_pool_max_connections", "Taille maximale du pool HTTP")
+
+
+def endpoint_template(path: str) -> str:
+    """/depenses/42 → /depenses/{id}, pour borner la cardinalité des labels"""
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path.split("?", 1)[0])
+
+
+def observe_pool(client: httpx.AsyncClient, max_connections: Optional[int]) -> None:
+    """Met à jour les jauges du pool (introspection best-effort de httpcore)"""
+    if max_connections is not None:
+        POOL_MAX.set(max_connections)
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None:
+        return
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    POOL_CONNECTIONS.labels("idle").set(idle)
+    POOL_CONNECTIONS.labels("active").set(len(connections) - idle)
+    POOL_PENDING.set(max(0, len(getattr(pool, "_requests", [])) - (len(connections) - idle)))
+
+
+# --- Traces ---
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start", "end", "attributes", "error")
+
+    def __init__(self, name: str, kind: int, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else ""
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+# Kinds OTLP
+SPAN_INTERNAL, SPAN_SERVER, SPAN_CLIENT = 1, 2, 3
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("letmecount_span", default=None)
+_export_lock = threading.Lock()
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _export(span: Span) -> None:
+    line = json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": "letmecount-mcp"}, "spans": [span.to_otlp()]}],
+    }]})
+    with _export_lock, open(OTLP_FILE, "a", encoding="utf-8") as file:
+        file.write(line + "\n")
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Span enfant du span courant ; sans effet si l'export n'est pas configuré"""
+    if OTLP_FILE is None:
+        yield None
+        return
+    current = Span(name, kind, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end = time.time_ns()
+        _export(current)
+
+
+# --- Enregistrement ---
+
+@contextmanager
+def tool_call(name: str) -> Iterator[Dict[str, str]]:
+    """Mesure un appel d'outil ; l'appelant renseigne `outcome` (ok par défaut)"""
+    result = {"outcome": "ok"}
+    TOOLS_IN_FLIGHT.labels(name).inc()
+    started = time.perf_counter()
+    with span(f"tool {name}", SPAN_SERVER, **{"mcp.tool": name}) as current:
+        try:
+            yield result
+        finally:
+            elapsed = time.perf_counter() - started
+            TOOLS_IN_FLIGHT.labels(name).dec()
+            TOOL_DURATION.labels(name, result["outcome"]).observe(elapsed)
+            TOOL_CALLS.labels(name, result["outcome"]).inc()
+            if current is not None:
+                current.attributes["mcp.outcome"] = result["outcome"]
+                if result["outcome"] != "ok":
+                    current.error = result["outcome"]
+
+
+@contextmanager
+def upstream_request(method: str, path: str) -> Iterator[Dict[str, Any]]:
+    """Mesure une requête vers l'API ; l'appelant renseigne `status`"""
+    endpoint = endpoint_template(path)
+    result: Dict[str, Any] = {"status": "error", "traceparent": None}
+    UPSTREAM_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    with span(f"HTTP {method} {endpoint}", SPAN_CLIENT, **{"http.request.method": method, "url.path": endpoint}) as current:
+        if current is not None:
+            result["traceparent"] = current.traceparent
+        try:
+            yield result
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+            UPSTREAM_DURATION.labels(method, endpoint).observe(time.perf_counter() - started)
+            UPSTREAM_RESPONSES.labels(method, endpoint, str(result["status"])).inc()
+            if current is not None:
+                current.attributes["http.response.status_code"] = result["status"]
+
+
+def write_metrics_file() -> None:
+    """Écrit les métriques au format texte Prometheus (collecteur textfile de node_exporter)"""
+    if METRICS_FILE is not None:
+        write_to_textfile(METRICS_FILE, REGISTRY)
+
+
+async def write_metrics_periodically(interval: float = METRICS_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        write_metrics_file()
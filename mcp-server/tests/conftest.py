@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.dirname(HERE)
+sys.path[:0] = [SERVER, os.path.join(SERVER, "bench")]
+os.environ.setdefault("LETMECOUNT_DATA_DIR", tempfile.mkdtemp(prefix="letmecount-tests-"))
+
+
+@pytest.fixture
+def stub():
+    """API bouchon servie dans un thread, avec ses données"""
+    from stub_api import StubData, StubServer, create_app
+
+    data = StubData(users=4, tags=2, depenses=70, seed=7)
+    server = StubServer(create_app(data)).start()
+    try:
+        yield data, server.url
+    finally:
+        server.stop()
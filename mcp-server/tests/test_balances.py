@@ -0,0 +1,98 @@
+import asyncio
+
+from api_client import ApiClient
+from balances import BalanceEngine
+from registry import ToolContext
+
+
+def depense(iri, montant, payer, details, partage="parts"):
+    return {
+        "@id": iri, "montant": montant, "payePar": payer, "partage": partage,
+        "details": [{"user": user, "parts": parts, "montant": share} for user, parts, share in details],
+    }
+
+
+def expected_balances(depenses):
+    """Soldes attendus, calculés comme User::getSolde()"""
+    cents = {}
+    for item in depenses:
+        cents[item["payePar"]] = cents.get(item["payePar"], 0) + round(item["montant"] * 100)
+        for detail in item["details"]:
+            cents[detail["user"]] = cents.get(detail["user"], 0) - round(detail["montant"] * 100)
+    return {user: value / 100 for user, value in cents.items()}
+
+
+def test_stored_detail_amounts():
+    engine = BalanceEngine()
+    engine.upsert(depense("/depenses/1", 10.0, "/users/1", [
+        ("/users/1", 1, 3.33), ("/users/2", 1, 3.33), ("/users/3", 1, 3.34),
+    ]))
+    assert engine.balances() == {"/users/1": 6.67, "/users/2": -3.33, "/users/3": -3.34}
+
+
+def test_settlements_against_stored_amounts():
+    engine = BalanceEngine()
+    engine.upsert(depense("/depenses/1", 10.0, "/users/1", [
+        ("/users/1", 1, 3.33), ("/users/2", 1, 3.33), ("/users/3", 1, 3.34),
+    ]))
+    engine.upsert(depense("/depenses/2", 30.0, "/users/2", [
+        ("/users/1", 2, 20.0), ("/users/2", 1, 10.0),
+    ], partage="montants"))
+    balances = engine.balances()
+    assert balances == {"/users/1": -13.33, "/users/2": 16.67, "/users/3": -3.34}
+    transfers = engine.settlements()
+    assert sorted((t["from"], t["to"], t["montant"]) for t in transfers) == [
+        ("/users/1", "/users/2", 13.33), ("/users/3", "/users/2", 3.34),
+    ]
+
+
+def test_upsert_and_remove():
+    engine = BalanceEngine()
+    item = depense("/depenses/1", 10.0, "/users/1", [("/users/1", 1, 5.0), ("/users/2", 1, 5.0)])
+    assert engine.upsert(item)
+    assert not engine.upsert(dict(item))
+    engine.upsert({**item, "montant": 12.0, "details": [{"user": "/users/2", "parts": 1, "montant": 12.0}]})
+    assert engine.balances() == {"/users/1": 12.0, "/users/2": -12.0}
+    assert engine.remove("/depenses/1")
+    assert engine.balances() == {"/users/1": 0.0, "/users/2": 0.0}
+
+
+async def sync_twice(url, edit):
+    engine = BalanceEngine()
+    async with ApiClient(url) as api:
+        ctx = ToolContext(api)
+        first = await engine.sync(ctx, {})
+        await edit(api)
+        second = await engine.sync(ctx, {})
+    return engine, first, second
+
+
+def test_incremental_sync_sees_older_edit(stub):
+    data, url = stub
+    # Dépense la plus ancienne : absente de la première page
+    oldest = data.depenses[-1]
+    details = [{**detail, "montant": 0.0} for detail in oldest["details"]]
+    details[0]["montant"] = oldest["montant"] + 50
+
+    async def edit(api):
+        response = await api.request("PATCH", oldest["@id"], json={"montant": oldest["montant"] + 50, "details": details})
+        response.raise_for_status()
+
+    engine, first, second = asyncio.run(sync_twice(url, edit))
+    assert first["mode"] == "full"
+    assert second["mode"] == "incremental"
+    assert second["refetched"] == 1
+    assert engine.balances() == expected_balances(data.depenses)
+
+
+def test_incremental_sync_sees_deletion(stub):
+    data, url = stub
+
+    async def edit(api):
+        response = await api.request("DELETE", data.depenses[-1]["@id"])
+        response.raise_for_status()
+
+    engine, _, second = asyncio.run(sync_twice(url, edit))
+    assert second["mode"] == "full"
+    assert len(engine.contributions) == len(data.depenses)
+    assert engine.balances() == expected_balances(data.depenses)
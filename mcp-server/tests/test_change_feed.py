@@ -0,0 +1,65 @@
+import asyncio
+
+from api_client import ApiClient
+from change_feed import DepensesWatchInput, depenses_watch
+from registry import ToolContext
+
+DEPENSE = {"titre": "Courses", "montant": 10.0, "date": "2025-03-01T00:00:00+00:00", "partage": "parts",
+           "payePar": "/users/1", "tag": "/tags/1", "details": [{"user": "/users/1", "parts": 1, "montant": 10.0}]}
+
+
+def watch(url, cursor, before=None):
+    async def run():
+        async with ApiClient(url) as api:
+            ctx = ToolContext(api)
+            if cursor is None:
+                start = (await depenses_watch(ctx, DepensesWatchInput()))["cursor"]
+            else:
+                start = cursor
+            if before is not None:
+                await before(api)
+            return start, await depenses_watch(ctx, DepensesWatchInput(cursor=start))
+    return asyncio.run(run())
+
+
+def test_create_and_delete_in_same_poll(stub):
+    data, url = stub
+    total = len(data.depenses)
+
+    async def edit(api):
+        (await api.request("POST", "/depenses", json=DEPENSE)).raise_for_status()
+        (await api.request("DELETE", "/depenses/6")).raise_for_status()
+
+    start, result = watch(url, None, edit)
+    assert start == f"{total}-{total}"
+    actions = [(change["action"], change["depense"], change.get("count")) for change in result["changes"]]
+    assert actions == [("CREATE", f"/depenses/{total + 1}", None), ("DELETE", None, 1)]
+    assert result["cursor"] == f"{total + 1}-{total}"
+
+
+def test_created_then_deleted_expense_is_not_reported(stub):
+    data, url = stub
+    total = len(data.depenses)
+
+    async def edit(api):
+        response = await api.request("POST", "/depenses", json=DEPENSE)
+        (await api.request("DELETE", response.json()["@id"])).raise_for_status()
+
+    _, result = watch(url, None, edit)
+    assert result["changes"] == []
+    assert result["cursor"] == f"{total}-{total}"
+
+
+def test_newer_log_behind_older_one_in_same_second(stub):
+    data, url = stub
+    total = len(data.depenses)
+    for depense in data.depenses[:2]:
+        data.log("UPDATE", depense)
+    # Même seconde : le journal renvoie le plus ancien en tête
+    data.logs[0], data.logs[1] = data.logs[1], data.logs[0]
+    data.logs[0]["date"] = data.logs[1]["date"]
+    assert [log["id"] for log in data.logs[:2]] == [total + 1, total + 2]
+
+    _, result = watch(url, f"{total + 1}-{total}")
+    assert [change["log"] for change in result["changes"]] == [total + 2]
+    assert result["cursor"] == f"{total + 2}-{total}"
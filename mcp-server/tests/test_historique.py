@@ -0,0 +1,47 @@
+import asyncio
+
+from api_client import ApiClient
+from historique import HistoriqueSeriesInput, HistoryEngine
+from registry import ToolContext
+
+
+def test_series_uses_stored_amounts():
+    engine = HistoryEngine()
+    engine.upsert({
+        "@id": "/depenses/1", "date": "2025-01-05T12:00:00+00:00", "montant": 10.0, "payePar": "/users/1",
+        "partage": "parts", "details": [
+            {"user": "/users/1", "parts": 1, "montant": 3.33},
+            {"user": "/users/2", "parts": 1, "montant": 3.33},
+            {"user": "/users/3", "parts": 1, "montant": 3.34},
+        ],
+    })
+    view = engine.view(HistoriqueSeriesInput(granularity="daily"))
+    assert view["dates"] == ["2025-01-05"]
+    assert view["series"] == {"/users/1": [6.67], "/users/2": [-3.33], "/users/3": [-3.34]}
+
+
+def test_incremental_sync_recomputes_older_day(stub):
+    data, url = stub
+    oldest = data.depenses[-1]
+    args = HistoriqueSeriesInput(granularity="daily")
+
+    async def run():
+        engine = HistoryEngine()
+        async with ApiClient(url) as api:
+            ctx = ToolContext(api)
+            await engine.sync(ctx, {})
+            engine.view(args)
+            details = [{**detail, "montant": 0.0} for detail in oldest["details"]]
+            details[-1]["montant"] = oldest["montant"]
+            response = await api.request("PATCH", oldest["@id"], json={"details": details})
+            response.raise_for_status()
+            sync = await engine.sync(ctx, {})
+            fresh = HistoryEngine()
+            await fresh.sync(ctx, {})
+        return sync, engine.view(args), fresh
+
+    sync, view, fresh = asyncio.run(run())
+    assert sync["mode"] == "incremental"
+    assert sync["changed"] == 1
+    expected = fresh.view(HistoriqueSeriesInput(granularity="daily", users=list(view["series"])))
+    assert view == expected
@@ -0,0 +1,39 @@
+import asyncio
+import os
+
+import balances
+from api_client import ApiClient
+from ledger import LedgerExportInput, LedgerImportInput, ledger_export, ledger_import
+from registry import ToolContext
+from tools import TOOLS
+
+
+def test_ledger_tools_are_stdio_only():
+    assert TOOLS["ledger_export"].stdio_only
+    assert TOOLS["ledger_import"].stdio_only
+
+
+def test_import_seeds_log_watermark(stub, tmp_path):
+    data, url = stub
+    oldest = data.depenses[-1]
+    path = os.path.join(tmp_path, "snapshot")
+
+    async def run():
+        async with ApiClient(url) as api:
+            ctx = ToolContext(api)
+            await ledger_export(ctx, LedgerExportInput(path=path, format="csv"))
+            details = [{**detail, "montant": 0.0} for detail in oldest["details"]]
+            details[0]["montant"] = oldest["montant"]
+            response = await api.request("PATCH", oldest["@id"], json={"details": details})
+            response.raise_for_status()
+            await ledger_import(ctx, LedgerImportInput(path=path, seed=["balances"]))
+            engine = balances.engine_for(ctx, None)
+            sync = await engine.sync(ctx, {})
+            fresh = balances.BalanceEngine()
+            await fresh.sync(ctx, {})
+        return engine, sync, fresh
+
+    engine, sync, fresh = asyncio.run(run())
+    assert sync["mode"] == "incremental"
+    assert sync["refetched"] == 1
+    assert engine.balances() == fresh.balances()
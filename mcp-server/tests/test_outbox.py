@@ -0,0 +1,57 @@
+import json
+import os
+
+import pytest
+
+from outbox import Outbox
+from tools import TOOLS
+
+CREATE, UPDATE, DELETE = TOOLS["depenses_create"], TOOLS["depenses_update"], TOOLS["depenses_delete"]
+DEPENSE = {"titre": "Courses", "montant": 10.0, "payePar": "/users/1", "tag": "/tags/1", "details": []}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(os.path.join(tmp_path, "outbox.db"))
+    yield outbox
+    outbox.db.close()
+
+
+def entries(outbox):
+    rows = outbox.db.execute("SELECT method, path, body FROM entries ORDER BY seq").fetchall()
+    return [(row["method"], row["path"], json.loads(row["body"]) if row["body"] else None) for row in rows]
+
+
+def test_post_patch_delete_cancels_creation(outbox):
+    created = outbox.enqueue(CREATE, "/depenses", DEPENSE)
+    iri = created["@id"]
+    assert outbox.enqueue(UPDATE, iri, {"titre": "Marché"})["status"] == "coalesced"
+    assert entries(outbox) == [("POST", "/depenses", {**DEPENSE, "titre": "Marché"})]
+    result = outbox.enqueue(DELETE, iri, None)
+    assert result["status"] == "cancelled"
+    assert result["pending"] == 0
+
+
+def test_patch_patch_are_composed(outbox):
+    outbox.enqueue(UPDATE, "/depenses/5", {"titre": "A", "montant": 12.0})
+    assert outbox.enqueue(UPDATE, "/depenses/5", {"titre": "B"})["status"] == "coalesced"
+    assert entries(outbox) == [("PATCH", "/depenses/5", {"titre": "B", "montant": 12.0})]
+
+
+def test_patch_then_delete_drops_patch(outbox):
+    outbox.enqueue(UPDATE, "/depenses/5", {"titre": "A"})
+    assert outbox.enqueue(DELETE, "/depenses/5", None)["status"] == "queued"
+    assert entries(outbox) == [("DELETE", "/depenses/5", None)]
+
+
+def test_delete_then_patch_is_refused(outbox):
+    outbox.enqueue(DELETE, "/depenses/5", None)
+    with pytest.raises(ValueError, match="suppression"):
+        outbox.enqueue(UPDATE, "/depenses/5", {"titre": "A"})
+    assert entries(outbox) == [("DELETE", "/depenses/5", None)]
+
+
+def test_delete_twice_is_coalesced(outbox):
+    outbox.enqueue(DELETE, "/depenses/5", None)
+    assert outbox.enqueue(DELETE, "/depenses/5", None)["status"] == "coalesced"
+    assert entries(outbox) == [("DELETE", "/depenses/5", None)]
@@ -0,0 +1,86 @@
+import pytest
+
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakers, CircuitOpenError, RetryPolicy
+
+
+def open_breaker(threshold=3):
+    breaker = CircuitBreaker("/depenses", failure_threshold=threshold, reset_timeout=30.0)
+    for _ in range(threshold):
+        breaker.before_request()
+        breaker.record_failure()
+    return breaker
+
+
+def elapse(breaker):
+    """Fait comme si le délai de repos était écoulé"""
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker("/depenses", failure_threshold=3)
+    for _ in range(2):
+        breaker.before_request()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    assert breaker.rejected == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("/depenses", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success():
+    breaker = open_breaker()
+    elapse(breaker)
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+    # Un seul essai à la fois
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_half_open_probe_reopens_on_failure():
+    breaker = open_breaker()
+    elapse(breaker)
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_released_probe_allows_another():
+    breaker = open_breaker()
+    elapse(breaker)
+    breaker.before_request()
+    breaker.release()
+    breaker.before_request()
+    assert breaker.state == HALF_OPEN
+
+
+def test_breakers_per_endpoint_and_disabled():
+    breakers = CircuitBreakers(failure_threshold=1)
+    breakers.get("/depenses").record_failure()
+    assert breakers.get("/depenses").state == OPEN
+    assert breakers.get("/tags").state == CLOSED
+    assert CircuitBreakers(enabled=False).get("/depenses") is None
+
+
+def test_retry_policy_gives_up():
+    policy = RetryPolicy(attempts=3, retry_after_max=10)
+    assert policy.delay(1) is not None
+    assert policy.delay(3) is None
+    assert policy.delay(1, retry_after=5) == 5
+    assert policy.delay(1, retry_after=60) is None
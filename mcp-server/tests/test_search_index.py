@@ -0,0 +1,48 @@
+import asyncio
+import os
+
+from starlette.responses import JSONResponse
+
+from api_client import ApiClient
+from registry import ToolContext
+from search_index import SearchIndex
+from stub_api import StubData, StubServer, create_app
+
+
+class Forbidden:
+    """Répond 403 aux IRIs de `paths`, comme l'API pour une dépense dont on ne fait plus partie"""
+
+    def __init__(self, app):
+        self.app = app
+        self.paths = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            return await JSONResponse({"detail": "Access Denied."}, status_code=403)(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+
+def test_forbidden_expense_is_dropped_incrementally(tmp_path):
+    data = StubData(users=4, tags=2, depenses=40, seed=3)
+    app = Forbidden(create_app(data))
+    server = StubServer(app).start()
+    index = SearchIndex(os.path.join(tmp_path, "search.db"))
+    removed = data.depenses[-1]
+
+    async def run():
+        async with ApiClient(server.url) as api:
+            ctx = ToolContext(api)
+            first = await index.sync(ctx)
+            # L'utilisateur est retiré de la dépense : elle est journalisée puis n'est plus visible
+            data.log("UPDATE", removed)
+            data.depenses.remove(removed)
+            app.paths.add(removed["@id"])
+            return first, await index.sync(ctx)
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        server.stop()
+        index.db.close()
+    assert first["mode"] == "full"
+    assert second == {"mode": "incremental", "changed": 1, "indexed": len(data.depenses)}
@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+import pytest
+
+from shared_store import MemoryStore, SharedStore, SqliteStore
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        SharedStore()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_backend_roundtrip(backend, tmp_path):
+    store = MemoryStore() if backend == "memory" else SqliteStore(os.path.join(tmp_path, "store.db"))
+
+    async def run():
+        await store.set("key", {"a": 1})
+        value = await store.get("key")
+        await store.delete("key")
+        counts = [await store.incr("counter") for _ in range(3)]
+        async with store.lock("resource"):
+            pass
+        return value, await store.get("key"), counts
+
+    assert asyncio.run(run()) == ({"a": 1}, None, [1, 2, 3])
@@ -0,0 +1,49 @@
+import pytest
+
+from models import DepensesCreateInput
+from splits import prepare_depense, split_by_parts
+
+
+@pytest.mark.parametrize("cents, parts", [
+    (1000, [1, 1, 1]),
+    (10000, [1, 2]),
+    (5, [1] * 7),
+    (150, [1] * 20),
+    (1050, [1] * 20),
+    (1000, [0, 1]),
+    (999, [3, 1, 2, 5]),
+])
+def test_largest_remainder(cents, parts):
+    shares = split_by_parts(cents, parts)
+    assert sum(shares) == cents
+    assert all(share >= 0 for share in shares)
+    for share, part in zip(shares, parts):
+        assert abs(share - cents * part / sum(parts)) < 1
+
+
+def test_remaining_cents_go_to_largest_remainders():
+    assert split_by_parts(1000, [1, 1, 1]) == [334, 333, 333]
+    assert split_by_parts(1050, [1] * 20) == [53] * 10 + [52] * 10
+
+
+def test_rejects_zero_parts():
+    with pytest.raises(ValueError, match="parts"):
+        split_by_parts(1000, [0, 0])
+
+
+def test_prepare_depense_fills_detail_amounts():
+    depense = DepensesCreateInput(
+        titre="Courses", montant=10.0, date="2025-03-01T00:00:00", payePar="/users/1", tag="/tags/1",
+        partage="parts", details=[{"user": f"/users/{i}", "parts": 1} for i in (1, 2, 3)],
+    )
+    body = prepare_depense(depense)
+    assert [detail["montant"] for detail in body["details"]] == [3.34, 3.33, 3.33]
+
+
+def test_prepare_depense_rejects_mismatched_amounts():
+    depense = DepensesCreateInput(
+        titre="Courses", montant=10.0, date="2025-03-01T00:00:00", payePar="/users/1", tag="/tags/1",
+        partage="montants", details=[{"user": "/users/1", "parts": 1, "montant": 5.0}],
+    )
+    with pytest.raises(ValueError, match="somme des détails"):
+        prepare_depense(depense)
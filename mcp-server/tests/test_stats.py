@@ -0,0 +1,37 @@
+import asyncio
+
+from api_client import ApiClient
+from registry import ToolContext
+from stats import StatsPartsInput, stats_parts
+
+
+def stored_parts(depenses):
+    """Somme des montants enregistrés des détails, par participant"""
+    cents = {}
+    for depense in depenses:
+        for detail in depense["details"]:
+            cents[detail["user"]] = cents.get(detail["user"], 0) + round(detail["montant"] * 100)
+    return {user: value / 100 for user, value in cents.items()}
+
+
+def test_stats_parts_follow_stored_amounts_and_edits(stub):
+    data, url = stub
+    oldest = data.depenses[-1]
+    args = StatsPartsInput(metrics=["sum"], group_by=["participant"])
+
+    async def run():
+        async with ApiClient(url) as api:
+            ctx = ToolContext(api)
+            before = await stats_parts(ctx, args)
+            details = [{**detail, "montant": 0.0} for detail in oldest["details"]]
+            details[0]["montant"] = oldest["montant"]
+            response = await api.request("PATCH", oldest["@id"], json={"details": details})
+            response.raise_for_status()
+            after = await stats_parts(ctx, args)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before["sync"]["mode"] == "full"
+    assert after["sync"]["mode"] == "incremental"
+    assert not after["cached"]
+    assert dict(after["rows"]) == stored_parts(data.depenses)
@@ -0,0 +1,360 @@
+"""
+Catalogue des outils MCP de l'API Let-me-count
+"""
+
+from typing import Any, Dict
+
+from balances import BalancesInput, balances_compute, settle_up
+from bulk import (
+    DepensesCreateBatchInput,
+    DepensesDeleteManyInput,
+    DepensesUpdateManyInput,
+    depenses_create_batch,
+    depenses_delete_many,
+    depenses_update_many,
+)
+from change_feed import DepensesWatchInput, depenses_watch
+from expand import expand_depense, expand_depenses
+from historique import HistoriqueSeriesInput, historique_series
+from ledger import LedgerExportInput, LedgerImportInput, ledger_export, ledger_import
+from models import (
+    AuthLoginInput,
+    DepensesCreateInput,
+    DepensesDeleteInput,
+    DepensesGetInput,
+    DepensesListInput,
+    DepensesUpdateInput,
+    EmptyInput,
+    PageInput,
+    TagsCreateInput,
+    TagsDeleteInput,
+    TagsGetInput,
+    TagsListInput,
+    TagsUpdateInput,
+    UsersCreateInput,
+    UsersGenerateTokenInput,
+    UsersGetInput,
+    UsersListInput,
+    UsersMeInput,
+    UsersUpdateCredentialsInput,
+)
+from outbox import OUTBOX, OUTBOX_TOOLS, OutboxStatusInput, outbox_status, queued, resume_outbox
+from pagination import CollectionStream, PageStream
+from projection import PROJECTION_FIELDS, encode_collection
+from registry import MERGE_PATCH, ToolContext, ToolSpec
+from search_index import DepensesSearchInput, depenses_search
+from splits import prepare_depense
+from stats import StatsDepensesInput, StatsPartsInput, stats_depenses, stats_parts
+
+
+async def auth_login(ctx: ToolContext, args: AuthLoginInput) -> str:
+    """Authentification avec username/password"""
+    response = await ctx.api.request(
+        "POST",
+        "/auth",
+        json={"username": args.username, "password": args.password},
+        headers={"Content-Type": "application/json"},
+    )
+    response.raise_for_status()
+    ctx.credentials.update(response.json())
+    # Écritures laissées en file par une session précédente
+    resume_outbox(ctx)
+    return "Connexion réussie. Token JWT configuré."
+
+
+async def depenses_get(ctx: ToolContext, args: DepensesGetInput) -> Any:
+    """Lecture d'une dépense, IRIs développés si `expand` est demandé"""
+    depense = await ctx.api.get_json(f"/depenses/{args.id}", headers=ctx.headers())
+    return await expand_depense(ctx, depense) if args.expand else depense
+
+
+def list_collection(endpoint: str):
+    """Liste une collection : une page, ou toutes les pages si `all_pages` est demandé
+
+    Hors cache, les éléments sont décodés, projetés et sérialisés au fil de la
+    réponse de l'API, sans jamais tenir toute la page décodée en mémoire. Avec
+    `expand` (dépenses), ils sont développés avant projection.
+    """
+
+    async def handler(ctx: ToolContext, args: PageInput) -> Any:
+        expand = getattr(args, "expand", False)
+        params = args.model_dump(exclude_none=True, exclude={"all_pages", "max_items", "expand", *PROJECTION_FIELDS})
+        if "tags" in params:
+            params["tag[]"] = params.pop("tags")
+        if args.all_pages:
+            stream = CollectionStream(ctx.api, endpoint, params, ctx.headers(), max_items=args.max_items)
+        elif ctx.api.cache is not None and ctx.api.cache.policy(endpoint) is not None and not expand:
+            return await ctx.api.get_json(endpoint, params=params, headers=ctx.headers())
+        else:
+            stream = PageStream(ctx.api, endpoint, params, ctx.headers())
+        items = expand_depenses(ctx, stream) if expand else stream
+        return await encode_collection(items, args, stream.document)
+
+    return handler
+
+
+async def cache_stats(ctx: ToolContext, args: EmptyInput) -> Dict[str, Any]:
+    """Statistiques du cache des réponses"""
+    if ctx.api.cache is None:
+        return {"enabled": False}
+    return ctx.api.cache.stats()
+
+
+async def api_health(ctx: ToolContext, args: EmptyInput) -> Dict[str, Any]:
+    """État des disjoncteurs et du limiteur de concurrence"""
+    return ctx.api.resilience_stats()
+
+
+TOOLS: Dict[str, ToolSpec] = {spec.name: spec for spec in (
+    # Authentification
+    ToolSpec(
+        name="auth_login",
+        description="Se connecter à l'API avec username/password pour obtenir un token JWT",
+        input_model=AuthLoginInput,
+        method="POST",
+        path="/auth",
+        authenticated=False,
+        handler=auth_login,
+        error_label="Erreur d'authentification",
+    ),
+
+    # Dépenses
+    ToolSpec(
+        name="depenses_list",
+        description="Récupérer la liste des dépenses avec filtres optionnels",
+        input_model=DepensesListInput,
+        path="/depenses",
+        handler=list_collection("/depenses"),
+    ),
+    ToolSpec(
+        name="depenses_create",
+        description="Créer une nouvelle dépense (en partage par parts, les montants des détails peuvent être omis : ils sont calculés au centime près)",
+        input_model=DepensesCreateInput,
+        method="POST",
+        path="/depenses",
+        # Validée et répartie localement avant envoi
+        body=prepare_depense,
+    ),
+    ToolSpec(
+        name="depenses_get",
+        description="Récupérer une dépense par son ID",
+        input_model=DepensesGetInput,
+        path="/depenses/{id}",
+        handler=depenses_get,
+    ),
+    ToolSpec(
+        name="depenses_update",
+        description="Mettre à jour une dépense existante",
+        input_model=DepensesUpdateInput,
+        method="PATCH",
+        path="/depenses/{id}",
+        content_type=MERGE_PATCH,
+    ),
+    ToolSpec(
+        name="depenses_delete",
+        description="Supprimer une dépense",
+        input_model=DepensesDeleteInput,
+        method="DELETE",
+        path="/depenses/{id}",
+        success_message="Dépense supprimée avec succès",
+    ),
+    ToolSpec(
+        name="depenses_create_batch",
+        description="Créer plusieurs dépenses en un appel (validation locale, envoi parallèle, résultat par élément)",
+        input_model=DepensesCreateBatchInput,
+        method="POST",
+        path="/depenses",
+        handler=depenses_create_batch,
+    ),
+    ToolSpec(
+        name="depenses_update_many",
+        description="Modifier plusieurs dépenses en un appel, par IDs ou par filtre (tag, période, payeur), avec aperçu dry_run et résultat par élément",
+        input_model=DepensesUpdateManyInput,
+        method="PATCH",
+        path="/depenses",
+        handler=depenses_update_many,
+    ),
+    ToolSpec(
+        name="depenses_delete_many",
+        description="Supprimer plusieurs dépenses en un appel, par IDs ou par filtre (tag, période, payeur), avec aperçu dry_run et résultat par élément",
+        input_model=DepensesDeleteManyInput,
+        method="DELETE",
+        path="/depenses",
+        handler=depenses_delete_many,
+    ),
+    ToolSpec(
+        name="depenses_search",
+        description="Rechercher des dépenses par mots du titre, période, montant, payeur, tag ou participant (index local synchronisé)",
+        input_model=DepensesSearchInput,
+        path="/depenses",
+        handler=depenses_search,
+    ),
+    ToolSpec(
+        name="depenses_watch",
+        description="Changements de dépenses (créations, modifications, suppressions) depuis un curseur, avec attente optionnelle ou abonnement par notifications",
+        input_model=DepensesWatchInput,
+        path="/logs",
+        handler=depenses_watch,
+    ),
+
+    # Tags
+    ToolSpec(
+        name="tags_list",
+        description="Récupérer la liste des tags",
+        input_model=TagsListInput,
+        path="/tags",
+        handler=list_collection("/tags"),
+    ),
+    ToolSpec(
+        name="tags_create",
+        description="Créer un nouveau tag",
+        input_model=TagsCreateInput,
+        method="POST",
+        path="/tags",
+    ),
+    ToolSpec(
+        name="tags_get",
+        description="Récupérer un tag par son ID",
+        input_model=TagsGetInput,
+        path="/tags/{id}",
+    ),
+    ToolSpec(
+        name="tags_update",
+        description="Mettre à jour un tag existant",
+        input_model=TagsUpdateInput,
+        method="PATCH",
+        path="/tags/{id}",
+        content_type=MERGE_PATCH,
+    ),
+    ToolSpec(
+        name="tags_delete",
+        description="Supprimer un tag",
+        input_model=TagsDeleteInput,
+        method="DELETE",
+        path="/tags/{id}",
+        success_message="Tag supprimé avec succès",
+    ),
+
+    # Utilisateurs
+    ToolSpec(
+        name="users_list",
+        description="Récupérer la liste des utilisateurs",
+        input_model=UsersListInput,
+        path="/users",
+        handler=list_collection("/users"),
+    ),
+    ToolSpec(
+        name="users_get",
+        description="Récupérer un utilisateur par son ID",
+        input_model=UsersGetInput,
+        path="/users/{id}",
+    ),
+    ToolSpec(
+        name="users_me",
+        description="Récupérer les informations de l'utilisateur connecté",
+        input_model=UsersMeInput,
+        path="/users/me",
+    ),
+    ToolSpec(
+        name="users_create",
+        description="Créer un nouvel utilisateur (réservé aux administrateurs)",
+        input_model=UsersCreateInput,
+        method="POST",
+        path="/users",
+    ),
+    ToolSpec(
+        name="users_update_credentials",
+        description="Mettre à jour les credentials d'un utilisateur via token",
+        input_model=UsersUpdateCredentialsInput,
+        method="PATCH",
+        path="/users",
+        content_type=MERGE_PATCH,
+        authenticated=False,
+    ),
+    ToolSpec(
+        name="users_generate_token",
+        description="Générer un token pour un utilisateur (réservé aux administrateurs)",
+        input_model=UsersGenerateTokenInput,
+        path="/users/{id}/token",
+    ),
+
+    # Soldes
+    ToolSpec(
+        name="balances_compute",
+        description="Calculer localement le solde de chaque utilisateur à partir des dépenses (synchronisation incrémentale)",
+        input_model=BalancesInput,
+        path="/depenses",
+        handler=balances_compute,
+    ),
+    ToolSpec(
+        name="settle_up",
+        description="Calculer les virements minimaux pour solder les comptes (qui doit combien à qui)",
+        input_model=BalancesInput,
+        path="/depenses",
+        handler=settle_up,
+    ),
+    ToolSpec(
+        name="historique_series",
+        description="Évolution des soldes dans le temps, échantillonnée par jour, semaine ou mois (filtrable par période et utilisateur)",
+        input_model=HistoriqueSeriesInput,
+        path="/depenses",
+        handler=historique_series,
+    ),
+
+    # Statistiques
+    ToolSpec(
+        name="stats_depenses",
+        description="Agrégats des montants des dépenses (somme, nombre, moyenne, percentiles) par tag, payeur et période",
+        input_model=StatsDepensesInput,
+        path="/depenses",
+        handler=stats_depenses,
+    ),
+    ToolSpec(
+        name="stats_parts",
+        description="Agrégats des parts individuelles (ce que chacun a consommé) par participant, tag, payeur et période",
+        input_model=StatsPartsInput,
+        path="/depenses",
+        handler=stats_parts,
+    ),
+
+    # Instantanés
+    ToolSpec(
+        name="ledger_export",
+        description="Exporter utilisateurs, tags, dépenses et détails dans un instantané en colonnes (Parquet, Arrow ou CSV)",
+        input_model=LedgerExportInput,
+        path="/depenses",
+        handler=ledger_export,
+        stdio_only=True,
+    ),
+    ToolSpec(
+        name="ledger_import",
+        description="Amorcer les soldes, l'historique et l'index de recherche à partir d'un instantané",
+        input_model=LedgerImportInput,
+        path="/depenses",
+        handler=ledger_import,
+        stdio_only=True,
+    ),
+
+    # Diagnostic
+    ToolSpec(
+        name="cache_stats",
+        description="Statistiques du cache des réponses (hits, misses, taille)",
+        input_model=EmptyInput,
+        handler=cache_stats,
+    ),
+    ToolSpec(
+        name="api_health",
+        description="État des disjoncteurs par endpoint de l'API, du limiteur de concurrence et nombre de nouvelles tentatives",
+        input_model=EmptyInput,
+        handler=api_health,
+    ),
+    ToolSpec(
+        name="outbox_status",
+        description="Écritures en attente ou en échec dans la file d'écritures, et IDs réels des créations déjà rejouées",
+        input_model=OutboxStatusInput,
+        handler=outbox_status,
+    ),
+)}
+
+if OUTBOX:
+    TOOLS.update({name: queued(TOOLS[name]) for name in OUTBOX_TOOLS})